@@ -0,0 +1,71 @@
+"""
+Импорт JSON документа с псевдонимами: по ключу за раз против import_aliases.
+Запуск: python -m benchmarks.bench_aliases --aliases 10000 --output bench_aliases.jsonl
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import delete
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from benchmarks.common import report
+from db.base import create_tables
+from db.models import Alias
+from db.repos import get_alias, change_alias, add_aliases, import_aliases
+
+
+async def legacy_import(session, document: dict[str, str]) -> None:
+    # Прежний вариант из assign_alias: SELECT и коммит на каждый существующий ключ
+    aliases = []
+    for key, value in document.items():
+        if alias := await get_alias(session, key):
+            alias.alias_name = value
+            await change_alias(session, alias)
+            continue
+        aliases.append(Alias(origin_name=key, alias_name=value))
+    await add_aliases(session, aliases)
+
+
+async def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        await create_tables(engine)
+
+        # Половина ключей уже есть в бд и будет обновлена
+        existing = {f"Item {i}": f"Old alias {i}" for i in range(0, args.aliases, 2)}
+        document = {f"Item {i}": f"Alias {i}" for i in range(args.aliases)}
+        results = {"aliases": args.aliases, "existing": len(existing)}
+
+        for name, importer in (("legacy", legacy_import), ("bulk", import_aliases)):
+            async with sessionmaker() as session:
+                await session.execute(delete(Alias))
+                await session.commit()
+                await import_aliases(session, existing)
+
+            async with sessionmaker() as session:
+                started = time.perf_counter()
+                outcome = await importer(session, document)
+                results[f"{name}_seconds"] = round(time.perf_counter() - started, 3)
+            if outcome is not None:
+                results[f"{name}_inserted"], results[f"{name}_updated"] = outcome
+
+        results["speedup"] = round(results["legacy_seconds"] / results["bulk_seconds"], 1)
+        await engine.dispose()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--aliases", type=int, default=10000)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    report("aliases", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
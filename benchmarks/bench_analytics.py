@@ -0,0 +1,132 @@
+"""
+/analytics на большой истории: шесть запросов по transactions против сводки по дням,
+ряды за год по дням и за месяц по часам из сводок против запроса на каждый интервал.
+Запуск: python -m benchmarks.bench_analytics --transactions 1000000 --output bench_analytics.jsonl
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import select, func, insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from benchmarks.common import report
+from db.cache import result_cache
+from db.base import create_tables
+from db.models import Transaction
+from db.repos import get_analytics, get_analytics_series, backfill_daily_stats, backfill_hourly_stats
+
+
+async def legacy_analytics(session):
+    # Прежний вариант: отдельный полный проход по transactions на каждую цифру
+    now = datetime.utcnow()
+    week_ago = now - timedelta(days=7)
+    month_ago = now - timedelta(days=30)
+    return [
+        (await session.execute(stmt)).scalar()
+        for stmt in (
+            select(func.count(Transaction.id)).filter(Transaction.timestamp >= week_ago),
+            select(func.count(Transaction.id)).filter(Transaction.timestamp >= month_ago),
+            select(func.count(Transaction.id)),
+            select(func.sum(Transaction.total_price)).where(Transaction.timestamp >= week_ago),
+            select(func.sum(Transaction.total_price)).where(Transaction.timestamp >= month_ago),
+            select(func.sum(Transaction.total_price)),
+        )
+    ]
+
+
+async def per_bucket_series(session, start: datetime, end: datetime, step: timedelta) -> list:
+    # Наивный ряд: отдельный запрос по transactions на каждый интервал
+    series = []
+    while start < end:
+        result = await session.execute(
+            select(func.count(Transaction.id), func.coalesce(func.sum(Transaction.total_price), 0))
+            .where(Transaction.timestamp >= start, Transaction.timestamp < start + step)
+        )
+        series.append((start, *result.one()))
+        start += step
+    return series
+
+
+async def fill_transactions(sessionmaker, count: int, days: int, batch: int = 50000) -> None:
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    async with sessionmaker() as session:
+        for start in range(0, count, batch):
+            await session.execute(insert(Transaction), [
+                {
+                    "transaction_id": str(i),
+                    "roblox_name": "vepe211",
+                    "total_price": rng.choice([49, 99, 159, 299]),
+                    "timestamp": now - timedelta(seconds=rng.randint(0, days * 86400)),
+                }
+                for i in range(start, min(start + batch, count))
+            ])
+        await session.commit()
+
+
+async def timed(sessionmaker, func_, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        async with sessionmaker() as session:
+            started = time.perf_counter()
+            await func_(session)
+            best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 2)
+
+
+async def run(args) -> dict:
+    # Меряются запросы к бд, а не кэш результатов
+    result_cache.ttls.clear()
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        await create_tables(engine)
+
+        await fill_transactions(sessionmaker, args.transactions, args.days)
+        async with sessionmaker() as session:
+            started = time.perf_counter()
+            await backfill_daily_stats(session)
+            await backfill_hourly_stats(session)
+            backfill_seconds = time.perf_counter() - started
+
+        today = datetime.combine(datetime.utcnow().date(), datetime.min.time())
+        year = (today - timedelta(days=365), today + timedelta(days=1), "day", timedelta(days=1))
+        month = (today - timedelta(days=30), today + timedelta(days=1), "hour", timedelta(hours=1))
+
+        results = {
+            "transactions": args.transactions,
+            "days": args.days,
+            "backfill_seconds": round(backfill_seconds, 2),
+            "legacy_ms": await timed(sessionmaker, legacy_analytics, args.repeat),
+            "rollup_ms": await timed(sessionmaker, get_analytics, args.repeat),
+        }
+        results["speedup"] = round(results["legacy_ms"] / results["rollup_ms"], 1)
+        for name, (start, end, bucket, step) in (("year_by_day", year), ("month_by_hour", month)):
+            results[f"{name}_per_bucket_ms"] = await timed(
+                sessionmaker, lambda session: per_bucket_series(session, start, end, step), 1,
+            )
+            results[f"{name}_series_ms"] = await timed(
+                sessionmaker, lambda session: get_analytics_series(session, start, end, bucket), args.repeat,
+            )
+        await engine.dispose()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    report("analytics", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Операторы одновременно вызывают /analytics, /items_report и /recents во время распродажи:
+запросы в бд на каждый вызов против кэша результатов с общим запросом для одинаковых вызовов.
+Запуск: python -m benchmarks.bench_cache --transactions 100000 --operators 20 --output bench_cache.jsonl
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from benchmarks.bench_reports import fill
+from benchmarks.common import report, latency_summary
+from db.cache import result_cache, DEFAULT_TTLS
+from db.migrations import migrate
+from db.repos import (
+    get_analytics, get_items_report, get_recent_transactions,
+    backfill_daily_stats, backfill_item_stats,
+)
+
+COMMANDS = (
+    lambda session: get_analytics(session),
+    lambda session: get_items_report(session, days=7, limit=20),
+    lambda session: get_items_report(session),
+    lambda session: get_recent_transactions(session, limit=10),
+)
+
+
+async def burst(sessionmaker, operators: int, rounds: int) -> dict:
+    latencies = []
+
+    async def operator(i: int):
+        for r in range(rounds):
+            async with sessionmaker() as session:
+                started = time.perf_counter()
+                await COMMANDS[(i + r) % len(COMMANDS)](session)
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(operator(i) for i in range(operators)))
+    elapsed = time.perf_counter() - started
+    return {
+        "calls_per_s": round(len(latencies) / elapsed, 1),
+        **{key: round(value, 2) for key, value in latency_summary(latencies).items()},
+    }
+
+
+async def run(args) -> dict:
+    results = {"transactions": args.transactions, "operators": args.operators, "rounds": args.rounds}
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        await migrate(engine)
+        await fill(sessionmaker, args.transactions)
+        async with sessionmaker() as session:
+            await backfill_daily_stats(session)
+            await backfill_item_stats(session)
+
+        result_cache.ttls.clear()
+        results["uncached"] = await burst(sessionmaker, args.operators, args.rounds)
+
+        result_cache.ttls.update(DEFAULT_TTLS)
+        result_cache.clear()
+        results["cached"] = await burst(sessionmaker, args.operators, args.rounds)
+        results["cache"] = result_cache.stats()["commands"]
+        await engine.dispose()
+
+    results["speedup"] = round(results["cached"]["calls_per_s"] / results["uncached"]["calls_per_s"], 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--operators", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=50)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    report("cache", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
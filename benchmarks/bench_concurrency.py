@@ -0,0 +1,122 @@
+"""
+Нагрузочный прогон заказов через Dispatcher из bot.create_dispatcher:
+последовательная обработка против параллельной с локами по transaction_id.
+После прогона очередь отправляется в заглушку сервиса и проверяется,
+что каждый заказ доставлен ровно один раз.
+Запуск: python -m benchmarks.bench_concurrency --orders 1000 --output bench_concurrency.jsonl
+"""
+import argparse
+import asyncio
+import collections
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from benchmarks.common import report, latency_summary
+from benchmarks.corpus import generate_orders
+from bot import create_dispatcher
+from db.base import create_tables
+from db.models import OutboxEntry
+from formatters import parse_message
+from services.delivery import DeliveryClient
+from services.outbox import OutboxWorker
+from settings import CHAT_ID
+from tests.stubs import FakeTelegram, StubService
+
+
+async def replay(dp, bot, telegram: FakeTelegram, orders: list[str], concurrent: bool) -> tuple[float, list[float]]:
+    updates = [telegram.message_update(text, CHAT_ID) for text in orders]
+    latencies = []
+
+    async def feed(update):
+        started = time.perf_counter()
+        await dp.feed_raw_update(bot, update)
+        latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    if concurrent:
+        # Как в polling с handle_as_tasks: каждый апдейт в своем таске
+        await asyncio.gather(*(feed(update) for update in updates))
+    else:
+        for update in updates:
+            await feed(update)
+    return time.perf_counter() - started, latencies
+
+
+async def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        await create_tables(engine)
+
+        telegram = FakeTelegram(delay=args.telegram_ms / 1000)
+        await telegram.start()
+        service = StubService(delay=args.service_ms / 1000)
+        await service.start()
+        bot = telegram.bot()
+        delivery = DeliveryClient(service.url, max_concurrency=args.workers)
+        outbox = OutboxWorker(sessionmaker, delivery, workers=args.workers, base_delay=0.01, poll_interval=0.05)
+        # Роутеры модульные и подключаются один раз, поэтому оба режима идут через один диспетчер,
+        # последовательный режим просто не упирается в ограничение
+        dp = create_dispatcher(sessionmaker, outbox, args.workers)
+
+        results = {
+            "orders": args.orders,
+            "duplicate_ratio": args.duplicates,
+            "workers": args.workers,
+            "telegram_ms": args.telegram_ms,
+        }
+        expected = {}
+        for i, mode in enumerate(("sequential", "concurrent")):
+            # У режимов разные номера транзакций, чтобы заказы не пересекались
+            orders = generate_orders(args.orders, duplicate_ratio=args.duplicates, seed=i, start=i * args.orders)
+            expected[mode] = {parse_message(text).transaction_id for text in orders}
+            elapsed, latencies = await replay(dp, bot, telegram, orders, mode == "concurrent")
+            results[f"{mode}_orders_per_sec"] = round(len(orders) / elapsed)
+            results.update({f"{mode}_{key}": round(value, 2) for key, value in latency_summary(latencies).items()})
+
+        async with sessionmaker() as session:
+            queued = await session.scalar(select(func.count(OutboxEntry.id)))
+
+        # Отправляем очередь и считаем доставки по каждому заказу
+        await outbox.start()
+        while len(service.requests) < queued:
+            await asyncio.sleep(0.05)
+        await asyncio.sleep(0.2)
+        await outbox.stop()
+
+        deliveries = collections.Counter(request["transaction_id"] for request in service.requests)
+        for mode, transaction_ids in expected.items():
+            results[f"{mode}_unique_orders"] = len(transaction_ids)
+            results[f"{mode}_delivered_orders"] = len(transaction_ids & deliveries.keys())
+            results[f"{mode}_double_deliveries"] = sum(1 for t in transaction_ids if deliveries[t] > 1)
+
+        await delivery.close()
+        await bot.session.close()
+        await service.stop()
+        await telegram.stop()
+        await engine.dispose()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=1000)
+    parser.add_argument("--duplicates", type=float, default=0.2)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--telegram-ms", type=float, default=50, help="задержка ответов заглушки Bot API")
+    parser.add_argument("--service-ms", type=float, default=20, help="задержка ответа заглушки сервиса")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    report("concurrency", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Дедупликация заказов: SELECT в бд на каждый заказ против LRU и фильтра Блума
+из db.dedup, прогретых из таблицы transactions с историей заказов.
+Новые заказы сохраняются через save_transaction в обоих режимах.
+Запуск: python -m benchmarks.bench_dedup --history 100000 --orders 5000 --output bench_dedup.jsonl
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from benchmarks.common import report
+from benchmarks.corpus import generate_orders
+from db.base import create_tables
+from db.dedup import SeenTransactions
+from db.models import Transaction
+from db.repos import is_transaction_processed, save_transaction
+from formatters import parse_message
+
+
+async def seed(sessionmaker, history: int) -> None:
+    now = datetime.utcnow()
+    async with sessionmaker() as session:
+        await session.execute(insert(Transaction), [
+            {"transaction_id": f"h{i}", "roblox_name": "vepe211", "total_price": 99, "timestamp": now}
+            for i in range(history)
+        ])
+        await session.commit()
+
+
+async def replay(sessionmaker, transaction_ids: list[str], seen: SeenTransactions | None) -> dict:
+    check_seconds = 0.0
+    duplicates = 0
+    started = time.perf_counter()
+    async with sessionmaker() as session:
+        for transaction_id in transaction_ids:
+            check_started = time.perf_counter()
+            if seen is not None:
+                processed = await seen.is_processed(session, transaction_id)
+            else:
+                processed = await is_transaction_processed(session, transaction_id)
+            check_seconds += time.perf_counter() - check_started
+
+            if processed:
+                duplicates += 1
+                continue
+            await save_transaction(session, Transaction(transaction_id=transaction_id, roblox_name="vepe211", total_price=99))
+            if seen is not None:
+                seen.add(transaction_id)
+
+    return {
+        "seconds": round(time.perf_counter() - started, 3),
+        "check_us": round(check_seconds / len(transaction_ids) * 1e6, 1),
+        "duplicates": duplicates,
+    }
+
+
+async def run(args) -> dict:
+    orders = generate_orders(args.orders, duplicate_ratio=args.duplicates, seed=1, start=args.history)
+    transaction_ids = [parse_message(text).transaction_id for text in orders]
+    results = {
+        "history": args.history,
+        "orders": args.orders,
+        "duplicate_ratio": args.duplicates,
+        "lru_size": args.lru_size,
+    }
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in ("db", "front"):
+            engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / f'{mode}.db'}")
+            sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+            await create_tables(engine)
+            await seed(sessionmaker, args.history)
+
+            seen = None
+            if mode == "front":
+                seen = SeenTransactions(lru_size=args.lru_size, capacity=max(args.history * 2, 100_000))
+                started = time.perf_counter()
+                async with sessionmaker() as session:
+                    await seen.load(session)
+                results["front_load_seconds"] = round(time.perf_counter() - started, 3)
+
+            outcome = await replay(sessionmaker, transaction_ids, seen)
+            results.update({f"{mode}_{key}": value for key, value in outcome.items()})
+            if seen is not None:
+                stats = seen.stats()
+                results.update({f"front_{key}": stats[key] for key in (
+                    "hit_rate", "lru_hits", "bloom_negatives", "db_checks", "false_positives",
+                )})
+            await engine.dispose()
+
+    results["db_queries_avoided"] = args.orders - results["front_db_checks"]
+    results["check_speedup"] = round(results["db_check_us"] / results["front_check_us"], 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", type=int, default=100000, help="транзакций в бд до прогона")
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--duplicates", type=float, default=0.3)
+    parser.add_argument("--lru-size", type=int, default=10000)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    report("dedup", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Пропускная способность записи заказов для профилей PRAGMA из db.engine.
+Несколько писателей одновременно сохраняют транзакции с предметами и записью в очереди,
+как параллельные обработчики апдейтов.
+Запуск: python -m benchmarks.bench_engine --transactions 2000 --writers 16 --output bench_engine.jsonl
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import report, latency_summary
+from benchmarks.corpus import random_items
+from db.base import create_tables
+from db.engine import create_engine, SQLITE_PROFILES
+from db.models import Transaction, ItemEntity
+from db.repos import enqueue_transaction
+
+
+def make_transaction(i: int, rng: random.Random) -> Transaction:
+    transaction = Transaction(transaction_id=str(i), roblox_name="vepe211", total_price=0)
+    for name, amount, price in random_items(rng):
+        transaction.items.append(ItemEntity(item_name=name, amount=amount, unit_price=price))
+        transaction.total_price += amount * price
+    return transaction
+
+
+async def write(sessionmaker, transactions: int, writers: int) -> tuple[float, list[float]]:
+    rng = random.Random(0)
+    queue = asyncio.Queue()
+    for i in range(transactions):
+        queue.put_nowait(make_transaction(i, rng))
+    latencies = []
+
+    async def writer():
+        while not queue.empty():
+            transaction = queue.get_nowait()
+            started = time.perf_counter()
+            async with sessionmaker() as session:
+                await enqueue_transaction(session, transaction, {"transaction_id": transaction.transaction_id})
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer() for _ in range(writers)))
+    return time.perf_counter() - started, latencies
+
+
+async def run(args) -> dict:
+    results = {"transactions": args.transactions, "writers": args.writers}
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles:
+            engine = create_engine(f"sqlite+aiosqlite:///{Path(tmp) / f'{profile}.db'}", sqlite_profile=profile)
+            sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+            await create_tables(engine)
+
+            elapsed, latencies = await write(sessionmaker, args.transactions, args.writers)
+            results[f"{profile}_tx_per_sec"] = round(args.transactions / elapsed)
+            results.update({f"{profile}_{key}": round(value, 2) for key, value in latency_summary(latencies).items()})
+            await engine.dispose()
+
+    if "default" in args.profiles:
+        for profile in args.profiles:
+            results[f"{profile}_speedup"] = round(results[f"{profile}_tx_per_sec"] / results["default_tx_per_sec"], 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=2000)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--profiles", nargs="+", default=list(SQLITE_PROFILES), choices=list(SQLITE_PROFILES))
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    report("engine", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Сквозной нагрузочный прогон перед распродажей: заглушка Bot API отдает заказы через long polling
+в Dispatcher из bot.create_dispatcher со всеми роутерами и middleware, очередь отправляет их
+в заглушку веб сервиса. В корпусе есть сеты, псевдонимы, повторы и испорченные заказы.
+Считаются заказы в секунду, задержки p50/p95/p99 до конца обработки апдейта и до доставки в сервис,
+и проверяется, что каждый заказ доставлен ровно один раз.
+Результаты дописываются строкой JSON в --output, с --baseline запуск сравнивается с последним
+из файла и завершается с кодом 1, если метрики стали хуже больше чем на --tolerance.
+Запуск: python -m benchmarks.bench_load --orders 5000 --output bench_load.jsonl --baseline bench_load.jsonl
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from benchmarks.common import report, latency_summary, load_baseline, regressions
+from benchmarks.corpus import generate_orders, ITEM_NAMES, SET_NAMES
+from bot import create_dispatcher, init_database
+from db.engine import create_engine
+from db.repos import import_sets, import_aliases
+from formatters import parse_message
+from services.delivery import DeliveryClient
+from services.outbox import OutboxWorker
+from settings import CHAT_ID
+from tests.stubs import FakeTelegram, StubService
+
+# Сеты из корпуса, по три предмета в каждом
+SETS = {
+    name: [(ITEM_NAMES[(i + j) % len(ITEM_NAMES)], j + 1) for j in range(3)]
+    for i, name in enumerate(SET_NAMES)
+}
+ALIASES = {"Batwing": "Bat wing", "Icebreaker": "Ice breaker"}
+
+
+def track_handled(handled: dict[int, float], done: asyncio.Event, total: int):
+    """Внешний middleware апдейтов: время, когда апдейт полностью обработан"""
+
+    async def middleware(handler, event, data):
+        try:
+            return await handler(event, data)
+        finally:
+            handled[event.update_id] = time.perf_counter()
+            if len(handled) == total:
+                done.set()
+
+    return middleware
+
+
+async def inject(telegram: FakeTelegram, updates: list[dict], rate: float) -> None:
+    started = time.perf_counter()
+    for i, update in enumerate(updates):
+        if rate:
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        telegram.enqueue(update)
+
+
+async def wait_for(condition, timeout: float) -> bool:
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        if time.perf_counter() > deadline:
+            return False
+        await asyncio.sleep(0.02)
+    return True
+
+
+async def run(args) -> dict:
+    texts = generate_orders(
+        args.orders, duplicate_ratio=args.duplicates, malformed_ratio=args.malformed, seed=args.seed,
+    )
+    parsed = [parse_message(text) for text in texts]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}", sqlite_profile=args.sqlite_profile)
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        await init_database(engine, sessionmaker)
+        async with sessionmaker() as session:
+            await import_sets(session, SETS)
+            await import_aliases(session, ALIASES)
+
+        telegram = FakeTelegram(delay=args.telegram_ms / 1000)
+        await telegram.start()
+        service = StubService(delay=args.service_ms / 1000)
+        await service.start()
+        bot = telegram.bot()
+        delivery = DeliveryClient(service.url, max_concurrency=args.outbox_workers)
+        outbox = OutboxWorker(
+            sessionmaker, delivery, workers=args.outbox_workers, base_delay=0.01, poll_interval=0.05,
+            batch_size=args.batch_size, batch_delay=args.batch_delay_ms / 1000,
+        )
+        dp = create_dispatcher(sessionmaker, outbox, args.workers)
+        handled, done = {}, asyncio.Event()
+        dp.update.outer_middleware(track_handled(handled, done, len(texts)))
+
+        await outbox.start()
+        polling = asyncio.create_task(
+            dp.start_polling(bot, handle_as_tasks=True, handle_signals=False, polling_timeout=10)
+        )
+        updates = [telegram.message_update(text, CHAT_ID) for text in texts]
+        await inject(telegram, updates, args.rate)
+
+        # Первое появление каждого заказа, от него считается задержка доставки
+        first_seen = {}
+        for update, order in zip(updates, parsed):
+            if order is not None:
+                first_seen.setdefault(order.transaction_id, telegram.enqueued_at[update["update_id"]])
+
+        def all_delivered() -> bool:
+            return first_seen.keys() <= {request["transaction_id"] for request in service.requests}
+
+        handled_all = await wait_for(done.is_set, args.timeout)
+        delivered_all = await wait_for(all_delivered, args.timeout)
+        # Запас времени, чтобы увидеть повторные доставки, если они есть
+        await asyncio.sleep(0.2)
+
+        await dp.stop_polling()
+        await polling
+        await outbox.stop()
+        await delivery.close()
+        await bot.session.close()
+        await service.stop()
+        await telegram.stop()
+        await engine.dispose()
+
+    started = min(telegram.enqueued_at.values())
+    handle_latencies = [
+        handled[update_id] - telegram.enqueued_at[update_id]
+        for update_id in (update["update_id"] for update in updates)
+        if update_id in handled
+    ]
+
+    delivered_at = {}
+    deliveries = {}
+    for request, received_at in zip(service.requests, service.received_at):
+        transaction_id = request["transaction_id"]
+        delivered_at.setdefault(transaction_id, received_at)
+        deliveries[transaction_id] = deliveries.get(transaction_id, 0) + 1
+    delivery_latencies = [delivered_at[t] - first_seen[t] for t in first_seen if t in delivered_at]
+
+    return {
+        "orders": len(texts),
+        "unique_orders": len(first_seen),
+        "duplicate_orders": sum(1 for order in parsed if order is not None) - len(first_seen),
+        "malformed_orders": sum(1 for order in parsed if order is None),
+        "workers": args.workers,
+        "outbox_workers": args.outbox_workers,
+        "batch_size": args.batch_size,
+        "rate": args.rate,
+        "telegram_ms": args.telegram_ms,
+        "service_ms": args.service_ms,
+        "handled_all": handled_all,
+        "delivered_all": delivered_all,
+        "orders_per_sec": round(len(handled) / (max(handled.values()) - started)) if handled else 0,
+        **{f"handle_{key}": round(value, 2) for key, value in latency_summary(handle_latencies).items()},
+        "deliveries_per_sec": round(len(delivered_at) / (max(delivered_at.values()) - started)) if delivered_at else 0,
+        **{f"delivery_{key}": round(value, 2) for key, value in latency_summary(delivery_latencies).items()},
+        "service_requests": service.http_requests,
+        "replies": sum(1 for message in telegram.sent if message["method"] == "sendMessage"),
+        "delivered_orders": len(delivered_at),
+        "missing_orders": len(first_seen.keys() - delivered_at.keys()),
+        "double_deliveries": sum(1 for count in deliveries.values() if count > 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--duplicates", type=float, default=0.15)
+    parser.add_argument("--malformed", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rate", type=float, default=0, help="заказов в секунду, 0 - все сразу")
+    parser.add_argument("--workers", type=int, default=16, help="одновременно обрабатываемых апдейтов")
+    parser.add_argument("--outbox-workers", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=1, help="заказов в одном запросе к сервису")
+    parser.add_argument("--batch-delay-ms", type=float, default=50)
+    parser.add_argument("--telegram-ms", type=float, default=50, help="задержка ответов заглушки Bot API")
+    parser.add_argument("--service-ms", type=float, default=20, help="задержка ответа заглушки сервиса")
+    parser.add_argument("--sqlite-profile", default="fast")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--output")
+    parser.add_argument("--baseline", help="файл с прошлыми запусками для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    # Базовый запуск читается до того, как report допишет текущий в тот же файл
+    baseline = load_baseline(args.baseline, "load") if args.baseline else None
+    results = asyncio.run(run(args))
+    report("load", results, args.output)
+
+    problems = regressions(results, baseline, args.tolerance) if baseline else []
+    if results["missing_orders"] or results["double_deliveries"] or not results["handled_all"]:
+        problems.append(
+            f"доставка: потеряно {results['missing_orders']}, дважды {results['double_deliveries']},"
+            f" все апдейты обработаны: {results['handled_all']}"
+        )
+    for problem in problems:
+        print(f"Хуже базового запуска или ошибка: {problem}", file=sys.stderr)
+    sys.exit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
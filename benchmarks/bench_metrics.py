@@ -0,0 +1,59 @@
+"""
+Накладные расходы метрик: MetricsMiddleware вокруг пустого обработчика и обертка функций
+репозитория вокруг пустой корутины, против вызова без метрик. Полный прогон апдейта через
+Dispatcher стоит около 150-250 мкс и шумит сильнее, чем сами метрики, поэтому здесь не меряется.
+Запуск: python -m benchmarks.bench_metrics --calls 200000 --output bench_metrics.jsonl
+"""
+import argparse
+import asyncio
+import time
+
+from aiogram import Router
+
+from benchmarks.common import report
+from middlewares.metrics import MetricsMiddleware
+from services.metrics import Metrics
+
+
+class HandlerObject:
+    def __init__(self, callback):
+        self.callback = callback
+
+
+async def noop(*args):
+    return None
+
+
+async def per_call_us(func, calls: int) -> float:
+    started = time.perf_counter()
+    for _ in range(calls):
+        await func()
+    return (time.perf_counter() - started) / calls * 1e6
+
+
+async def run(args) -> dict:
+    registry = Metrics()
+    middleware = MetricsMiddleware(registry)
+    data = {"handler": HandlerObject(noop), "event_router": Router(name="Bench router")}
+    timed_noop = registry.timed("bot_repo_seconds", "bot_repo_errors_total", "noop")(noop)
+
+    baseline = await per_call_us(lambda: noop(None, data), args.calls)
+    return {
+        "calls": args.calls,
+        "baseline_call_us": round(baseline, 3),
+        "middleware_overhead_us": round(await per_call_us(lambda: middleware(noop, None, data), args.calls) - baseline, 3),
+        "repo_wrapper_overhead_us": round(await per_call_us(timed_noop, args.calls) - baseline, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=200000)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    report("metrics", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
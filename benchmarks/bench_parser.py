@@ -0,0 +1,54 @@
+"""
+Пропускная способность парсера заказов.
+Запуск: python -m benchmarks.bench_parser --output bench_parser.jsonl
+"""
+import argparse
+import logging
+import re
+import timeit
+
+from benchmarks.common import report
+from benchmarks.corpus import generate_orders
+from formatters import parse_order
+
+
+def legacy_parse(text: str):
+    # Прежняя реализация: четыре регулярки и четыре прохода по тексту
+    items = re.findall(r"(\d+)\. ([\w\s]+): (\d+) \((\d+) x (\d+)\)", text)
+    roblox_name = re.search(r"Ваш_ник_в_ROBLOX: (\w+)", text)
+    transaction_id = re.search(r"Transaction ID: (\d+):(\d+)", text)
+    total_price = re.search(r"Payment Amount: (\d+)", text)
+    logging.getLogger(__name__).info(f'Transaction id: {transaction_id}, roblox_username: {roblox_name}')
+    return items, roblox_name, transaction_id, total_price
+
+
+def measure(func, corpus: list[str], repeat: int) -> float:
+    def run():
+        for text in corpus:
+            func(text)
+
+    best = min(timeit.repeat(run, number=1, repeat=repeat))
+    return len(corpus) / best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--orders", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    corpus = generate_orders(args.orders, malformed_ratio=0.05)
+    legacy = measure(legacy_parse, corpus, args.repeat)
+    current = measure(parse_order, corpus, args.repeat)
+
+    report("parser", {
+        "orders": len(corpus),
+        "legacy_orders_per_sec": round(legacy),
+        "orders_per_sec": round(current),
+        "speedup": round(current / legacy, 2),
+    }, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+/recents и /items_report на большой истории: схема без индексов против схемы после миграций,
+отчет по предметам из сводки по дням против GROUP BY по всем строкам item_transaction.
+Запуск: python -m benchmarks.bench_reports --transactions 100000 --output bench_reports.jsonl
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import insert, select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from benchmarks.common import report
+from db.cache import result_cache
+from benchmarks.corpus import ITEM_NAMES
+from db.migrations import migrate
+from db.models import Transaction, ItemEntity
+from db.repos import get_recent_transactions, get_items_report, backfill_item_stats
+
+# Индексы, которые добавили миграции для этих запросов
+INDEXES = (
+    "ix_transactions_timestamp_id",
+    "ix_item_transaction_transaction_id",
+    "ix_item_transaction_item_name_amount",
+)
+
+
+async def fill(sessionmaker, count: int, days: int = 365, batch: int = 20000) -> int:
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    items = 0
+    async with sessionmaker() as session:
+        for start in range(0, count, batch):
+            ids = range(start + 1, min(start + batch, count) + 1)
+            await session.execute(insert(Transaction), [
+                {
+                    "id": i,
+                    "transaction_id": str(6682510345 + i),
+                    "roblox_name": "vepe211",
+                    "total_price": 0,
+                    "timestamp": now - timedelta(seconds=rng.randint(0, days * 86400)),
+                }
+                for i in ids
+            ])
+            rows = [
+                {
+                    "transaction_id": i,
+                    "external_transaction_id": str(6682510345 + i),
+                    "item_name": rng.choice(ITEM_NAMES),
+                    "amount": rng.randint(1, 5),
+                    "unit_price": rng.choice([49, 99, 159, 299]),
+                }
+                for i in ids
+                for _ in range(rng.randint(1, 8))
+            ]
+            await session.execute(insert(ItemEntity), rows)
+            items += len(rows)
+        await session.commit()
+    return items
+
+
+async def timed(sessionmaker, func_, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        async with sessionmaker() as session:
+            started = time.perf_counter()
+            await func_(session)
+            best = min(best, time.perf_counter() - started)
+    return round(best * 1000, 2)
+
+
+async def run(args) -> dict:
+    # Меряются запросы к бд, а не кэш результатов
+    result_cache.ttls.clear()
+    results = {"transactions": args.transactions}
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        await migrate(engine)
+        results["items"] = await fill(sessionmaker, args.transactions)
+        async with sessionmaker() as session:
+            await backfill_item_stats(session)
+
+        # Курсор на страницу в середине истории
+        async with sessionmaker() as session:
+            page = await get_recent_transactions(session, limit=args.transactions // 2)
+            cursor = page.next_cursor
+
+        async def recents_first(session):
+            await get_recent_transactions(session, limit=10)
+
+        async def recents_deep(session):
+            await get_recent_transactions(session, cursor=cursor, limit=10)
+
+        async def items_report(session):
+            await get_items_report(session)
+
+        async def items_report_week_top(session):
+            await get_items_report(session, days=7, limit=20)
+
+        async def legacy_items_report(session):
+            # Прежний отчет: GROUP BY по всем строкам item_transaction на каждый вызов
+            await session.execute(
+                select(ItemEntity.item_name, func.count(ItemEntity.id), func.sum(ItemEntity.amount))
+                .group_by(ItemEntity.item_name)
+            )
+
+        async def transaction_items(session):
+            # Предметы одной транзакции по внешнему Transaction ID, без join
+            await session.execute(
+                select(func.sum(ItemEntity.amount)).where(ItemEntity.external_transaction_id == "6682560345")
+            )
+
+        queries = {
+            "recents_first_page": recents_first,
+            "recents_deep_page": recents_deep,
+            "items_report": items_report,
+            "items_report_7d_top20": items_report_week_top,
+            "legacy_items_report": legacy_items_report,
+            "items_by_external_id": transaction_items,
+        }
+        for mode in ("indexed", "no_index"):
+            if mode == "no_index":
+                async with engine.begin() as conn:
+                    for index in INDEXES + ("ix_item_transaction_external_transaction_id",):
+                        await conn.exec_driver_sql(f"DROP INDEX {index}")
+            for name, query in queries.items():
+                results[f"{mode}_{name}_ms"] = await timed(sessionmaker, query, args.repeat)
+
+        for name in queries:
+            results[f"{name}_speedup"] = round(results[f"no_index_{name}_ms"] / results[f"indexed_{name}_ms"], 1)
+        await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--transactions", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    report("reports", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""
+Поток апдейтов в чате заказов, где заказов меньшинство: сессия бд на каждый апдейт
+(прежний DbSessionMiddleware на dp.update) против ленивой сессии для обработчиков с флагом session.
+Запуск: python -m benchmarks.bench_sessions --updates 20000 --order-ratio 0.05 --output bench_sessions.jsonl
+"""
+import argparse
+import asyncio
+import logging
+import random
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from benchmarks.common import report, latency_summary
+from benchmarks.corpus import generate_orders
+from bot import create_dispatcher
+from db.base import create_tables
+from db.dedup import seen_transactions
+from middlewares.db import DbSessionMiddleware
+from settings import CHAT_ID
+from tests.stubs import FakeTelegram
+
+CHATTER = ["Привет", "Кто на смене?", "Заказ ушел?", "ок", "Спасибо!", "Проверьте оплату, пожалуйста"]
+
+
+class CountingSessionmaker(async_sessionmaker):
+    opened = 0
+
+    def __call__(self, **kw):
+        self.opened += 1
+        return super().__call__(**kw)
+
+
+class EagerSessionMiddleware:
+    """Прежнее поведение: сессия открывается на каждый апдейт до фильтров"""
+
+    def __init__(self, session_pool: async_sessionmaker):
+        self.session_pool = session_pool
+
+    async def __call__(self, handler, event, data):
+        async with self.session_pool() as session:
+            data["session"] = session
+            return await handler(event, data)
+
+
+class FakeOutbox:
+    def notify(self):
+        pass
+
+
+def make_stream(count: int, order_ratio: float, seed: int, start: int) -> list[str]:
+    rng = random.Random(seed)
+    orders = iter(generate_orders(count, seed=seed, start=start))
+    return [next(orders) if rng.random() < order_ratio else rng.choice(CHATTER) for _ in range(count)]
+
+
+async def replay(dp, bot, telegram: FakeTelegram, texts: list[str], workers: int) -> tuple[float, list[float]]:
+    updates = [telegram.message_update(text, CHAT_ID) for text in texts]
+    latencies = []
+    queue = iter(updates)
+
+    async def worker():
+        for update in queue:
+            started = time.perf_counter()
+            await dp.feed_raw_update(bot, update)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    return time.perf_counter() - started, latencies
+
+
+async def run(args) -> dict:
+    results = {"updates": args.updates, "order_ratio": args.order_ratio, "workers": args.workers}
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        sessionmaker = CountingSessionmaker(engine, expire_on_commit=False)
+        await create_tables(engine)
+        async with sessionmaker() as session:
+            await seen_transactions.load(session)
+
+        telegram = FakeTelegram()
+        await telegram.start()
+        bot = telegram.bot()
+        # Роутеры подключаются к одному диспетчеру, режимы переключаются заменой middleware
+        dp = create_dispatcher(sessionmaker, FakeOutbox())
+        lazy = [m for m in dp.message.middleware if isinstance(m, DbSessionMiddleware)]
+        eager = EagerSessionMiddleware(sessionmaker)
+
+        for i, mode in enumerate(("eager", "lazy")):
+            if mode == "eager":
+                for middleware in lazy:
+                    dp.message.middleware.unregister(middleware)
+                dp.update.middleware(eager)
+            else:
+                dp.update.middleware.unregister(eager)
+                for middleware in lazy:
+                    dp.message.middleware(middleware)
+
+            texts = make_stream(args.updates, args.order_ratio, seed=i, start=i * args.updates)
+            sessionmaker.opened = 0
+            elapsed, latencies = await replay(dp, bot, telegram, texts, args.workers)
+            results[f"{mode}_updates_per_sec"] = round(len(texts) / elapsed)
+            results[f"{mode}_sessions"] = sessionmaker.opened
+            results.update({f"{mode}_{key}": round(value, 3) for key, value in latency_summary(latencies).items()})
+
+        results["speedup"] = round(results["lazy_updates_per_sec"] / results["eager_updates_per_sec"], 2)
+        await bot.session.close()
+        await telegram.stop()
+        await engine.dispose()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=20000)
+    parser.add_argument("--order-ratio", type=float, default=0.05)
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    logging.disable(logging.WARNING)
+    report("sessions", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Загрузка каталога сетов из JSON: по сету за коммит против import_sets.
+Запуск: python -m benchmarks.bench_set_import --sets 500 --output bench_set_import.jsonl
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from benchmarks.common import report
+from db.base import create_tables
+from db.models import Set, SetItem
+from db.repos import search_sets, change_set, add_set, import_sets
+from formatters import parse_sets_document
+
+
+async def legacy_import(session, document: dict) -> None:
+    # Прежний вариант из add_set_handler: поиск и коммит на каждый сет
+    for set_name, items in document.items():
+        set_items = [SetItem(item_name=item['name'], amount=item['amount']) for item in items]
+        if found := await search_sets(session, set_name):
+            found.items = set_items
+            await change_set(session, found)
+            continue
+        new_set = Set(set_name=set_name, items=set_items)
+        await add_set(session, new_set, set_items)
+
+
+async def timed_import(sessionmaker, importer, document) -> float:
+    async with sessionmaker() as session:
+        started = time.perf_counter()
+        if importer is import_sets:
+            sets, errors = parse_sets_document(document)
+            assert not errors, errors
+            await import_sets(session, sets)
+        else:
+            await importer(session, document)
+        return round(time.perf_counter() - started, 3)
+
+
+async def run(args) -> dict:
+    document = {
+        f"Bench {i} set": [{"name": f"Bench item {i}-{j}", "amount": j + 1} for j in range(args.set_size)]
+        for i in range(args.sets)
+    }
+    results = {"sets": args.sets, "set_size": args.set_size}
+
+    for name, importer in (("legacy", legacy_import), ("bulk", import_sets)):
+        with tempfile.TemporaryDirectory() as tmp:
+            engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+            sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+            await create_tables(engine)
+
+            # Первая загрузка создает сеты, повторная заменяет их предметы
+            results[f"{name}_create_seconds"] = await timed_import(sessionmaker, importer, document)
+            results[f"{name}_update_seconds"] = await timed_import(sessionmaker, importer, document)
+
+            async with sessionmaker() as session:
+                results[f"{name}_set_item_rows"] = await session.scalar(select(func.count(SetItem.id)))
+            await engine.dispose()
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=500)
+    parser.add_argument("--set-size", type=int, default=6)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    report("set_import", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""
+Раскрытие сетов в заказе: запрос в бд на каждый сет против кэша сетов.
+Запуск: python -m benchmarks.bench_sets --output bench_sets.jsonl
+"""
+import argparse
+import asyncio
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from benchmarks.common import report
+from db.base import create_tables
+from db.catalog import SetCatalog
+from db.models import Set, SetItem
+from db.repos import search_sets
+from schemas import Item
+
+
+async def legacy_expand(session, items: list[Item]) -> list[Item]:
+    # Прежний вариант из handle_message: отдельный запрос на каждый сет
+    actual_items = []
+    for item in items:
+        if item.name.endswith("set"):
+            found = await search_sets(session, item.name)
+            if not found:
+                continue
+            actual_items.extend(Item(name=i.item_name, amount=i.amount, unit_price=0) for i in found.items)
+        else:
+            actual_items.append(item)
+    return actual_items
+
+
+async def run(args) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{Path(tmp) / 'bench.db'}")
+        sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+        await create_tables(engine)
+
+        queries = 0
+
+        @event.listens_for(engine.sync_engine, "before_cursor_execute")
+        def count_queries(*_):
+            nonlocal queries
+            queries += 1
+
+        async with sessionmaker() as session:
+            for i in range(args.sets):
+                session.add(Set(set_name=f"Bench {i} set", items=[
+                    SetItem(item_name=f"Bench item {i}-{j}", amount=j + 1) for j in range(args.set_size)
+                ]))
+            await session.commit()
+
+        order = [Item(name=f"Bench {i % args.sets} set", amount=1, unit_price=99) for i in range(args.sets_per_order)]
+        results = {"orders": args.orders, "sets_per_order": args.sets_per_order}
+
+        catalog = SetCatalog()
+        for name, expand in (("legacy", legacy_expand), ("catalog", catalog.expand)):
+            async with sessionmaker() as session:
+                if name == "catalog":
+                    await catalog.load(session)
+                queries = 0
+                started = time.perf_counter()
+                for _ in range(args.orders):
+                    await expand(session, order)
+                elapsed = time.perf_counter() - started
+            results[f"{name}_orders_per_sec"] = round(args.orders / elapsed)
+            results[f"{name}_queries_per_order"] = queries / args.orders
+
+        results["catalog"] = catalog.stats()
+        await engine.dispose()
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sets", type=int, default=200)
+    parser.add_argument("--set-size", type=int, default=5)
+    parser.add_argument("--sets-per-order", type=int, default=20)
+    parser.add_argument("--orders", type=int, default=200)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    report("sets", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Доставка апдейтов в Dispatcher: long polling против вебхука.
+Апдейты подаются с заданной частотой, задержка считается от появления
+апдейта (в getUpdates или POST на вебхук) до вызова хендлера.
+Запуск: python -m benchmarks.bench_webhook --updates 5000 --rate 1000 --output bench_webhook.jsonl
+"""
+import argparse
+import asyncio
+import time
+
+import aiohttp
+from aiogram import Dispatcher, Router
+from aiogram.types import Message
+from aiohttp import web
+
+from benchmarks.common import report, latency_summary
+from services.webhook import create_webhook_app
+from tests.stubs import FakeTelegram
+
+CHAT_ID = -100
+SECRET = "bench-secret"
+
+
+def create_dispatcher(handled: dict[int, float], done: asyncio.Event, total: int, work: float) -> Dispatcher:
+    router = Router()
+
+    @router.message()
+    async def on_message(message: Message):
+        # Имитация ожидания бд или сети в хендлере
+        await asyncio.sleep(work)
+        handled[message.message_id] = time.perf_counter()
+        if len(handled) == total:
+            done.set()
+
+    dp = Dispatcher()
+    dp.include_router(router)
+    return dp
+
+
+async def inject(updates: list[dict], rate: float, send) -> None:
+    started = time.perf_counter()
+    for i, update in enumerate(updates):
+        if rate:
+            delay = started + i / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        await send(update)
+
+
+def summarize(mode: str, handled: dict[int, float], sent_at: dict[int, float]) -> dict:
+    latencies = [handled[update_id] - sent_at[update_id] for update_id in handled]
+    elapsed = max(handled.values()) - min(sent_at.values())
+    return {
+        f"{mode}_updates_per_sec": round(len(handled) / elapsed),
+        **{f"{mode}_{key}": round(value, 2) for key, value in latency_summary(latencies).items()},
+    }
+
+
+async def run_polling(args) -> dict:
+    telegram = FakeTelegram()
+    await telegram.start()
+    bot = telegram.bot()
+    handled, done = {}, asyncio.Event()
+    dp = create_dispatcher(handled, done, args.updates, args.work_ms / 1000)
+
+    polling = asyncio.create_task(dp.start_polling(bot, handle_signals=False, polling_timeout=10))
+    updates = [telegram.message_update(f"update {i}", CHAT_ID) for i in range(args.updates)]
+
+    async def send(update):
+        telegram.enqueue(update)
+
+    await inject(updates, args.rate, send)
+    await asyncio.wait_for(done.wait(), timeout=120)
+    await dp.stop_polling()
+    await polling
+    await bot.session.close()
+    await telegram.stop()
+    return summarize("polling", handled, telegram.enqueued_at)
+
+
+async def run_webhook(args) -> dict:
+    telegram = FakeTelegram()
+    await telegram.start()
+    bot = telegram.bot()
+    handled, done = {}, asyncio.Event()
+    dp = create_dispatcher(handled, done, args.updates, args.work_ms / 1000)
+
+    runner = web.AppRunner(create_webhook_app(dp, bot, "/webhook", SECRET))
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    url = f"http://127.0.0.1:{runner.addresses[0][1]}/webhook"
+
+    updates = [telegram.message_update(f"update {i}", CHAT_ID) for i in range(args.updates)]
+    sent_at = {}
+    headers = {"X-Telegram-Bot-Api-Secret-Token": SECRET}
+    connector = aiohttp.TCPConnector(limit=args.connections)
+    async with aiohttp.ClientSession(connector=connector) as client:
+        pending = set()
+
+        async def post(update):
+            async with client.post(url, json=update, headers=headers) as response:
+                assert response.status == 200, response.status
+
+        async def send(update):
+            sent_at[update["update_id"]] = time.perf_counter()
+            task = asyncio.create_task(post(update))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+        await inject(updates, args.rate, send)
+        await asyncio.wait_for(done.wait(), timeout=120)
+        if pending:
+            await asyncio.gather(*pending)
+
+    await runner.cleanup()
+    await telegram.stop()
+    return summarize("webhook", handled, sent_at)
+
+
+async def run(args) -> dict:
+    results = {"updates": args.updates, "rate": args.rate, "work_ms": args.work_ms}
+    results.update(await run_polling(args))
+    results.update(await run_webhook(args))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--updates", type=int, default=5000)
+    parser.add_argument("--rate", type=float, default=1000, help="апдейтов в секунду, 0 - все сразу")
+    parser.add_argument("--work-ms", type=float, default=5)
+    parser.add_argument("--connections", type=int, default=50)
+    parser.add_argument("--output")
+    args = parser.parse_args()
+
+    report("webhook", asyncio.run(run(args)), args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import json
+import platform
+import subprocess
+from datetime import datetime, timezone
+
+
+def percentile(values: list[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, round(q / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+def latency_summary(latencies: list[float]) -> dict[str, float]:
+    """Перцентили задержек в миллисекундах"""
+    return {
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def git_revision() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def report(benchmark: str, results: dict, output: str | None = None) -> dict:
+    """
+    Печатает результаты и, если указан output, дописывает их строкой JSON,
+    чтобы можно было сравнивать запуски между собой.
+    """
+    record = {
+        "benchmark": benchmark,
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "results": results,
+    }
+    print(json.dumps(record, indent=2, ensure_ascii=False))
+    if output:
+        with open(output, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    return record
+
+
+
+def load_baseline(path: str, benchmark: str) -> dict | None:
+    """Результаты последнего запуска benchmark из файла, который дописывает report"""
+    baseline = None
+    try:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                if record.get("benchmark") == benchmark:
+                    baseline = record["results"]
+    except FileNotFoundError:
+        return None
+    return baseline
+
+
+def regressions(results: dict, baseline: dict, tolerance: float) -> list[str]:
+    """
+    Метрики, которые стали хуже базового запуска больше чем на tolerance:
+    *_per_sec должны не падать, *_ms - не расти
+    """
+    found = []
+    for key, value in results.items():
+        previous = baseline.get(key)
+        if not isinstance(value, (int, float)) or not isinstance(previous, (int, float)) or not previous:
+            continue
+        if key.endswith("_per_sec") and value < previous * (1 - tolerance):
+            found.append(f"{key}: {previous} -> {value}")
+        elif key.endswith("_ms") and value > previous * (1 + tolerance):
+            found.append(f"{key}: {previous} -> {value}")
+    return found
@@ -0,0 +1,77 @@
+import random
+
+ITEM_NAMES = [
+    "Batwing", "Song", "Icebreaker", "Harvester", "Gingerblade", "Corrupt",
+    "Chroma Lightbringer", "Red seer", "Red anger", "Anger from the heaven",
+]
+SET_NAMES = ["Anger set", "Winter set", "Halloween set", "Chroma set"]
+
+ORDER_TEMPLATE = """
+Order #{order_number}
+{items}
+The order is paid for.
+Payment Amount: {total} RUB
+Payment ID: Tinkoff Payment: 5060809602
+
+Purchaser information:
+Ваш_ник_в_ROBLOX: {roblox_name}
+Введите_ваш_телеграм_: Pavel
+Phone: +79265377051
+
+Additional information:
+Transaction ID: 9961889:{transaction_id}
+Block ID: rec784210467
+Form Name: Cart
+https://mm2guns.com/knifes
+"""
+
+
+def order_message(
+        transaction_id: int,
+        items: list[tuple[str, int, int]],
+        roblox_name: str = "vepe211",
+) -> str:
+    """Сообщение о заказе в формате формы оплаты, как в tests/test_parser.py"""
+    lines = [
+        f"{i + 1}. {name}: {amount * price} ({amount} x {price})"
+        for i, (name, amount, price) in enumerate(items)
+    ]
+    return ORDER_TEMPLATE.format(
+        order_number=1905848770 + transaction_id,
+        items="\n".join(lines),
+        total=sum(amount * price for _, amount, price in items),
+        roblox_name=roblox_name,
+        transaction_id=6682510345 + transaction_id,
+    ).strip()  # Telegram обрезает пробелы по краям текста
+
+
+def random_items(rng: random.Random, max_items: int = 8, set_ratio: float = 0.2) -> list[tuple[str, int, int]]:
+    items = []
+    for _ in range(rng.randint(1, max_items)):
+        names = SET_NAMES if rng.random() < set_ratio else ITEM_NAMES
+        items.append((rng.choice(names), rng.randint(1, 5), rng.choice([49, 99, 159, 299])))
+    return items
+
+
+def generate_orders(
+        count: int,
+        duplicate_ratio: float = 0.0,
+        malformed_ratio: float = 0.0,
+        seed: int = 0,
+        start: int = 0,
+) -> list[str]:
+    """
+    Корпус сообщений о заказах. Часть сообщений может повторять
+    уже отправленные заказы или быть испорченной.
+    """
+    rng = random.Random(seed)
+    orders = []
+    for i in range(start, start + count):
+        roll = rng.random()
+        if orders and roll < duplicate_ratio:
+            orders.append(rng.choice(orders))
+        elif duplicate_ratio <= roll < duplicate_ratio + malformed_ratio:
+            orders.append(order_message(i, random_items(rng)).replace("Transaction ID", "Transaction"))
+        else:
+            orders.append(order_message(i, random_items(rng)))
+    return orders
@@ -2,13 +2,34 @@
 import asyncio
 import logging
 
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker
 from aiogram import Bot, Dispatcher
 
-from db.base import create_tables
-from handlers.base import register_handlers
+from db.cache import result_cache
+from db.catalog import set_catalog, alias_index
+from db.dedup import seen_transactions
+from db.engine import create_engine, parse_pragmas
+from db.migrations import migrate
+from db.repos import backfill_daily_stats, backfill_hourly_stats, backfill_item_stats
+from handlers.base import register_handlers, PRIVATE_ROUTERS
+from middlewares.concurrency import ConcurrencyLimitMiddleware
 from middlewares.db import DbSessionMiddleware
-from settings import DATABASE_URL, API_TOKEN, CHAT_ID
+from middlewares.metrics import MetricsMiddleware
+from services.delivery import DeliveryClient
+from services.metrics import metrics, start_metrics_server
+from services.outbox import OutboxWorker
+from services.profiler import profiler
+from services.webhook import run_webhook
+from settings import (
+	DATABASE_URL, SQLITE_PROFILE, SQLITE_PRAGMAS, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+	CACHE_TTL_ANALYTICS, CACHE_TTL_ITEMS_REPORT, CACHE_TTL_RECENTS, CACHE_TTL_SET_LIST, CACHE_TTL_ALIASES,
+	API_TOKEN, CHAT_ID, SERVICE_API_URL, SERVICE_BATCH_URL,
+	SERVICE_CONNECT_TIMEOUT, SERVICE_READ_TIMEOUT, SERVICE_MAX_CONCURRENCY,
+	OUTBOX_WORKERS, OUTBOX_MAX_ATTEMPTS, OUTBOX_RETRY_BASE_DELAY, OUTBOX_RETRY_MAX_DELAY, OUTBOX_POLL_INTERVAL, OUTBOX_LEASE,
+	OUTBOX_BATCH_SIZE, OUTBOX_BATCH_DELAY_MS,
+	CONCURRENT_UPDATES, UPDATE_WORKERS, METRICS_HOST, METRICS_PORT,
+	BOT_MODE, WEBHOOK_BASE_URL, WEBHOOK_PATH, WEBHOOK_SECRET, WEBHOOK_HOST, WEBHOOK_PORT,
+)
 from utils import extract_commands
 
 # Логирование
@@ -16,27 +37,123 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def create_dispatcher(
+		sessionmaker: async_sessionmaker,
+		outbox: OutboxWorker,
+		update_workers: int | None = None,
+) -> Dispatcher:
+	dp = Dispatcher()
+	if update_workers is not None:
+		dp.update.middleware(ConcurrencyLimitMiddleware(update_workers))
+	# Сессия нужна только обработчикам с флагом session, поэтому middleware внутренний.
+	# Метрики стоят раньше, чтобы время обработчика включало закрытие сессии
+	metrics_middleware = MetricsMiddleware(metrics)
+	session_middleware = DbSessionMiddleware(session_pool=sessionmaker)
+	for observer in (dp.message, dp.callback_query):
+		observer.middleware(metrics_middleware)
+		observer.middleware(session_middleware)
+	dp["outbox"] = outbox
+
+	register_handlers(dp)
+	return dp
+
+
+async def init_database(engine: AsyncEngine, sessionmaker: async_sessionmaker) -> None:
+	"""Миграции, загрузка справочников в память и заполнение пустых сводок"""
+	logger.info(f"Database schema version {await migrate(engine)}")
+
+	async with sessionmaker() as session:
+		await set_catalog.load(session)
+		await alias_index.load(session)
+		await seen_transactions.load(session)
+		if await backfill_daily_stats(session):
+			logger.info("Filled daily stats from existing transactions")
+		if await backfill_hourly_stats(session):
+			logger.info("Filled hourly stats from existing transactions")
+		if await backfill_item_stats(session):
+			logger.info("Filled daily item stats from existing transactions")
+	logger.info(f"Loaded {seen_transactions.stats()['known']} known transaction ids")
+
+
 async def main():
-	engine = create_async_engine(url=DATABASE_URL, echo=False)
+	if BOT_MODE == "webhook" and not WEBHOOK_SECRET:
+		raise RuntimeError("WEBHOOK_SECRET is required when BOT_MODE=webhook")
+	if CONCURRENT_UPDATES and UPDATE_WORKERS < 1:
+		raise RuntimeError("UPDATE_WORKERS must be positive when CONCURRENT_UPDATES=true")
+
+	engine = create_engine(
+		DATABASE_URL,
+		sqlite_profile=SQLITE_PROFILE,
+		pragmas=parse_pragmas(SQLITE_PRAGMAS),
+		pool_size=DB_POOL_SIZE,
+		max_overflow=DB_MAX_OVERFLOW,
+		pool_timeout=DB_POOL_TIMEOUT,
+		pool_recycle=DB_POOL_RECYCLE,
+	)
 	sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+	result_cache.ttls.update(
+		analytics=CACHE_TTL_ANALYTICS,
+		items_report=CACHE_TTL_ITEMS_REPORT,
+		recents=CACHE_TTL_RECENTS,
+		set_list=CACHE_TTL_SET_LIST,
+		aliases=CACHE_TTL_ALIASES,
+	)
 
-	await create_tables(engine)
+	await init_database(engine, sessionmaker)
+
+	delivery = DeliveryClient(
+		SERVICE_API_URL,
+		connect_timeout=SERVICE_CONNECT_TIMEOUT,
+		read_timeout=SERVICE_READ_TIMEOUT,
+		max_concurrency=SERVICE_MAX_CONCURRENCY,
+		batch_url=SERVICE_BATCH_URL,
+	)
+	outbox = OutboxWorker(
+		sessionmaker,
+		delivery,
+		workers=OUTBOX_WORKERS,
+		max_attempts=OUTBOX_MAX_ATTEMPTS,
+		base_delay=OUTBOX_RETRY_BASE_DELAY,
+		max_delay=OUTBOX_RETRY_MAX_DELAY,
+		poll_interval=OUTBOX_POLL_INTERVAL,
+		lease=OUTBOX_LEASE,
+		batch_size=OUTBOX_BATCH_SIZE,
+		batch_delay=OUTBOX_BATCH_DELAY_MS / 1000,
+	)
 
 	# Инициализация бота и диспетчера
 	bot = Bot(token=API_TOKEN)
-	dp = Dispatcher()
-	dp.update.middleware(DbSessionMiddleware(session_pool=sessionmaker))
+	dp = create_dispatcher(sessionmaker, outbox, UPDATE_WORKERS if CONCURRENT_UPDATES else None)
 
 	logger.info(f"Setup for {CHAT_ID} chat")
 
-	register_handlers(dp)
-
-	commands = extract_commands(dp)
+	commands = extract_commands(dp, exclude=PRIVATE_ROUTERS)
 	logger.info(commands)
-	# Запуск поллинга
 	await bot.set_my_commands(commands)
 
-	await dp.start_polling(bot)
+	metrics_server = await start_metrics_server(METRICS_HOST, METRICS_PORT) if METRICS_PORT else None
+	await outbox.start()
+	try:
+		if BOT_MODE == "webhook":
+			await run_webhook(
+				dp,
+				bot,
+				base_url=WEBHOOK_BASE_URL,
+				path=WEBHOOK_PATH,
+				secret_token=WEBHOOK_SECRET,
+				host=WEBHOOK_HOST,
+				port=WEBHOOK_PORT,
+			)
+		else:
+			# Запуск поллинга, вебхук мог остаться от запуска в режиме webhook
+			await bot.delete_webhook()
+			await dp.start_polling(bot, handle_as_tasks=CONCURRENT_UPDATES)
+	finally:
+		await profiler.stop()
+		await outbox.stop()
+		await delivery.close()
+		if metrics_server is not None:
+			await metrics_server.cleanup()
 
 
 if __name__ == '__main__':
@@ -1,5 +1,13 @@
-from sqlalchemy.ext.asyncio import AsyncEngine
+import asyncio
+import contextlib
+import weakref
+
+from sqlalchemy import Table, DateTime, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import declarative_base
+from sqlalchemy.sql.expression import FunctionElement
 
 
 # Базовый класс для моделей SQLAlchemy
@@ -9,3 +17,62 @@ Base = declarative_base()
 async def create_tables(engine: AsyncEngine):
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
+
+
+class utc_now(FunctionElement):
+    """
+    Текущее время в UTC без часового пояса, как datetime.utcnow() в приложении.
+    func.now() в postgresql отдает локальное время сервера бд
+    """
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(utc_now)
+def _utc_now(element, compiler, **kw):
+    # CURRENT_TIMESTAMP в SQLite всегда в UTC
+    return "CURRENT_TIMESTAMP"
+
+
+@compiles(utc_now, "postgresql")
+def _utc_now_postgresql(element, compiler, **kw):
+    return "timezone('utc', now())"
+
+
+class hour_start(FunctionElement):
+    """Начало часа для DateTime в том виде, в каком диалект хранит DateTime"""
+    type = DateTime()
+    inherit_cache = True
+
+
+@compiles(hour_start)
+def _hour_start(element, compiler, **kw):
+    # SQLAlchemy хранит DateTime в SQLite строкой с микросекундами
+    return compiler.process(func.strftime("%Y-%m-%d %H:00:00.000000", *element.clauses), **kw)
+
+
+@compiles(hour_start, "postgresql")
+def _hour_start_postgresql(element, compiler, **kw):
+    return compiler.process(func.date_trunc("hour", *element.clauses), **kw)
+
+
+def insert(session: AsyncSession, table: type[Base] | Table):
+    """INSERT с поддержкой ON CONFLICT для диалекта текущей бд"""
+    if session.bind.dialect.name == "postgresql":
+        return postgresql.insert(table)
+    return sqlite.insert(table)
+
+
+# SQLite пропускает одного писателя, остальные крутятся в busy handler и ловят "database is locked".
+# Пишущие транзакции процесса встают в очередь заранее, в postgresql блокировка не нужна
+_sqlite_write_locks: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock] = weakref.WeakKeyDictionary()
+
+
+def write_lock(session: AsyncSession) -> contextlib.AbstractAsyncContextManager:
+    if session.bind.dialect.name != "sqlite":
+        return contextlib.nullcontext()
+    # asyncio.Lock привязывается к циклу событий, поэтому у каждого цикла своя
+    loop = asyncio.get_running_loop()
+    if loop not in _sqlite_write_locks:
+        _sqlite_write_locks[loop] = asyncio.Lock()
+    return _sqlite_write_locks[loop]
@@ -0,0 +1,140 @@
+import asyncio
+import collections
+import functools
+import time
+from typing import Any, Awaitable, Callable, Hashable
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+# Время жизни результатов по командам в секундах, 0 - без кэша
+DEFAULT_TTLS = {
+    "analytics": 30,
+    "items_report": 30,
+    "recents": 5,
+    "set_list": 60,
+    "aliases": 60,
+}
+
+
+class ResultCache:
+    """
+    Короткоживущий кэш результатов функций чтения из db.repos.
+    Одинаковые одновременные запросы ждут один запрос в бд, записи сбрасываются
+    по тегам при изменении данных: transactions, sets, aliases.
+    Кэш в памяти процесса и сбрасывается только его же изменениями.
+    """
+
+    def __init__(self, ttls: dict[str, float] | None = None, max_entries: int = 1024, clock=time.monotonic):
+        self.ttls = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self.max_entries = max_entries
+        self.clock = clock
+        # Ключ -> (истекает, результат, теги)
+        self._entries: dict[Hashable, tuple[float, Any, tuple[str, ...]]] = {}
+        self._inflight: dict[Hashable, asyncio.Task] = {}
+        self._tags: dict[str, set[Hashable]] = collections.defaultdict(set)
+        self._generations: collections.Counter[str] = collections.Counter()
+        self._stats: dict[str, collections.Counter[str]] = collections.defaultdict(collections.Counter)
+        self.invalidations: collections.Counter[str] = collections.Counter()
+
+    def enabled(self, name: str) -> bool:
+        return self.ttls.get(name, 0) > 0
+
+    def cached(self, name: str, tags: tuple[str, ...]):
+        """Кэширует асинхронную функцию, у которой первый аргумент - сессия"""
+
+        def decorator(func: Callable[..., Awaitable[Any]]):
+            @functools.wraps(func)
+            async def wrapper(session: AsyncSession, *args, **kwargs):
+                if not self.enabled(name):
+                    return await func(session, *args, **kwargs)
+                ttl = self.ttls[name]
+                # Сессии разных бд не должны видеть результаты друг друга
+                key = (name, session.bind, args, tuple(sorted(kwargs.items())))
+                return await self.get_or_load(key, name, ttl, tags, lambda: func(session, *args, **kwargs))
+
+            return wrapper
+
+        return decorator
+
+    async def get_or_load(
+            self,
+            key: Hashable,
+            name: str,
+            ttl: float,
+            tags: tuple[str, ...],
+            loader: Callable[[], Awaitable[Any]],
+    ) -> Any:
+        stats = self._stats[name]
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > self.clock():
+            stats["hits"] += 1
+            return entry[1]
+        if entry is not None:
+            self._remove(key)
+
+        task = self._inflight.get(key)
+        if task is not None:
+            stats["coalesced"] += 1
+        else:
+            stats["misses"] += 1
+            generations = tuple(self._generations[tag] for tag in tags)
+            task = asyncio.ensure_future(loader())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._loaded, key, ttl, tags, generations))
+        # Отмена одного ожидающего не отменяет запрос для остальных
+        return await asyncio.shield(task)
+
+    def _loaded(self, key: Hashable, ttl: float, tags: tuple[str, ...], generations: tuple[int, ...], task) -> None:
+        self._inflight.pop(key, None)
+        if task.cancelled() or task.exception() is not None:
+            return
+        # Данные поменялись, пока шел запрос: такой результат уже устарел
+        if generations != tuple(self._generations[tag] for tag in tags):
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        if len(self._entries) >= self.max_entries:
+            self._evict()
+        self._entries[key] = (self.clock() + ttl, task.result(), tags)
+        for tag in tags:
+            self._tags[tag].add(key)
+
+    def _remove(self, key: Hashable) -> None:
+        # Ключ уходит и из тегов, иначе они растут, пока тег не сбросят
+        _, _, tags = self._entries.pop(key)
+        for tag in tags:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def _evict(self) -> None:
+        now = self.clock()
+        for key in [key for key, (expires_at, _, _) in self._entries.items() if expires_at <= now]:
+            self._remove(key)
+        # Если все записи живые, уходят самые старые
+        while len(self._entries) >= self.max_entries:
+            self._remove(next(iter(self._entries)))
+
+    def invalidate(self, tag: str) -> None:
+        self._generations[tag] += 1
+        self.invalidations[tag] += 1
+        for key in list(self._tags.get(tag, ())):
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._tags.clear()
+
+    def stats(self) -> dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "tagged_keys": sum(len(keys) for keys in self._tags.values()),
+            "commands": {name: dict(counter) for name, counter in self._stats.items()},
+            "invalidations": dict(self.invalidations),
+        }
+
+
+result_cache = ResultCache()
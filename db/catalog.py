@@ -0,0 +1,139 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Set, Alias
+from schemas import Item
+from services.metrics import Metrics, metrics
+
+
+def normalize_name(name: str) -> str:
+    return " ".join(name.split()).casefold()
+
+
+class SetCatalog:
+    """
+    Сеты и их предметы в памяти процесса, ключ - нормализованное название сета.
+    Загружается один раз и сбрасывается при любом изменении сетов,
+    поэтому раскрытие сетов в заказе не делает запросов в бд.
+    Поколение растет при каждом сбросе: загрузка, во время которой сеты изменились,
+    не сохраняется, иначе каталог остался бы со старыми сетами до следующего изменения.
+    """
+
+    def __init__(self):
+        self._sets: dict[str, tuple[tuple[str, int], ...]] | None = None
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.loads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._sets is not None
+
+    async def load(self, session: AsyncSession) -> dict[str, tuple[tuple[str, int], ...]]:
+        generation = self._generation
+        result = await session.execute(select(Set))
+        sets = {
+            normalize_name(s.set_name): tuple((i.item_name, i.amount) for i in s.items)
+            for s in result.unique().scalars().all()
+        }
+        self.loads += 1
+        if generation == self._generation:
+            self._sets = sets
+        return sets
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._sets = None
+
+    async def get(self, session: AsyncSession, name: str) -> tuple[tuple[str, int], ...] | None:
+        sets = self._sets
+        if sets is None:
+            sets = await self.load(session)
+
+        items = sets.get(normalize_name(name))
+        if items is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return items
+
+    async def expand(self, session: AsyncSession, items: list[Item]) -> list[Item]:
+        """Заменяет сеты в заказе на предметы из которых они состоят"""
+        actual_items = []
+        for item in items:
+            set_items = await self.get(session, item.name)
+            if set_items is None:
+                actual_items.append(item)
+                continue
+            actual_items.extend(
+                Item(name=name, amount=amount * item.amount, unit_price=0)
+                for name, amount in set_items
+            )
+        return actual_items
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "sets": len(self._sets) if self._sets is not None else 0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "loads": self.loads,
+        }
+
+    def register_metrics(self, registry: Metrics) -> None:
+        for key, name, kind, description in (
+                ("hits", "bot_set_catalog_hits_total", "counter", "Order items found in the set catalog"),
+                ("misses", "bot_set_catalog_misses_total", "counter", "Order items that are not sets"),
+                ("loads", "bot_set_catalog_loads_total", "counter", "Set catalog loads from the database"),
+                ("sets", "bot_set_catalog_sets", "gauge", "Sets in the loaded catalog"),
+        ):
+            registry.collect(name, kind, description, lambda key=key: self.stats()[key])
+
+
+class AliasIndex:
+    """
+    Псевдонимы предметов в памяти: нормализованное оригинальное имя -> псевдоним.
+    Обновляется точечно при изменении псевдонимов, поэтому поиск
+    при разборе заказа это один поиск в словаре без запросов в бд.
+    Как и в SetCatalog, загрузка, во время которой псевдонимы изменились, не сохраняется.
+    """
+
+    def __init__(self):
+        self._aliases: dict[str, str] | None = None
+        self._generation = 0
+
+    async def load(self, session: AsyncSession) -> dict[str, str]:
+        generation = self._generation
+        result = await session.execute(select(Alias.origin_name, Alias.alias_name))
+        aliases = {normalize_name(origin): alias for origin, alias in result.all()}
+        if generation == self._generation:
+            self._aliases = aliases
+        return aliases
+
+    def set(self, origin_name: str, alias_name: str) -> None:
+        self._generation += 1
+        if self._aliases is not None:
+            self._aliases[normalize_name(origin_name)] = alias_name
+
+    def discard(self, origin_name: str) -> None:
+        self._generation += 1
+        if self._aliases is not None:
+            self._aliases.pop(normalize_name(origin_name), None)
+
+    def resolve(self, name: str) -> str:
+        return self._aliases.get(normalize_name(name), name)
+
+    async def resolve_items(self, session: AsyncSession, items: list[Item]) -> list[Item]:
+        """Заменяет названия предметов в заказе на их псевдонимы"""
+        aliases = self._aliases
+        if aliases is None:
+            aliases = await self.load(session)
+
+        for item in items:
+            item.name = aliases.get(normalize_name(item.name), item.name)
+        return items
+
+
+set_catalog = SetCatalog()
+set_catalog.register_metrics(metrics)
+alias_index = AliasIndex()
@@ -0,0 +1,135 @@
+import collections
+import hashlib
+import math
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Transaction
+from db.repos import is_transaction_processed
+from services.metrics import Metrics, metrics
+
+
+class BloomFilter:
+    """
+    Множество строк с ложноположительными ответами, но без ложноотрицательных.
+    Размер считается из ожидаемого количества элементов и доли ложных срабатываний;
+    если элементов больше, ложных срабатываний становится больше, но ответ "нет" остается точным.
+    """
+
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self._bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str):
+        # Двойное хэширование: k позиций из двух половин одного blake2b
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, key: str) -> None:
+        for position in self._positions(key):
+            self._bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self._bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+class SeenTransactions:
+    """
+    Передний слой дедупликации заказов перед захватом transaction_id в бд.
+    Недавние transaction_id лежат в ограниченном LRU, все известные - в фильтре Блума,
+    который заполняется из таблицы transactions при старте.
+    Повтор из LRU отклоняется без запроса, промах фильтра значит "точно новый",
+    и только при срабатывании фильтра делается SELECT 1 по индексу.
+    Фильтр знает только транзакции своего процесса, например старый процесс во время перезапуска
+    мог сохранить заказ уже после загрузки фильтра. От таких повторов защищает захват transaction_id в бд.
+    """
+
+    def __init__(self, lru_size: int = 10000, capacity: int = 1_000_000, error_rate: float = 0.01):
+        self.lru_size = lru_size
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self._recent: collections.OrderedDict[str, None] = collections.OrderedDict()
+        self._bloom: BloomFilter | None = None
+        self.lru_hits = 0
+        self.bloom_negatives = 0
+        self.db_checks = 0
+        self.db_hits = 0
+        self.loads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self._bloom is not None
+
+    async def load(self, session: AsyncSession) -> None:
+        bloom = BloomFilter(self.capacity, self.error_rate)
+        self._recent.clear()
+        result = await session.stream_scalars(select(Transaction.transaction_id).order_by(Transaction.id))
+        async for transaction_id in result:
+            bloom.add(transaction_id)
+            self._remember(transaction_id)
+        self._bloom = bloom
+        self.loads += 1
+
+    def _remember(self, transaction_id: str) -> None:
+        self._recent[transaction_id] = None
+        self._recent.move_to_end(transaction_id)
+        if len(self._recent) > self.lru_size:
+            self._recent.popitem(last=False)
+
+    def add(self, transaction_id: str) -> None:
+        """Запоминает transaction_id, который сохранен в бд этим или другим обработчиком"""
+        self._remember(transaction_id)
+        if self._bloom is not None:
+            self._bloom.add(transaction_id)
+
+    async def is_processed(self, session: AsyncSession, transaction_id: str) -> bool:
+        if transaction_id in self._recent:
+            self._recent.move_to_end(transaction_id)
+            self.lru_hits += 1
+            return True
+        if self._bloom is not None and transaction_id not in self._bloom:
+            self.bloom_negatives += 1
+            return False
+
+        # Фильтр мог ошибиться или еще не загружен, проверяем по уникальному индексу
+        self.db_checks += 1
+        if not await is_transaction_processed(session, transaction_id):
+            return False
+        self.db_hits += 1
+        self._remember(transaction_id)
+        return True
+
+    def stats(self) -> dict[str, int | float]:
+        checks = self.lru_hits + self.bloom_negatives + self.db_checks
+        return {
+            "recent": len(self._recent),
+            "known": self._bloom.count if self._bloom is not None else 0,
+            "lru_hits": self.lru_hits,
+            "bloom_negatives": self.bloom_negatives,
+            "db_checks": self.db_checks,
+            "db_hits": self.db_hits,
+            # Доля проверок, которые обошлись без запроса в бд
+            "hit_rate": round((self.lru_hits + self.bloom_negatives) / checks, 4) if checks else 0.0,
+            # Срабатывания фильтра на новых transaction_id
+            "false_positives": self.db_checks - self.db_hits,
+            "loads": self.loads,
+        }
+
+    def register_metrics(self, registry: Metrics) -> None:
+        for key, name, kind, description in (
+                ("lru_hits", "bot_dedup_lru_hits_total", "counter", "Repeated orders rejected from the LRU"),
+                ("bloom_negatives", "bot_dedup_bloom_negatives_total", "counter", "New orders passed by the filter"),
+                ("db_checks", "bot_dedup_db_checks_total", "counter", "Order checks that queried the database"),
+                ("hit_rate", "bot_dedup_hit_rate", "gauge", "Share of order checks without a database query"),
+        ):
+            registry.collect(name, kind, description, lambda key=key: self.stats()[key])
+
+
+seen_transactions = SeenTransactions()
+seen_transactions.register_metrics(metrics)
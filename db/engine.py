@@ -0,0 +1,93 @@
+import re
+from typing import Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+
+
+# Набор PRAGMA, которые выполняются на каждом новом соединении с SQLite.
+# default - настройки SQLite как есть: журнал отката, synchronous=FULL, без ожидания блокировки
+SQLITE_PROFILES: dict[str, dict[str, Any]] = {
+    "default": {},
+    # WAL без потери надежности: читатели не блокируют писателя, каждый коммит с fsync
+    "safe": {
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "busy_timeout": 5000,
+    },
+    # WAL с fsync только на чекпоинтах: коммит не теряется при падении процесса,
+    # при отключении питания можно потерять последние коммиты, но бд не портится
+    "fast": {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "busy_timeout": 5000,
+        "cache_size": -64000,  # 64 МБ, отрицательное значение в КБ
+        "mmap_size": 268435456,  # 256 МБ
+        "temp_store": "MEMORY",
+    },
+}
+
+
+PRAGMA_PATTERN = re.compile(r"^(?P<name>[a-z_]+)=(?P<value>-?\w+)$")
+
+
+def parse_pragmas(value: str | None) -> dict[str, str]:
+    """Переопределения PRAGMA из строки вида "cache_size=-20000,mmap_size=0" """
+    pragmas = {}
+    for pair in (value or "").split(","):
+        if not pair.strip():
+            continue
+        # Значения подставляются в текст PRAGMA, поэтому пропускаем только слова и числа
+        match = PRAGMA_PATTERN.match(pair.strip().replace(" ", ""))
+        if match is None:
+            raise ValueError(f"Invalid pragma {pair.strip()!r}, expected name=value")
+        pragmas[match["name"]] = match["value"]
+    return pragmas
+
+
+def sqlite_pragmas(profile: str, overrides: dict[str, Any] | None = None) -> dict[str, Any]:
+    if profile not in SQLITE_PROFILES:
+        raise ValueError(f"Unknown SQLite profile {profile!r}, expected one of {', '.join(SQLITE_PROFILES)}")
+    return {**SQLITE_PROFILES[profile], **(overrides or {})}
+
+
+def create_engine(
+        url: str,
+        sqlite_profile: str = "fast",
+        pragmas: dict[str, Any] | None = None,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30,
+        pool_recycle: int = 1800,
+        echo: bool = False,
+) -> AsyncEngine:
+    """
+    Асинхронный движок для DATABASE_URL.
+    SQLite (sqlite+aiosqlite) получает PRAGMA из профиля на каждом соединении,
+    PostgreSQL (postgresql+asyncpg) - пул с проверкой соединений перед выдачей.
+    """
+    database_url = make_url(url)
+    is_sqlite = database_url.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and database_url.database in (None, "", ":memory:")
+
+    kwargs: dict[str, Any] = {"echo": echo}
+    # Бд в памяти живет в одном соединении (StaticPool), размеры пула к нему не применимы
+    if not in_memory:
+        kwargs.update(pool_size=pool_size, max_overflow=max_overflow, pool_timeout=pool_timeout)
+    if not is_sqlite:
+        kwargs.update(pool_recycle=pool_recycle, pool_pre_ping=True)
+
+    engine = create_async_engine(url, **kwargs)
+
+    if is_sqlite:
+        settings = sqlite_pragmas(sqlite_profile, pragmas)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def apply_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for name, value in settings.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+            cursor.close()
+
+    return engine
@@ -0,0 +1,286 @@
+import logging
+from dataclasses import dataclass
+from typing import Callable
+
+from sqlalchemy import (
+    JSON, Column, Connection, Date, DateTime, Float, ForeignKey, Index, Integer, MetaData, String, Table, func, inspect,
+    select,
+)
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+
+# Таблица версий живет отдельно от моделей, create_all ее не трогает
+schema_version = Table(
+    "schema_version",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, server_default=func.now()),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[[Connection], None]
+
+
+def has_column(conn: Connection, table: str, column: str) -> bool:
+    return any(c["name"] == column for c in inspect(conn).get_columns(table))
+
+
+def create_index(conn: Connection, name: str, table: str, *columns: str, unique: bool = False) -> None:
+    conn.exec_driver_sql(
+        f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({', '.join(columns)})"
+    )
+
+
+# Миграции идут строго по версиям и не должны меняться после выпуска, поэтому таблицы
+# в них описаны отдельно от моделей. Новая бд проходит все шаги с первого.
+# Бд старых версий бота могли получить часть изменений из create_all,
+# поэтому шаги проверяют, что изменение еще не применено
+
+
+def base_columns() -> tuple[Column, ...]:
+    # Колонки BaseModel на момент первой версии схемы
+    return (
+        Column("id", Integer, primary_key=True, index=True),
+        Column("created_at", DateTime, server_default=func.now()),
+        Column("updated_at", DateTime, server_default=func.now()),
+    )
+
+
+# Схема версии 1: таблицы исходного бота, очередь отправки и сводка по дням
+V1 = MetaData()
+Table(
+    "transactions", V1,
+    Column("transaction_id", String, unique=True, nullable=False),
+    Column("roblox_name", String),
+    Column("total_price", Float),
+    Column("timestamp", DateTime, server_default=func.now()),
+    *base_columns(),
+)
+Table(
+    "item_transaction", V1,
+    Column("transaction_id", ForeignKey("transactions.id")),
+    Column("amount", Integer),
+    Column("item_name", String),
+    Column("unit_price", Float),
+    *base_columns(),
+)
+Table(
+    "sets", V1,
+    Column("set_name", String, unique=True, nullable=False),
+    *base_columns(),
+)
+Table(
+    "set_items", V1,
+    Column("set_id", ForeignKey("sets.id")),
+    Column("item_name", String),
+    Column("amount", Integer),
+    *base_columns(),
+)
+Table(
+    "aliases", V1,
+    Column("origin_name", String, index=True),
+    Column("alias_name", String),
+    *base_columns(),
+)
+Table(
+    "daily_stats", V1,
+    Column("day", Date, primary_key=True),
+    Column("transactions", Integer, nullable=False),
+    Column("spent", Float, nullable=False),
+)
+Table(
+    "outbox", V1,
+    Column("transaction_id", ForeignKey("transactions.id"), unique=True, nullable=False),
+    Column("payload", JSON, nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("next_attempt_at", DateTime, index=True),
+    Column("last_error", String, nullable=True),
+    *base_columns(),
+)
+
+DAILY_ITEM_STATS = Table(
+    "daily_item_stats", MetaData(),
+    Column("day", Date, primary_key=True),
+    Column("item_name", String, primary_key=True),
+    Column("orders", Integer, nullable=False),
+    Column("quantity", Integer, nullable=False),
+    Column("revenue", Float, nullable=False),
+)
+
+HOURLY_STATS = Table(
+    "hourly_stats", MetaData(),
+    Column("hour", DateTime, primary_key=True),
+    Column("transactions", Integer, nullable=False),
+    Column("spent", Float, nullable=False),
+)
+
+ALIASES = Table(
+    "aliases", MetaData(),
+    Column("origin_name", String, nullable=False),
+    Column("alias_name", String),
+    *base_columns(),
+    Index("ix_aliases_origin_name", "origin_name", unique=True),
+    Index("ix_aliases_alias_name", "alias_name"),
+)
+
+
+def initial_schema(conn: Connection) -> None:
+    # Недостающие таблицы: для бд исходного бота это outbox и daily_stats
+    V1.create_all(conn)
+
+
+def transaction_status(conn: Connection) -> None:
+    if not has_column(conn, "transactions", "status"):
+        conn.exec_driver_sql("ALTER TABLE transactions ADD COLUMN status VARCHAR(9)")
+
+
+def unique_alias_origin(conn: Connection) -> None:
+    # Раньше один оригинал мог получить несколько псевдонимов, действует последний
+    conn.exec_driver_sql(
+        "DELETE FROM aliases WHERE id NOT IN (SELECT max(id) FROM aliases GROUP BY origin_name)"
+    )
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_aliases_origin_name")
+    create_index(conn, "ix_aliases_origin_name", "aliases", "origin_name", unique=True)
+    create_index(conn, "ix_aliases_alias_name", "aliases", "alias_name")
+
+
+def lookup_indexes(conn: Connection) -> None:
+    # Последние транзакции и аналитика по времени
+    create_index(conn, "ix_transactions_timestamp_id", "transactions", "timestamp", "id")
+    # Отчет по предметам и загрузка предметов транзакции
+    create_index(conn, "ix_item_transaction_item_name", "item_transaction", "item_name")
+    create_index(conn, "ix_item_transaction_transaction_id", "item_transaction", "transaction_id")
+    # Загрузка предметов сета
+    create_index(conn, "ix_set_items_set_id", "set_items", "set_id")
+
+
+def item_transaction_fk(conn: Connection) -> None:
+    # Обработчик заказов записывал в item_transaction.transaction_id внешний Transaction ID.
+    # Такие строки привязываем к транзакции по нему, правильные ссылки не трогаем
+    conn.exec_driver_sql(
+        "UPDATE item_transaction SET transaction_id = ("
+        " SELECT t.id FROM transactions t WHERE t.transaction_id = CAST(item_transaction.transaction_id AS TEXT))"
+        " WHERE transaction_id NOT IN (SELECT id FROM transactions)"
+        " AND EXISTS ("
+        " SELECT 1 FROM transactions t WHERE t.transaction_id = CAST(item_transaction.transaction_id AS TEXT))"
+    )
+    if not has_column(conn, "item_transaction", "external_transaction_id"):
+        conn.exec_driver_sql("ALTER TABLE item_transaction ADD COLUMN external_transaction_id VARCHAR")
+    conn.exec_driver_sql(
+        "UPDATE item_transaction SET external_transaction_id = ("
+        " SELECT t.transaction_id FROM transactions t WHERE t.id = item_transaction.transaction_id)"
+        " WHERE external_transaction_id IS NULL"
+    )
+    create_index(conn, "ix_item_transaction_external_transaction_id", "item_transaction", "external_transaction_id")
+    # Покрывающий индекс заменяет индекс только по названию
+    create_index(conn, "ix_item_transaction_item_name_amount", "item_transaction", "item_name", "amount")
+    conn.exec_driver_sql("DROP INDEX IF EXISTS ix_item_transaction_item_name")
+
+
+def daily_item_stats(conn: Connection) -> None:
+    # Таблица заполняется из истории при старте бота, как и daily_stats
+    DAILY_ITEM_STATS.create(conn, checkfirst=True)
+
+
+def hourly_stats(conn: Connection) -> None:
+    HOURLY_STATS.create(conn, checkfirst=True)
+
+
+def backfill_transaction_status(conn: Connection) -> None:
+    # Транзакции до появления статуса уже были отправлены старым обработчиком.
+    # Записи из очереди не трогаем, их статус ведет OutboxWorker
+    conn.exec_driver_sql(
+        "UPDATE transactions SET status = 'completed'"
+        " WHERE status IS NULL AND id NOT IN (SELECT transaction_id FROM outbox)"
+    )
+
+
+def utc_timestamp_defaults(conn: Connection) -> None:
+    # now() в postgresql - локальное время сервера, а время в бд хранится в UTC.
+    # В SQLite CURRENT_TIMESTAMP уже в UTC
+    if conn.dialect.name != "postgresql":
+        return
+    columns = [("transactions", "timestamp")] + [
+        (table, column)
+        for table in ("transactions", "item_transaction", "sets", "set_items", "aliases", "outbox")
+        for column in ("created_at", "updated_at")
+    ]
+    for table, column in columns:
+        conn.exec_driver_sql(f"ALTER TABLE {table} ALTER COLUMN {column} SET DEFAULT timezone('utc', now())")
+
+
+def alias_origin_not_null(conn: Connection) -> None:
+    # Псевдоним без оригинала ничего не заменяет
+    conn.exec_driver_sql("DELETE FROM aliases WHERE origin_name IS NULL")
+    if conn.dialect.name != "sqlite":
+        conn.exec_driver_sql("ALTER TABLE aliases ALTER COLUMN origin_name SET NOT NULL")
+        return
+
+    inspector = inspect(conn)
+    if not any(c["name"] == "origin_name" and c["nullable"] for c in inspector.get_columns("aliases")):
+        return
+    # SQLite не меняет ограничения колонки, таблица пересоздается
+    for index in inspector.get_indexes("aliases"):
+        conn.exec_driver_sql(f"DROP INDEX {index['name']}")
+    conn.exec_driver_sql("ALTER TABLE aliases RENAME TO aliases_old")
+    ALIASES.create(conn)
+    conn.exec_driver_sql(
+        "INSERT INTO aliases (id, origin_name, alias_name, created_at, updated_at)"
+        " SELECT id, origin_name, alias_name, created_at, updated_at FROM aliases_old"
+    )
+    conn.exec_driver_sql("DROP TABLE aliases_old")
+
+
+def recount_item_orders(conn: Connection) -> None:
+    # В orders считались строки заказа, а не заказы. Пустую сводку бот заново заполнит из истории при старте
+    conn.exec_driver_sql("DELETE FROM daily_item_stats")
+
+
+MIGRATIONS = [
+    Migration(1, "initial schema", initial_schema),
+    Migration(2, "transaction status", transaction_status),
+    Migration(3, "unique alias origin", unique_alias_origin),
+    Migration(4, "lookup indexes", lookup_indexes),
+    Migration(5, "item transaction fk", item_transaction_fk),
+    Migration(6, "daily item stats", daily_item_stats),
+    Migration(7, "hourly stats", hourly_stats),
+    Migration(8, "backfill transaction status", backfill_transaction_status),
+    Migration(9, "utc timestamp defaults", utc_timestamp_defaults),
+    Migration(10, "alias origin not null", alias_origin_not_null),
+    Migration(11, "recount item orders", recount_item_orders),
+]
+
+
+async def current_version(conn: AsyncConnection) -> int:
+    await conn.run_sync(schema_version.create, checkfirst=True)
+    return await conn.scalar(select(func.coalesce(func.max(schema_version.c.version), 0)))
+
+
+async def migrate(engine: AsyncEngine, migrations: list[Migration] = MIGRATIONS) -> int:
+    """
+    Применяет миграции новее текущей версии бд, каждую в своей транзакции вместе с записью версии.
+    Если схема актуальна, стоит один запрос к таблице версий. Возвращает версию схемы.
+    """
+    async with engine.begin() as conn:
+        version = await current_version(conn)
+
+    for migration in migrations:
+        if migration.version <= version:
+            continue
+        async with engine.begin() as conn:
+            if conn.dialect.name == "sqlite":
+                # pysqlite не открывает транзакцию перед DDL, без BEGIN миграция применилась бы частично
+                await conn.exec_driver_sql("BEGIN")
+            await conn.run_sync(migration.upgrade)
+            await conn.execute(schema_version.insert().values(version=migration.version, name=migration.name))
+        logger.info(f"Applied migration {migration.version}: {migration.name}")
+        version = migration.version
+
+    return version
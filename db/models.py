@@ -1,27 +1,36 @@
 from datetime import datetime
 
-from sqlalchemy import Integer, Column, ForeignKey, Float, String, DateTime, func
+from sqlalchemy import Integer, Column, ForeignKey, Float, String, DateTime, Date, JSON, Enum, Index
 from sqlalchemy.orm import relationship, Mapped
 
-from db.base import Base
+from db.base import Base, utc_now
+from schemas import TransactionStatus
 
 
 class BaseModel(Base):
     __abstract__ = True
 
     id = Column(Integer, primary_key=True, index=True)
-    created_at = Column(DateTime, server_default=func.now())
-    updated_at = Column(DateTime, onupdate=datetime.now, server_default=func.now())
+    # Все время в бд хранится в UTC без часового пояса
+    created_at = Column(DateTime, server_default=utc_now())
+    updated_at = Column(DateTime, onupdate=datetime.utcnow, server_default=utc_now())
 
 
 class ItemEntity(BaseModel):
     __tablename__ = "item_transaction"
 
-    transaction_id = Column(ForeignKey('transactions.id'))
+    transaction_id = Column(ForeignKey('transactions.id'), index=True)
+    # Transaction ID из сообщения о заказе, копия для отчетов без join с transactions
+    external_transaction_id = Column(String, index=True, nullable=True)
     amount = Column(Integer)  # Количество предметов
     item_name = Column(String)  # Название предмета
     unit_price = Column(Float)  # Цена за единицу
 
+    __table_args__ = (
+        # Покрывающий индекс для отчета по предметам: группировка без чтения таблицы
+        Index("ix_item_transaction_item_name_amount", "item_name", "amount"),
+    )
+
     @property
     def total_price(self) -> float:
         return float(self.unit_price * self.amount)
@@ -34,22 +43,74 @@ class Transaction(BaseModel):
     transaction_id = Column(String, unique=True, nullable=False)
     roblox_name = Column(String)
     total_price = Column(Float)  # Общая стоимость
-    # status = Column(String, default=TransactionStatus.sent, nullable=True)
+    status = Column(Enum(TransactionStatus, native_enum=False), default=TransactionStatus.sent, nullable=True)
     items: Mapped[list[ItemEntity]] = relationship("ItemEntity", lazy="joined")
-    timestamp = Column(DateTime, default=datetime.utcnow, server_default=func.now())  # Время транзакции
+    timestamp = Column(DateTime, default=datetime.utcnow, server_default=utc_now())  # Время транзакции в UTC
+
+    __table_args__ = (
+        # Для постраничного вывода последних транзакций по (timestamp, id)
+        Index("ix_transactions_timestamp_id", "timestamp", "id"),
+    )
+
+
+# Сводка транзакций по дням, обновляется вместе с сохранением транзакции
+class DailyStats(Base):
+    __tablename__ = "daily_stats"
+
+    day = Column(Date, primary_key=True)
+    transactions = Column(Integer, nullable=False, default=0)  # Количество транзакций
+    spent = Column(Float, nullable=False, default=0)  # Сумма транзакций
+
+
+# Сводка транзакций по часам для аналитики за произвольный период
+class HourlyStats(Base):
+    __tablename__ = "hourly_stats"
+
+    hour = Column(DateTime, primary_key=True)  # Начало часа в UTC
+    transactions = Column(Integer, nullable=False, default=0)
+    spent = Column(Float, nullable=False, default=0)
+
+
+# Сводка по предметам за день: строки заказов, количество и выручка.
+# Обновляется вместе с сохранением транзакции, отчет по предметам читает только ее
+class DailyItemStats(Base):
+    __tablename__ = "daily_item_stats"
+
+    day = Column(Date, primary_key=True)
+    item_name = Column(String, primary_key=True)
+    orders = Column(Integer, nullable=False, default=0)  # Строк заказов с предметом
+    quantity = Column(Integer, nullable=False, default=0)  # Количество предметов
+    revenue = Column(Float, nullable=False, default=0)  # Сумма по цене за единицу
+
+
+# Очередь заказов на отправку в веб сервис
+class OutboxEntry(BaseModel):
+    __tablename__ = "outbox"
+
+    transaction_id = Column(ForeignKey('transactions.id'), unique=True, nullable=False)
+    payload = Column(JSON, nullable=False)  # Тело запроса к веб сервису
+    attempts = Column(Integer, default=0, nullable=False)
+    # Время следующей попытки, NULL - попытки закончились
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, index=True)
+    last_error = Column(String, nullable=True)
+
+    transaction: Mapped["Transaction"] = relationship("Transaction")
 
 
 class Set(BaseModel):
     __tablename__ = "sets"
 
     set_name = Column(String, unique=True, nullable=False)
-    items: Mapped[list["SetItem"]] = relationship("SetItem", lazy="joined")
+    # Предметы сета удаляются вместе с сетом и при замене списка предметов
+    items: Mapped[list["SetItem"]] = relationship(
+        "SetItem", lazy="joined", back_populates="set", cascade="all, delete-orphan",
+    )
 
 
 class SetItem(BaseModel):
     __tablename__ = "set_items"
 
-    set_id = Column(ForeignKey('sets.id'))
+    set_id = Column(ForeignKey('sets.id'), index=True)
     item_name = Column(String)
     amount = Column(Integer)  # Количество предметов в сете
 
@@ -59,5 +120,5 @@ class SetItem(BaseModel):
 class Alias(BaseModel):
     __tablename__ = "aliases"
 
-    origin_name = Column(String, index=True)
-    alias_name = Column(String)
+    origin_name = Column(String, index=True, unique=True, nullable=False)
+    alias_name = Column(String, index=True)
@@ -0,0 +1,95 @@
+import base64
+import binascii
+import dataclasses
+import struct
+from datetime import datetime, timedelta
+from typing import Any, Callable, Generic, Sequence, TypeVar
+
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+EPOCH = datetime(1970, 1, 1)
+
+
+@dataclasses.dataclass
+class Page(Generic[T]):
+    items: Sequence[T]
+    next_cursor: str | None
+    prev_cursor: str | None
+
+    def map(self, func: Callable[[T], R]) -> "Page[R]":
+        """Та же страница с преобразованными строками, курсоры не меняются"""
+        return dataclasses.replace(self, items=[func(item) for item in self.items])
+
+
+def to_key(value: datetime) -> int:
+    """Время в микросекундах, чтобы курсор состоял только из целых чисел"""
+    return (value - EPOCH) // timedelta(microseconds=1)
+
+
+def from_key(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+def encode_cursor(backward: bool, key: tuple[int, ...]) -> str:
+    raw = struct.pack(f">?{len(key)}q", backward, *key)
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, size: int) -> tuple[bool, tuple[int, ...]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        backward, *key = struct.unpack(f">?{size}q", raw)
+    except (binascii.Error, struct.error, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+    return backward, tuple(key)
+
+
+async def keyset_page(
+        session: AsyncSession,
+        stmt: Select,
+        columns: tuple,
+        key_of: Callable[[Any], tuple[int, ...]],
+        cursor: str | None = None,
+        limit: int = 10,
+        descending: bool = False,
+        decode_key: Callable[[tuple[int, ...]], tuple] = lambda key: key,
+) -> Page:
+    """
+    Страница по ключу (keyset): вместо OFFSET берутся строки после ключа
+    последней показанной строки, поэтому дальние страницы стоят столько же, сколько первая.
+    Курсор хранит направление и ключ крайней строки страницы.
+    """
+    backward = False
+    if cursor is not None:
+        backward, key = decode_cursor(cursor, len(columns))
+        # При листании вперед по убыванию нужны строки с меньшим ключом
+        if backward == descending:
+            stmt = stmt.where(tuple_(*columns) > tuple_(*decode_key(key)))
+        else:
+            stmt = stmt.where(tuple_(*columns) < tuple_(*decode_key(key)))
+
+    # Назад идем в обратном порядке и потом разворачиваем строки
+    reverse = backward != descending
+    stmt = stmt.order_by(*(column.desc() if reverse else column.asc() for column in columns))
+
+    result = await session.execute(stmt.limit(limit + 1))
+    items = list(result.scalars().unique().all())
+    has_more = len(items) > limit
+    items = items[:limit]
+    if backward:
+        items.reverse()
+
+    if not items:
+        return Page(items=items, next_cursor=None, prev_cursor=None)
+
+    has_next = has_more if not backward else True
+    has_prev = has_more if backward else cursor is not None
+    return Page(
+        items=items,
+        next_cursor=encode_cursor(False, key_of(items[-1])) if has_next else None,
+        prev_cursor=encode_cursor(True, key_of(items[0])) if has_prev else None,
+    )
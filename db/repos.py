@@ -1,32 +1,323 @@
-from datetime import timedelta, datetime
-from typing import Sequence
+from datetime import date, time, timedelta, datetime
+from typing import Sequence, AsyncIterator
 import re
 
-from sqlalchemy import select, func
+from sqlalchemy import select, func, update, delete, case, literal, Row
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import joinedload
+from sqlalchemy.orm import selectinload, make_transient_to_detached
+
+from db.base import insert, write_lock, utc_now, hour_start
+from db.cache import result_cache
+from db.catalog import set_catalog, alias_index
+from db.pagination import Page, keyset_page, to_key, from_key
+from db.models import Transaction, Set, ItemEntity, SetItem, Alias, OutboxEntry, DailyStats, DailyItemStats, HourlyStats
+from schemas import TransactionStatus, SetInfo, SetItemInfo, TransactionInfo, TransactionItemInfo, AliasInfo
+from services.metrics import metrics
+
+
+def timed(func):
+    """
+    Время и ошибки функции в метриках bot_repo_*. Оборачиваются только функции, которые
+    вызывают снаружи модуля: вложенные вызовы уже входят во время вызывающей функции
+    """
+    return metrics.timed("bot_repo_seconds", "bot_repo_errors_total", func.__name__)(func)
+
+
+# Кэшируемые функции чтения возвращают копии строк: объекты ORM привязаны к сессии,
+# в которой загружены, а результат из кэша получают обработчики с другими сессиями
+def set_info(s: Set) -> SetInfo:
+    return SetInfo(
+        id=s.id,
+        set_name=s.set_name,
+        items=tuple(SetItemInfo(item_name=i.item_name, amount=i.amount) for i in s.items),
+    )
+
+
+def transaction_info(t: Transaction) -> TransactionInfo:
+    return TransactionInfo(
+        id=t.id,
+        transaction_id=t.transaction_id,
+        roblox_name=t.roblox_name,
+        total_price=t.total_price,
+        status=t.status,
+        timestamp=t.timestamp,
+        items=tuple(
+            TransactionItemInfo(item_name=i.item_name, amount=i.amount, unit_price=i.unit_price) for i in t.items
+        ),
+    )
+
 
-from db.models import Transaction, Set, ItemEntity, SetItem, Alias
+def alias_info(a: Alias) -> AliasInfo:
+    return AliasInfo(id=a.id, origin_name=a.origin_name, alias_name=a.alias_name)
 
 
-async def is_transaction_processed(session, transaction_id):
-    result = await session.execute(select(Transaction).filter_by(transaction_id=transaction_id))
+@timed
+async def is_transaction_processed(session: AsyncSession, transaction_id: str) -> bool:
+    # Проверка только по уникальному индексу transaction_id, без чтения строки и предметов
+    result = await session.execute(select(literal(1)).where(Transaction.transaction_id == transaction_id))
     return result.scalar() is not None
 
 
-# Функция для сохранения нового transaction_id в базе данных
-async def save_transaction(session: AsyncSession, transaction: Transaction):
-    async with session.begin():
+async def record_daily_stats(session: AsyncSession, transaction: Transaction) -> None:
+    stmt = insert(session, DailyStats).values(
+        day=transaction.timestamp.date(),
+        transactions=1,
+        spent=transaction.total_price or 0,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyStats.day],
+        set_={
+            "transactions": DailyStats.transactions + 1,
+            "spent": DailyStats.spent + stmt.excluded.spent,
+        },
+    )
+    await session.execute(stmt)
+
+
+async def record_hourly_stats(session: AsyncSession, transaction: Transaction) -> None:
+    stmt = insert(session, HourlyStats).values(
+        hour=transaction.timestamp.replace(minute=0, second=0, microsecond=0),
+        transactions=1,
+        spent=transaction.total_price or 0,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[HourlyStats.hour],
+        set_={
+            "transactions": HourlyStats.transactions + 1,
+            "spent": HourlyStats.spent + stmt.excluded.spent,
+        },
+    )
+    await session.execute(stmt)
+
+
+async def record_item_stats(session: AsyncSession, day: date, items: list[ItemEntity]) -> None:
+    # Одинаковые предметы в заказе складываются заранее: ON CONFLICT не обновляет строку дважды за запрос.
+    # Заказ считается один раз, сколько бы строк с предметом в нем ни было
+    totals: dict[str, list] = {}
+    for item in items:
+        _, quantity, revenue = totals.setdefault(item.item_name, [1, 0, 0.0])
+        totals[item.item_name] = [1, quantity + item.amount, revenue + item.amount * (item.unit_price or 0)]
+    if not totals:
+        return
+
+    stmt = insert(session, DailyItemStats).values([
+        {"day": day, "item_name": name, "orders": orders, "quantity": quantity, "revenue": revenue}
+        for name, (orders, quantity, revenue) in totals.items()
+    ])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[DailyItemStats.day, DailyItemStats.item_name],
+        set_={
+            "orders": DailyItemStats.orders + stmt.excluded.orders,
+            "quantity": DailyItemStats.quantity + stmt.excluded.quantity,
+            "revenue": DailyItemStats.revenue + stmt.excluded.revenue,
+        },
+    )
+    await session.execute(stmt)
+
+
+# Занимает transaction_id одним INSERT ... ON CONFLICT DO NOTHING.
+# Возвращает id новой строки или None, если транзакцию уже занял другой обработчик
+async def claim_transaction(session: AsyncSession, transaction: Transaction) -> int | None:
+    if transaction.timestamp is None:
+        transaction.timestamp = datetime.utcnow()
+    stmt = insert(session, Transaction).values(
+        transaction_id=transaction.transaction_id,
+        roblox_name=transaction.roblox_name,
+        total_price=transaction.total_price,
+        status=transaction.status,
+        timestamp=transaction.timestamp,
+    )
+    stmt = stmt.on_conflict_do_nothing(index_elements=[Transaction.transaction_id]).returning(Transaction.id)
+    return await session.scalar(stmt)
+
+
+# Функция для сохранения нового transaction_id в базе данных.
+# Предметы и связанные записи пишутся только после успешного захвата transaction_id
+async def save_transaction(session: AsyncSession, transaction: Transaction, *related) -> bool:
+    async with write_lock(session):
+        transaction_pk = await claim_transaction(session, transaction)
+        if transaction_pk is None:
+            await session.rollback()
+            return False
+
+        # Строка уже вставлена, дальше ORM дописывает только предметы и связанные записи
+        items = list(transaction.items)
+        transaction.id = transaction_pk
+        make_transient_to_detached(transaction)
         session.add(transaction)
+        for item in items:
+            item.transaction_id = transaction_pk
+            item.external_transaction_id = transaction.transaction_id
+        session.add_all(items)
+        session.add_all(related)
+        await record_daily_stats(session, transaction)
+        await record_hourly_stats(session, transaction)
+        await record_item_stats(session, transaction.timestamp.date(), items)
+        await session.commit()
+    result_cache.invalidate("transactions")
+    return True
+
+
+# Сохраняет транзакцию и ставит её в очередь на отправку одним коммитом.
+# None, если transaction_id уже обработан
+@timed
+async def enqueue_transaction(session: AsyncSession, transaction: Transaction, payload: dict) -> OutboxEntry | None:
+    transaction.status = TransactionStatus.sent
+    entry = OutboxEntry(transaction=transaction, payload=payload, attempts=0, next_attempt_at=datetime.utcnow())
+    if not await save_transaction(session, transaction, entry):
+        return None
+
+    return entry
+
+
+# Заполняет сводку по дням из таблицы транзакций, если она еще пустая
+@timed
+async def backfill_daily_stats(session: AsyncSession) -> bool:
+    async with write_lock(session):
+        if await session.scalar(select(DailyStats.day).limit(1)) is not None:
+            return False
+
+        day = func.date(Transaction.timestamp)
+        await session.execute(
+            insert(session, DailyStats).from_select(
+                ["day", "transactions", "spent"],
+                select(day, func.count(Transaction.id), func.coalesce(func.sum(Transaction.total_price), 0))
+                .group_by(day),
+            )
+        )
+        await session.commit()
+    result_cache.invalidate("transactions")
+    return True
+
+
+# Заполняет сводку по часам из истории транзакций, если она еще пустая
+@timed
+async def backfill_hourly_stats(session: AsyncSession) -> bool:
+    async with write_lock(session):
+        if await session.scalar(select(HourlyStats.hour).limit(1)) is not None:
+            return False
+
+        hour = hour_start(Transaction.timestamp)
+        await session.execute(
+            insert(session, HourlyStats).from_select(
+                ["hour", "transactions", "spent"],
+                select(hour, func.count(Transaction.id), func.coalesce(func.sum(Transaction.total_price), 0))
+                .where(Transaction.timestamp.is_not(None))
+                .group_by(hour),
+            )
+        )
         await session.commit()
+    result_cache.invalidate("transactions")
+    return True
+
+
+# Заполняет сводку по предметам из истории транзакций, если она еще пустая
+@timed
+async def backfill_item_stats(session: AsyncSession) -> bool:
+    async with write_lock(session):
+        if await session.scalar(select(DailyItemStats.day).limit(1)) is not None:
+            return False
+
+        day = func.date(Transaction.timestamp)
+        await session.execute(
+            insert(session, DailyItemStats).from_select(
+                ["day", "item_name", "orders", "quantity", "revenue"],
+                select(
+                    day,
+                    ItemEntity.item_name,
+                    func.count(ItemEntity.transaction_id.distinct()),
+                    func.coalesce(func.sum(ItemEntity.amount), 0),
+                    func.coalesce(func.sum(ItemEntity.amount * ItemEntity.unit_price), 0),
+                )
+                .join(Transaction, ItemEntity.transaction_id == Transaction.id)
+                .where(ItemEntity.item_name.is_not(None))
+                .group_by(day, ItemEntity.item_name),
+            )
+        )
+        await session.commit()
+    result_cache.invalidate("transactions")
+    return True
 
 
-async def get_all_sets(session: AsyncSession, start: int = 0, end: int = 10) -> Sequence[Set]:
-    stmt = select(Set).offset(start).limit(end)
-    result = await session.execute(stmt)
-    return result.scalars().unique().all()
+# Забирает записи, у которых подошло время попытки, и откладывает их на время аренды.
+# Следующие опросы, в том числе после перезапуска бота, не возьмут эти записи, пока аренда не истечет
+@timed
+async def claim_due_outbox(session: AsyncSession, limit: int, lease: float) -> Sequence[OutboxEntry]:
+    now = datetime.utcnow()
+    due = (
+        select(OutboxEntry.id)
+        .where(OutboxEntry.next_attempt_at <= now)
+        .order_by(OutboxEntry.next_attempt_at)
+        .limit(limit)
+    )
+    async with write_lock(session):
+        result = await session.execute(
+            update(OutboxEntry)
+            .where(OutboxEntry.id.in_(due.scalar_subquery()), OutboxEntry.next_attempt_at <= now)
+            .values(next_attempt_at=now + timedelta(seconds=lease))
+            .returning(OutboxEntry)
+        )
+        entries = result.scalars().all()
+        await session.commit()
+
+    return entries
+
+
+# Время попадает в метрики complete_outbox_entries
+async def complete_outbox_entry(session: AsyncSession, entry: OutboxEntry) -> None:
+    await complete_outbox_entries(session, [entry])
+
+
+# Отправленные одной пачкой заказы подтверждаются одним коммитом
+@timed
+async def complete_outbox_entries(session: AsyncSession, entries: list[OutboxEntry]) -> None:
+    async with write_lock(session):
+        await session.execute(delete(OutboxEntry).where(OutboxEntry.id.in_([e.id for e in entries])))
+        await session.execute(
+            update(Transaction)
+            .where(Transaction.id.in_([e.transaction_id for e in entries]))
+            .values(status=TransactionStatus.completed)
+        )
+        await session.commit()
+
+
+@timed
+async def retry_outbox_entry(session: AsyncSession, entry: OutboxEntry, next_attempt_at: datetime, error: str) -> None:
+    async with write_lock(session):
+        await session.execute(
+            update(OutboxEntry)
+            .where(OutboxEntry.id == entry.id)
+            .values(attempts=OutboxEntry.attempts + 1, next_attempt_at=next_attempt_at, last_error=error)
+        )
+        await session.commit()
 
 
+# Попытки закончились: запись остается в очереди без времени следующей попытки
+@timed
+async def fail_outbox_entry(session: AsyncSession, entry: OutboxEntry, error: str) -> None:
+    async with write_lock(session):
+        await session.execute(
+            update(OutboxEntry)
+            .where(OutboxEntry.id == entry.id)
+            .values(attempts=OutboxEntry.attempts + 1, next_attempt_at=None, last_error=error)
+        )
+        await session.execute(
+            update(Transaction)
+            .where(Transaction.id == entry.transaction_id)
+            .values(status=TransactionStatus.failed)
+        )
+        await session.commit()
+
+
+@timed
+@result_cache.cached("set_list", tags=("sets",))
+async def get_all_sets(session: AsyncSession, cursor: str | None = None, limit: int = 10) -> Page[SetInfo]:
+    stmt = select(Set).options(selectinload(Set.items))
+    page = await keyset_page(session, stmt, (Set.id,), lambda s: (s.id,), cursor, limit)
+    return page.map(set_info)
+
+
+@timed
 async def add_set_command(session: AsyncSession, message: str) -> str:
     # Регулярное выражение для парсинга команды
     set_pattern = r'/add_set\s"([^"]+)"\s((?:".+?\sx\d+",?\s*)+)'
@@ -69,113 +360,222 @@ async def add_set_command(session: AsyncSession, message: str) -> str:
 
 
 async def add_set(session: AsyncSession, set: Set, items: list[ItemEntity]):
-    for item in items:
-        session.add(item)
-    session.add(set)
-    await session.commit()
+    async with write_lock(session):
+        for item in items:
+            session.add(item)
+        session.add(set)
+        await session.commit()
+    set_catalog.invalidate()
+    result_cache.invalidate("sets")
     await session.refresh(set)
 
 
+@timed
 async def search_sets(session: AsyncSession, name: str) -> Set | None:
     stmt = select(Set).where(Set.set_name == name)
     result = await session.execute(stmt)
-    return result.unique().scalar_one()
+    return result.unique().scalar_one_or_none()
 
 
+@timed
 async def change_set(session: AsyncSession, set: Set) -> None:
-    for item in set.items:
-        session.add(item)
-    await session.merge(set)
-    await session.commit()
+    async with write_lock(session):
+        for item in set.items:
+            session.add(item)
+        await session.merge(set)
+        await session.commit()
+    set_catalog.invalidate()
+    result_cache.invalidate("sets")
+
+
+@timed
+async def import_sets(session: AsyncSession, sets: dict[str, list[tuple[str, int]]]) -> dict[str, bool]:
+    """
+    Массовая загрузка сетов одной транзакцией: сеты добавляются или обновляются
+    одним INSERT ... ON CONFLICT, их предметы полностью заменяются.
+    Возвращает для каждого сета True, если он был создан, и False, если обновлен
+    """
+    if not sets:
+        return {}
+
+    async with write_lock(session):
+        result = await session.execute(select(Set.set_name).where(Set.set_name.in_(sets)))
+        existing = set(result.scalars().all())
+
+        stmt = insert(session, Set)
+        stmt = stmt.on_conflict_do_update(index_elements=[Set.set_name], set_={"updated_at": utc_now()})
+        await session.execute(stmt, [{"set_name": set_name} for set_name in sets])
+
+        result = await session.execute(select(Set.set_name, Set.id).where(Set.set_name.in_(sets)))
+        set_ids = dict(result.all())
+
+        await session.execute(delete(SetItem).where(SetItem.set_id.in_(set_ids.values())))
+        await session.execute(insert(session, SetItem), [
+            {"set_id": set_ids[set_name], "item_name": item_name, "amount": amount}
+            for set_name, items in sets.items()
+            for item_name, amount in items
+        ])
+        await session.commit()
+    set_catalog.invalidate()
+    result_cache.invalidate("sets")
 
+    return {set_name: set_name not in existing for set_name in sets}
 
+
+@timed
 async def find_set_by_name(session: AsyncSession, set_name: str) -> Set | None:
     # Поиск сета по названию
     result = await session.execute(select(Set).where(Set.set_name == set_name))
     return result.scalars().first()
 
 
+@timed
+@result_cache.cached("analytics", tags=("transactions",))
 async def get_analytics(session: AsyncSession):
-    now = datetime.utcnow()
+    today = datetime.utcnow().date()
 
-    # Аналитика за последнюю неделю
-    week_ago = now - timedelta(days=7)
-    month_ago = now - timedelta(days=30)
+    # Аналитика за последние 7 и 30 дней, включая сегодня, по сводке за дни одним запросом
+    week_ago = today - timedelta(days=6)
+    month_ago = today - timedelta(days=29)
 
-    # Запросы для аналитики
-    week_transactions = await session.execute(
-        select(func.count(Transaction.id)).filter(Transaction.timestamp >= week_ago)
-    )
-    month_transactions = await session.execute(
-        select(func.count(Transaction.id)).filter(Transaction.timestamp >= month_ago)
-    )
-    total_transactions = await session.execute(
-        select(func.count(Transaction.id))
-    )
+    def since(day, column):
+        return func.coalesce(func.sum(case((DailyStats.day >= day, column), else_=0)), 0)
 
-    # Подсчет потраченных средств
-    week_spent = await session.execute(
-        select(func.sum(Transaction.total_price)).where(Transaction.timestamp >= week_ago)
-    )
-    month_spent = await session.execute(
-        select(func.sum(Transaction.total_price)).where(Transaction.timestamp >= month_ago)
-    )
-    total_spent = await session.execute(
-        select(func.sum(Transaction.total_price))
+    result = await session.execute(
+        select(
+            since(week_ago, DailyStats.transactions),
+            since(month_ago, DailyStats.transactions),
+            func.coalesce(func.sum(DailyStats.transactions), 0),
+            since(week_ago, DailyStats.spent),
+            since(month_ago, DailyStats.spent),
+            func.coalesce(func.sum(DailyStats.spent), 0),
+        )
     )
+    week_transactions, month_transactions, total_transactions, week_spent, month_spent, total_spent = result.one()
 
     return {
-        'week_transactions': week_transactions.scalar(),
-        'month_transactions': month_transactions.scalar(),
-        'total_transactions': total_transactions.scalar(),
-        'week_spent': week_spent.scalar() or 0,
-        'month_spent': month_spent.scalar() or 0,
-        'total_spent': total_spent.scalar() or 0
+        'week_transactions': week_transactions,
+        'month_transactions': month_transactions,
+        'total_transactions': total_transactions,
+        'week_spent': week_spent,
+        'month_spent': month_spent,
+        'total_spent': total_spent
     }
 
 
-async def get_items_report(session: AsyncSession):
-    # Группировка по типам предметов и подсчет общего количества
-    items_report = await session.execute(
-        select(
-            ItemEntity.item_name,
-            func.count(ItemEntity.item_name),
-            func.sum(ItemEntity.amount)
-        ).group_by(ItemEntity.item_name)
+# Шаг и колонка сводки для каждого размера интервала
+ANALYTICS_BUCKETS = {
+    "hour": (HourlyStats, HourlyStats.hour, timedelta(hours=1)),
+    "day": (DailyStats, DailyStats.day, timedelta(days=1)),
+}
+
+
+@timed
+@result_cache.cached("analytics", tags=("transactions",))
+async def get_analytics_series(
+        session: AsyncSession,
+        start: datetime,
+        end: datetime,
+        bucket: str = "day",
+) -> list[tuple[datetime, int, float]]:
+    """
+    Транзакции и сумма по интервалам [start, end) в UTC одним запросом к сводке.
+    Интервалы без транзакций заполняются нулями
+    """
+    table, column, step = ANALYTICS_BUCKETS[bucket]
+    if bucket == "day":
+        start, end = datetime.combine(start.date(), time()), datetime.combine(end.date(), time())
+    else:
+        start = start.replace(minute=0, second=0, microsecond=0)
+    lower, upper = (start.date(), end.date()) if bucket == "day" else (start, end)
+
+    result = await session.execute(
+        select(column, table.transactions, table.spent)
+        .where(column >= lower, column < upper)
+        .order_by(column)
     )
+    rows = {
+        (datetime.combine(key, time()) if bucket == "day" else key): (transactions, spent)
+        for key, transactions, spent in result.all()
+    }
 
-    return items_report.all()
+    series = []
+    point = start
+    while point < end:
+        transactions, spent = rows.get(point, (0, 0.0))
+        series.append((point, transactions, spent))
+        point += step
+    return series
 
 
-async def get_recent_transactions(session: AsyncSession, start: int = 0, limit: int = 10):
-    # Получение транзакций с заданным смещением (start) и лимитом (limit)
-    query = (
-        select(Transaction)
-        .options(joinedload(Transaction.items))  # Загрузка связанных предметов
-        .order_by(Transaction.timestamp.desc())  # Сортировка по времени
-        .offset(start)  # Смещение от начала
-        .limit(limit)  # Лимит на количество транзакций
+def items_report_query(days: int | None = None, limit: int | None = None):
+    # Топ предметов по количеству из сводки по дням, размер не зависит от длины истории
+    stmt = (
+        select(
+            DailyItemStats.item_name,
+            func.sum(DailyItemStats.orders).label("orders"),
+            func.sum(DailyItemStats.quantity).label("quantity"),
+            func.sum(DailyItemStats.revenue).label("revenue"),
+        )
+        .group_by(DailyItemStats.item_name)
+        .order_by(func.sum(DailyItemStats.quantity).desc(), DailyItemStats.item_name)
+        .limit(limit)
     )
+    if days is not None:
+        # За N дней - сегодня и N - 1 день до него
+        stmt = stmt.where(DailyItemStats.day >= datetime.utcnow().date() - timedelta(days=days - 1))
+    return stmt
 
-    result = await session.execute(query)
-    transactions = result.scalars().unique().all()
 
-    return transactions
+@timed
+@result_cache.cached("items_report", tags=("transactions",))
+async def get_items_report(session: AsyncSession, days: int | None = None, limit: int | None = None):
+    items_report = await session.execute(items_report_query(days, limit))
+
+    return items_report.all()
 
 
-async def get_aliases(session: AsyncSession, start: int = 0, limit: int = 10) -> Sequence[Alias]:
-    query = (
-        select(Alias)
-        .offset(start)  # Смещение от начала
-        .limit(limit)  # Лимит на количество транзакций
+async def iter_items_report(
+        session: AsyncSession,
+        days: int | None = None,
+        limit: int | None = None,
+) -> AsyncIterator[Row]:
+    # Строки читаются из курсора по мере отправки, а не загружаются разом
+    result = await session.stream(items_report_query(days, limit))
+    async for row in result:
+        yield row
+
+
+@timed
+@result_cache.cached("recents", tags=("transactions",))
+async def get_recent_transactions(
+        session: AsyncSession,
+        cursor: str | None = None,
+        limit: int = 10,
+) -> Page[TransactionInfo]:
+    # Предметы загружаются отдельным запросом, чтобы LIMIT применялся к транзакциям
+    stmt = select(Transaction).options(selectinload(Transaction.items))
+    page = await keyset_page(
+        session,
+        stmt,
+        (Transaction.timestamp, Transaction.id),
+        lambda t: (to_key(t.timestamp), t.id),
+        cursor,
+        limit,
+        descending=True,
+        decode_key=lambda key: (from_key(key[0]), key[1]),
     )
+    return page.map(transaction_info)
 
-    result = await session.execute(query)
-    aliases = result.scalars().unique().all()
 
-    return aliases
+@timed
+@result_cache.cached("aliases", tags=("aliases",))
+async def get_aliases(session: AsyncSession, cursor: str | None = None, limit: int = 10) -> Page[AliasInfo]:
+    page = await keyset_page(session, select(Alias), (Alias.id,), lambda a: (a.id,), cursor, limit)
+    return page.map(alias_info)
 
 
+@timed
 async def get_alias(session: AsyncSession, origin_name: str) -> Alias | None:
     result = await session.execute(select(Alias).where(Alias.origin_name == origin_name))
     existing_alias = result.scalars().first()
@@ -183,30 +583,78 @@ async def get_alias(session: AsyncSession, origin_name: str) -> Alias | None:
     return existing_alias
 
 
+@timed
 async def change_alias(session: AsyncSession, alias: Alias) -> None:
-    await session.merge(alias)
-    await session.commit()
+    async with write_lock(session):
+        await session.merge(alias)
+        await session.commit()
+    result_cache.invalidate("aliases")
+    alias_index.set(alias.origin_name, alias.alias_name)
 
 
+@timed
 async def add_alias(session: AsyncSession, alias: Alias) -> int:
-    session.add(alias)
-    await session.commit()
+    async with write_lock(session):
+        session.add(alias)
+        await session.commit()
+    result_cache.invalidate("aliases")
+    alias_index.set(alias.origin_name, alias.alias_name)
     await session.refresh(alias)
 
     return alias.id
 
 
+@timed
 async def add_aliases(session: AsyncSession, aliases: list[Alias]):
+    async with write_lock(session):
+        for alias in aliases:
+            session.add(alias)
+        await session.commit()
+    result_cache.invalidate("aliases")
     for alias in aliases:
-        session.add(alias)
-    await session.commit()
+        alias_index.set(alias.origin_name, alias.alias_name)
+
+
+@timed
+async def import_aliases(session: AsyncSession, aliases: dict[str, str]) -> tuple[int, int]:
+    """
+    Массовый импорт псевдонимов одной транзакцией: один SELECT существующих имен
+    и один INSERT ... ON CONFLICT DO UPDATE. Возвращает (добавлено, обновлено)
+    """
+    if not aliases:
+        return 0, 0
+
+    async with write_lock(session):
+        result = await session.execute(select(Alias.origin_name).where(Alias.origin_name.in_(aliases)))
+        existing = set(result.scalars().all())
+
+        stmt = insert(session, Alias)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Alias.origin_name],
+            set_={"alias_name": stmt.excluded.alias_name, "updated_at": utc_now()},
+        )
+        await session.execute(stmt, [
+            {"origin_name": origin_name, "alias_name": alias_name}
+            for origin_name, alias_name in aliases.items()
+        ])
+        await session.commit()
+    result_cache.invalidate("aliases")
 
+    for origin_name, alias_name in aliases.items():
+        alias_index.set(origin_name, alias_name)
 
+    return len(aliases) - len(existing), len(existing)
+
+
+@timed
 async def remove_alias(session: AsyncSession, alias_name: str) -> int | None:
-    alias = await get_alias(session, alias_name)
-    if not alias:
-        return
-    await session.delete(alias)
-    await session.commit()
+    async with write_lock(session):
+        alias = await session.scalar(select(Alias).where(Alias.origin_name == alias_name))
+        if not alias:
+            return
+        await session.delete(alias)
+        await session.commit()
+    result_cache.invalidate("aliases")
+    alias_index.discard(alias.origin_name)
 
     return alias.id
@@ -1,68 +1,174 @@
 import re
-from typing import Sequence
+from datetime import datetime
 
-from db.models import Alias
-from schemas import ParsedMessageResult, Item
+from schemas import ParsedMessageResult, Item, ParseError, ParseOutcome, AliasInfo, SetInfo, TransactionInfo
 from utils import logger
 
 
-def format_aliases(aliases: Sequence[Alias]) -> str:
-	text = "Псевдонимы предметов:\n"
+# Форматтеры ниже возвращают одну запись, сообщение собирает utils.answer_chunked
+ALIASES_HEADER = "Псевдонимы предметов:\n"
+SETS_HEADER = "Все доступные сеты в боте:\n"
+TRANSACTIONS_HEADER = "Последние транзакции:\n"
+ITEMS_REPORT_HEADER = "Отчёт о предметах:\n"
+ANALYTICS_BUCKET_NAMES = {"hour": "по часам", "day": "по дням"}
 
-	for i, alias in enumerate(aliases):
-		text += f"{i + 1}. Оригинальное имя - {alias.origin_name}, Псевдоним - {alias.alias_name}\n"
 
-	return text
+def format_alias(i: int, alias: AliasInfo) -> str:
+	return f"{i + 1}. Оригинальное имя - {alias.origin_name}, Псевдоним - {alias.alias_name}\n"
 
 
-async def format_recent_transactions(transactions):
-	# Формируем сообщение о последних транзакциях
-	message = "Последние транзакции:\n"
+def format_set(i: int, s: SetInfo) -> str:
+	lines = [f"{i + 1}: Сет с названием: '{s.set_name}' Предметы в сете:\n"]
+	lines.extend(f"{item.item_name}: {item.amount}x\n" for item in s.items)
+	lines.append("\n")
+	return "".join(lines)
 
-	for transaction in transactions:
-		message += f"\nТранзакция ID: {transaction.transaction_id}\n"
-		message += f"ROBLOX имя: {transaction.roblox_name}\n"
-		message += f"Общая сумма: {transaction.total_price} RUB\n"
-		message += f"Дата: {transaction.timestamp}\n"
-		message += "Предметы:\n"
 
-		for item in transaction.items:
-			message += f"  - {item.item_name}: {item.amount} шт. по {item.unit_price} RUB (Итого: {item.total_price} RUB)\n"
+def format_transaction(transaction: TransactionInfo) -> str:
+	lines = [
+		f"\nТранзакция ID: {transaction.transaction_id}\n",
+		f"ROBLOX имя: {transaction.roblox_name}\n",
+		f"Общая сумма: {transaction.total_price} RUB\n",
+		f"Дата: {transaction.timestamp}\n",
+		"Предметы:\n",
+	]
+	lines.extend(
+		f"  - {item.item_name}: {item.amount} шт. по {item.unit_price} RUB (Итого: {item.total_price} RUB)\n"
+		for item in transaction.items
+	)
+	return "".join(lines)
 
-	return message
 
+def format_item_report(i: int, item_name: str, orders: int, quantity: int, revenue: float) -> str:
+	return f"{i + 1}. {item_name}: {quantity} шт. в {orders} заказах, {revenue:g} RUB\n"
 
-def parse_message(text: str) -> ParsedMessageResult | None:
-	# Регулярные выражения для извлечения данных
-	item_pattern = r"(\d+)\. ([\w\s]+): (\d+) \((\d+) x (\d+)\)"
-	roblox_pattern = r"Ваш_ник_в_ROBLOX: (\w+)"
-	transaction_id_pattern = r"Transaction ID: (\d+):(\d+)"
-	total_price_pattern = r"Payment Amount: (\d+)"
 
-	items = re.findall(item_pattern, text)
-	roblox_name = re.search(roblox_pattern, text)
-	transaction_id = re.search(transaction_id_pattern, text)
-	total_price_match = re.search(total_price_pattern, text)
+def format_analytics_point(point: datetime, transactions: int, spent: float, bucket: str) -> str:
+	label = point.strftime("%Y-%m-%d %H:00") if bucket == "hour" else point.strftime("%Y-%m-%d")
+	return f"{label}: {transactions} транз., {spent:g} RUB\n"
+
 
-	logger.info(f'Transaction id: {transaction_id}, roblox_username: {roblox_name}')
+def format_cache_stats(name: str, hits: int = 0, misses: int = 0, coalesced: int = 0) -> str:
+	total = hits + misses + coalesced
+	hit_rate = (hits + coalesced) / total if total else 0
+	return f"{name}: из кэша {hits}, из бд {misses}, ждали общий запрос {coalesced}, попаданий {hit_rate:.0%}\n"
 
-	if not roblox_name or not transaction_id:
-		return None  # Если не нашли обязательные данные
 
+def format_dedup_stats(lru_hits: int, bloom_negatives: int, db_checks: int, hit_rate: float) -> str:
+	return (
+		f"повторы из памяти {lru_hits}, новые по фильтру {bloom_negatives}, "
+		f"проверки в бд {db_checks}, без бд {hit_rate:.0%}\n"
+	)
+
+
+def format_catalog_stats(sets: int, hits: int, misses: int, loads: int) -> str:
+	return f"сетов {sets}, найдено сетов {hits}, обычных предметов {misses}, загрузок из бд {loads}\n"
+
+
+def format_latency(
+		name: str,
+		calls: int,
+		total_seconds: float,
+		p95_seconds: float,
+		errors: int = 0,
+		in_flight: int | None = None,
+) -> str:
+	average = total_seconds / calls * 1000 if calls else 0
+	line = f"{name}: {calls} выз., ошибок {errors}"
+	if in_flight is not None:
+		line += f", в работе {in_flight}"
+	return line + f", среднее {average:.1f} мс, p95 до {p95_seconds * 1000:g} мс\n"
+
+
+# Все поля заказа извлекаются одним проходом по тексту.
+# Каждая альтернатива обернута в именованную группу, по lastgroup понятно что совпало
+ORDER_PATTERN = re.compile(
+	r"^[ \t]*(?:"
+	r"(?P<item>\d+\. (?P<item_name>[^:\n]+?): \d+ \((?P<amount>\d+) x (?P<unit_price>\d+)\))"
+	r"|(?P<bad_item>\d+\. .*)"
+	r"|(?P<roblox>Ваш_ник_в_ROBLOX: (?P<roblox_name>\w+))"
+	r"|(?P<transaction>Transaction ID: \d+:(?P<transaction_id>\d+))"
+	r"|(?P<total>Payment Amount: (?P<total_price>\d+))"
+	r")",
+	re.MULTILINE,
+)
+
+
+def parse_order(text: str) -> ParseOutcome:
 	parsed_items = []
-	for item in items:
-		parsed_items.append(Item(
-			name=item[1],  # Название товара
-			amount=int(item[3]),  # Количество заказанных товаров
-			unit_price=float(item[4])
-		))
-
-	# Преобразуем общую сумму платежа в число
-	total_price = float(total_price_match.group(1))
-
-	return ParsedMessageResult(
-		items=parsed_items,
-		roblox_username=roblox_name.group(1),
-		transaction_id=transaction_id.group(2),
-		total_price=total_price,
+	errors = []
+	roblox_name = transaction_id = total_price = None
+
+	for match in ORDER_PATTERN.finditer(text):
+		kind = match.lastgroup
+		if kind == "item":
+			parsed_items.append(Item(
+				name=match["item_name"],  # Название товара
+				amount=int(match["amount"]),  # Количество заказанных товаров
+				unit_price=float(match["unit_price"]),
+			))
+		elif kind == "bad_item":
+			errors.append(ParseError("items", f"Не удалось разобрать строку: {match[kind]}"))
+		elif kind == "roblox" and roblox_name is None:
+			roblox_name = match["roblox_name"]
+		elif kind == "transaction" and transaction_id is None:
+			transaction_id = match["transaction_id"]
+		elif kind == "total" and total_price is None:
+			# Преобразуем общую сумму платежа в число
+			total_price = float(match["total_price"])
+
+	if roblox_name is None:
+		errors.append(ParseError("roblox_username", "Не найден ник в ROBLOX"))
+	if transaction_id is None:
+		errors.append(ParseError("transaction_id", "Не найден Transaction ID"))
+	if total_price is None:
+		errors.append(ParseError("total_price", "Не найдена сумма платежа"))
+
+	logger.debug("Transaction id: %s, roblox_username: %s", transaction_id, roblox_name)
+
+	if errors:
+		return ParseOutcome(result=None, errors=errors)
+
+	return ParseOutcome(
+		result=ParsedMessageResult(
+			items=parsed_items,
+			roblox_username=roblox_name,
+			transaction_id=transaction_id,
+			total_price=total_price,
+		),
+		errors=errors,
 	)
+
+
+def parse_message(text: str) -> ParsedMessageResult | None:
+	return parse_order(text).result
+
+
+def parse_sets_document(document) -> tuple[dict[str, list[tuple[str, int]]], list[ParseError]]:
+	"""Проверяет JSON документ с сетами вида {"Название сета": [{"name": ..., "amount": ...}]}"""
+	if not isinstance(document, dict):
+		return {}, [ParseError("document", "Ожидается объект с названиями сетов")]
+
+	sets = {}
+	errors = []
+	for set_name, items in document.items():
+		if not set_name.strip():
+			errors.append(ParseError(set_name, "Пустое название сета"))
+			continue
+		if not isinstance(items, list) or not items:
+			errors.append(ParseError(set_name, "Ожидается непустой список предметов"))
+			continue
+
+		set_items = []
+		for i, item in enumerate(items):
+			name = item.get("name") if isinstance(item, dict) else None
+			amount = item.get("amount") if isinstance(item, dict) else None
+			if not isinstance(name, str) or not name.strip():
+				errors.append(ParseError(set_name, f"Предмет {i + 1}: нет названия"))
+			elif isinstance(amount, bool) or not isinstance(amount, int) or amount <= 0:
+				errors.append(ParseError(set_name, f"Предмет {i + 1}: количество должно быть положительным числом"))
+			else:
+				set_items.append((name, amount))
+		sets[set_name] = set_items
+
+	return sets, errors
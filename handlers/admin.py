@@ -0,0 +1,118 @@
+import logging
+from datetime import datetime
+
+from aiogram import F, Router
+from aiogram.filters import Command, CommandObject
+from aiogram.types import Message, BufferedInputFile
+
+from db.cache import result_cache
+from db.catalog import set_catalog
+from db.dedup import seen_transactions
+from formatters import format_latency, format_cache_stats, format_dedup_stats, format_catalog_stats
+from services.metrics import metrics, Histogram
+from services.profiler import profiler, ProfilerBusy
+from settings import ADMIN_IDS
+from utils import answer_chunked
+
+logger = logging.getLogger(__name__)
+
+router = Router(name="Admin router")
+# Служебные команды только для ADMIN_IDS, остальным бот не отвечает
+router.message.filter(F.from_user.id.in_(ADMIN_IDS))
+
+# Сколько самых долгих функций репозитория показывать в /stats
+STATS_TOP_REPOS = 10
+# Ограничения /profile: длительность в секундах и размер топов в отчете
+PROFILE_MAX_SECONDS = 300
+PROFILE_DEFAULT_TOP = 30
+PROFILE_MAX_TOP = 200
+
+
+def latency(name: str, histogram: Histogram, errors: int = 0, in_flight: int | None = None) -> str:
+	return format_latency(name, histogram.count, histogram.sum, histogram.quantile(0.95), errors, in_flight)
+
+
+def stats_records():
+	in_flight = metrics.counters["bot_handler_in_flight"]
+	handler_errors = metrics.counters["bot_handler_errors_total"]
+	repo_errors = metrics.counters["bot_repo_errors_total"]
+
+	yield "Обработчики:\n"
+	for labels, histogram in sorted(metrics.histograms["bot_handler_seconds"].items()):
+		yield latency(" / ".join(labels), histogram, handler_errors[labels], in_flight[labels])
+
+	repos = [(labels, h) for labels, h in metrics.histograms["bot_repo_seconds"].items() if h.count]
+	repos.sort(key=lambda item: item[1].sum, reverse=True)
+	yield f"\nЗапросы к бд, топ {STATS_TOP_REPOS} по общему времени:\n"
+	for (name,), histogram in repos[:STATS_TOP_REPOS]:
+		yield latency(name, histogram, repo_errors[(name,)])
+
+	yield "\nОтправка заказов:\n"
+	for (outcome,), histogram in sorted(metrics.histograms["bot_delivery_seconds"].items()):
+		yield latency(outcome, histogram)
+
+	dedup = seen_transactions.stats()
+	yield "\nПроверка повторов заказов:\n"
+	yield format_dedup_stats(dedup["lru_hits"], dedup["bloom_negatives"], dedup["db_checks"], dedup["hit_rate"])
+
+	yield "\nКаталог сетов:\n"
+	yield format_catalog_stats(**set_catalog.stats())
+
+
+@router.message(Command("stats"))
+async def send_stats(message: Message):
+	"""Время обработчиков, запросов в бд и отправок (для администраторов)"""
+	await answer_chunked(message, stats_records(), header="Метрики с момента запуска:\n\n")
+
+
+@router.message(Command("cache_stats"))
+async def send_cache_stats(message: Message):
+	"""Статистика кэша команд чтения (для администраторов)"""
+	stats = result_cache.stats()
+	invalidations = ", ".join(f"{tag} {count}" for tag, count in stats["invalidations"].items()) or "нет"
+	await answer_chunked(
+		message,
+		(format_cache_stats(name, **counters) for name, counters in stats["commands"].items()),
+		header=f"Кэш команд, записей: {stats['entries']}, сбросов: {invalidations}\n\n",
+		empty="Кэш команд еще не использовался",
+	)
+
+
+def parse_profile_args(args: str | None) -> tuple[float, int]:
+	"""Длительность в секундах и необязательный размер топа"""
+	parts = (args or "").split()
+	if not 1 <= len(parts) <= 2:
+		raise ValueError("expected seconds and optional top")
+	seconds = float(parts[0])
+	top = int(parts[1]) if len(parts) == 2 else PROFILE_DEFAULT_TOP
+	if not 0 < seconds <= PROFILE_MAX_SECONDS or not 0 < top <= PROFILE_MAX_TOP:
+		raise ValueError("out of range")
+	return seconds, top
+
+
+@router.message(Command("profile"))
+async def profile_handler(message: Message, command: CommandObject):
+	"""Профилирование бота на N секунд, пример: /profile 30 (для администраторов)"""
+	try:
+		seconds, top = parse_profile_args(command.args)
+	except ValueError:
+		await message.answer(
+			f"Ошибка: используйте /profile [секунды до {PROFILE_MAX_SECONDS}] [размер топа до {PROFILE_MAX_TOP}]."
+		)
+		return
+
+	async def send_report(report: str):
+		filename = f"profile-{datetime.utcnow():%Y%m%d-%H%M%S}.txt"
+		await message.answer_document(
+			BufferedInputFile(report.encode(), filename=filename),
+			caption=f"Профиль за {seconds:g} с",
+		)
+
+	# Профилирование идет в фоне, чтобы не занимать обработку апдейтов, которые и нужно профилировать
+	try:
+		profiler.start(seconds, top, send_report)
+	except ProfilerBusy:
+		await message.answer("Профилирование уже запущено, дождитесь отчета.")
+		return
+	logger.info(f"Profiling for {seconds} seconds requested by {message.from_user.id}")
+	await message.answer(f"Профилирование запущено на {seconds:g} с, отчет придет файлом.")
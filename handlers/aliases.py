@@ -1,14 +1,16 @@
 import json
 import re
 
-from aiogram import Router
+from aiogram import F, Router
 from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.models import Alias
-from db.repos import get_alias, add_alias, get_aliases, remove_alias, add_aliases, change_alias
-from formatters import format_aliases
+from db.repos import get_alias, add_alias, get_aliases, remove_alias, import_aliases
+from formatters import format_alias, ALIASES_HEADER
+from handlers.pagination import PageCallback, page_keyboard, parse_limit, page_limit
+from utils import answer_chunked
 import logging
 
 
@@ -19,7 +21,7 @@ logger = logging.getLogger(__name__)
 router = Router(name="Alias router")
 
 
-@router.message(Command('add_alias'))
+@router.message(Command('add_alias'), flags={"session": True})
 async def assign_alias(message: Message, session: AsyncSession):
 	"""Сделать псевдоним, пример: /add_alias "Rev. seer" "Revolver of seer" """
 	if message.document:
@@ -28,23 +30,14 @@ async def assign_alias(message: Message, session: AsyncSession):
 
 		try:
 			json_data = json.load(file)
-			aliases: list[Alias] = []
-
-			for key, value in json_data.items():
-				if not isinstance(value, str):
-					return await message.answer("Ошибка: неверный формат JSON")
-				if alias := await get_alias(session, key):
-					alias.alias_name = value
-					await change_alias(session, alias)
-					continue
-				aliases.append(Alias(
-					origin_name=key,
-					alias_name=value,
-				))
-
-			await add_aliases(session, aliases)
 		except json.JSONDecodeError:
-			await message.answer("Ошибка: неверный формат JSON.")
+			return await message.answer("Ошибка: неверный формат JSON.")
+
+		if not isinstance(json_data, dict) or not all(isinstance(value, str) for value in json_data.values()):
+			return await message.answer("Ошибка: неверный формат JSON")
+
+		inserted, updated = await import_aliases(session, json_data)
+		return await message.answer(f"Псевдонимы загружены: добавлено {inserted}, обновлено {updated}.")
 	else:
 		match = quotes_regex.match(message.text)
 		if not match:
@@ -64,16 +57,45 @@ async def assign_alias(message: Message, session: AsyncSession):
 		return await message.answer(f"Псевдоним '{alias_name}' был успешно добавлен для имени: '{origin_name}'.")
 
 
-@router.message(Command('aliases'))
+@router.message(Command('aliases'), flags={"session": True})
 async def handle_get_aliases(message: Message, session: AsyncSession):
-	"""Получит список всех псевдонимов"""
-	response = await get_aliases(session)
-	result = format_aliases(response)
-
-	await message.answer(result)
-
-
-@router.message(Command('remove_alias'))
+	"""Получит список всех псевдонимов, пример: /aliases 10"""
+	limit = await parse_limit(message)
+	if limit is None:
+		return
+
+	page = await get_aliases(session, limit=limit)
+
+	await answer_chunked(
+		message,
+		(format_alias(i, alias) for i, alias in enumerate(page.items)),
+		header=ALIASES_HEADER,
+		reply_markup=page_keyboard("aliases", page, limit),
+	)
+
+
+@router.callback_query(PageCallback.filter(F.listing == "aliases"), flags={"session": True})
+async def aliases_page(callback: CallbackQuery, callback_data: PageCallback, session: AsyncSession):
+	limit = page_limit(callback_data)
+	try:
+		page = await get_aliases(session, cursor=callback_data.cursor, limit=limit)
+	except ValueError:
+		return await callback.answer("Страница устарела, вызовите /aliases заново", show_alert=True)
+
+	if not page.items:
+		return await callback.answer("Псевдонимов больше нет")
+
+	await answer_chunked(
+		callback.message,
+		(format_alias(i, alias) for i, alias in enumerate(page.items)),
+		header=ALIASES_HEADER,
+		reply_markup=page_keyboard("aliases", page, limit),
+		edit=True,
+	)
+	await callback.answer()
+
+
+@router.message(Command('remove_alias'), flags={"session": True})
 async def remove_alias_handler(message: Message, session: AsyncSession):
 	"""Удалить псевдоним, пример: /remove_alias Rdr """
 	origin_name = message.text.split(" ")[1]
@@ -1,10 +1,20 @@
-from aiogram import Router
+from datetime import datetime, time, timedelta, timezone
+
+from aiogram import F, Router
 from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.repos import get_recent_transactions, get_items_report, get_analytics
-from formatters import format_recent_transactions
+from db.cache import result_cache
+from db.repos import (
+	get_recent_transactions, get_items_report, iter_items_report, get_analytics, get_analytics_series, ANALYTICS_BUCKETS,
+)
+from formatters import (
+	format_transaction, format_item_report, format_analytics_point,
+	TRANSACTIONS_HEADER, ITEMS_REPORT_HEADER, ANALYTICS_BUCKET_NAMES,
+)
+from handlers.pagination import PageCallback, page_keyboard, parse_limit, page_limit
+from utils import answer_chunked, aenumerate
 import logging
 
 # URL для отправки данных в сторонний сервис
@@ -14,65 +24,130 @@ logger = logging.getLogger(__name__)
 router = Router(name="Analytics router")
 
 
-@router.message(Command("recents"))
+@router.message(Command("recents"), flags={"session": True})
 async def recent_transactions_handler(message: Message, session: AsyncSession):
-	"""Недавние транзакции, пример: /recents 0 10"""
-	# Получаем аргументы команды (если они есть)
-	args = message.text.split(" ")
-	args.remove(args[0])
+	"""Недавние транзакции, пример: /recents 10"""
+	limit = await parse_limit(message)
+	if limit is None:
+		return
+
+	page = await get_recent_transactions(session, limit=limit)
 
+	if page.items:
+		# Формируем сообщение, длинный список разбивается на несколько сообщений
+		await answer_chunked(
+			message,
+			map(format_transaction, page.items),
+			header=TRANSACTIONS_HEADER,
+			reply_markup=page_keyboard("recents", page, limit),
+		)
+	else:
+		await message.answer("Нет данных о последних транзакциях.")
+
+
+@router.callback_query(PageCallback.filter(F.listing == "recents"), flags={"session": True})
+async def recent_transactions_page(callback: CallbackQuery, callback_data: PageCallback, session: AsyncSession):
+	limit = page_limit(callback_data)
 	try:
-		# Параметры по умолчанию
-		start = 0
-		limit = 10
-
-		if len(args) == 1:
-			# Если указан только лимит
-			limit = int(args[0])
-		elif len(args) == 2:
-			# Если указаны начальная позиция и лимит
-			start = int(args[0])
-			limit = int(args[1])
-
-		# Если указаны некорректные значения
-		if limit <= 0 or start < 0:
-			await message.answer("Ошибка: значения должны быть положительными числами.")
-			return
+		page = await get_recent_transactions(session, cursor=callback_data.cursor, limit=limit)
+	except ValueError:
+		return await callback.answer("Страница устарела, вызовите /recents заново", show_alert=True)
+
+	if not page.items:
+		return await callback.answer("Нет данных о последних транзакциях.")
 
+	await answer_chunked(
+		callback.message,
+		map(format_transaction, page.items),
+		header=TRANSACTIONS_HEADER,
+		reply_markup=page_keyboard("recents", page, limit),
+		edit=True,
+	)
+	await callback.answer()
+
+
+def parse_items_report_args(args: list[str]) -> tuple[int | None, int | None]:
+	"""Период вида 7d и размер топа в любом порядке, оба необязательны"""
+	days = limit = None
+	for arg in args:
+		if arg.endswith("d") and days is None:
+			days = int(arg[:-1])
+		elif limit is None:
+			limit = int(arg)
+		else:
+			raise ValueError(arg)
+	if (days is not None and days <= 0) or (limit is not None and limit <= 0):
+		raise ValueError("non positive")
+	return days, limit
+
+
+@router.message(Command("items_report"), flags={"session": True})
+async def send_items_report(message: Message, session: AsyncSession):
+	"""Топ предметов, пример: /items_report 7d 20"""
+	try:
+		days, limit = parse_items_report_args(message.text.split()[1:])
 	except ValueError:
-		# Если произошла ошибка при преобразовании аргументов
-		await message.answer("Ошибка: некорректный формат аргументов. Используйте /recents [start] [limit].")
+		await message.answer("Ошибка: используйте /items_report [период, например 7d] [количество].")
 		return
 
-	# Получаем последние транзакции с учетом смещения
-	transactions = await get_recent_transactions(session, start=start, limit=limit)
-
-	if transactions:
-		# Формируем сообщение
-		formatted_message = await format_recent_transactions(transactions)
-		await message.answer(formatted_message)
+	header = ITEMS_REPORT_HEADER if days is None else f"Отчёт о предметах за {days} дн.:\n"
+	if result_cache.enabled("items_report"):
+		# Кэш хранит отчет целиком, поэтому строки берутся списком
+		rows = await get_items_report(session, days, limit)
+		records = (format_item_report(i, *row) for i, row in enumerate(rows))
 	else:
-		await message.answer("Нет данных о последних транзакциях.")
+		# Без кэша строки читаются из курсора по мере отправки сообщений
+		records = (
+			format_item_report(i, *row)
+			async for i, row in aenumerate(iter_items_report(session, days, limit))
+		)
+	await answer_chunked(
+		message,
+		records,
+		header=header,
+		empty=header + "Не было транзакции, или ошибка в подсчете",
+	)
 
 
-@router.message(Command("items_report"))
-async def send_items_report(message: Message, session: AsyncSession):
-	"""Получить аналитику по предметам"""
-	items_report = await get_items_report(session)
+# Не больше месяца по часам, иначе ответ растягивается на десятки сообщений
+MAX_SERIES_POINTS = 744
 
-	# Формирование сообщения
-	report_message = "Отчёт о предметах:\n"
-	if len(items_report) == 0:
-		report_message += "Не было транзакции, или ошибка в подсчете"
-	for item_name, total_quantity, total_sum in items_report:
-		report_message += f"{item_name}: {total_quantity} шт.\n"
 
-	await message.answer(report_message)
+def parse_utc(value: str) -> datetime:
+	"""Время в ISO формате как UTC без часового пояса, так хранятся транзакции"""
+	moment = datetime.fromisoformat(value)
+	if moment.tzinfo is not None:
+		moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+	return moment
 
 
-@router.message(Command('analytics'))
+def parse_analytics_args(args: list[str]) -> tuple[datetime, datetime, str]:
+	"""
+	Начало, необязательный конец (не включительно, по умолчанию - завтра) и интервал hour или day.
+	Время без часового пояса считается UTC
+	"""
+	bucket = "day"
+	if args and args[-1] in ANALYTICS_BUCKETS:
+		bucket = args.pop()
+	if not 1 <= len(args) <= 2:
+		raise ValueError("expected start and optional end")
+
+	start = parse_utc(args[0])
+	end = parse_utc(args[1]) if len(args) == 2 else datetime.combine(
+		datetime.utcnow().date() + timedelta(days=1), time(),
+	)
+	if end <= start:
+		raise ValueError("empty period")
+	return start, end, bucket
+
+
+@router.message(Command('analytics'), flags={"session": True})
 async def send_analytics(message: Message, session: AsyncSession):
-	"""Получить аналитику за какой либо период"""
+	"""Аналитика за период, пример: /analytics 2026-09-01 2026-10-01 day"""
+	args = message.text.split()[1:]
+	if args:
+		return await send_analytics_series(message, session, args)
+
 	analytics = await get_analytics(session)
 
 	await message.answer(
@@ -86,3 +161,30 @@ async def send_analytics(message: Message, session: AsyncSession):
 		f"Транзакций: {analytics['total_transactions']}\n"
 		f"Потрачено: {analytics['total_spent']} RUB"
 	)
+
+
+async def send_analytics_series(message: Message, session: AsyncSession, args: list[str]):
+	try:
+		start, end, bucket = parse_analytics_args(args)
+	except ValueError:
+		await message.answer(
+			"Ошибка: используйте /analytics [начало ГГГГ-ММ-ДД] [конец ГГГГ-ММ-ДД] [hour или day]."
+		)
+		return
+
+	step = ANALYTICS_BUCKETS[bucket][2]
+	if (end - start) / step > MAX_SERIES_POINTS:
+		await message.answer(f"Ошибка: слишком длинный период, не больше {MAX_SERIES_POINTS} интервалов.")
+		return
+
+	series = await get_analytics_series(session, start, end, bucket)
+	total_transactions = sum(transactions for _, transactions, _ in series)
+	total_spent = sum(spent for _, _, spent in series)
+	await answer_chunked(
+		message,
+		(format_analytics_point(point, transactions, spent, bucket) for point, transactions, spent in series),
+		header=(
+			f"Аналитика с {start:%Y-%m-%d %H:%M} по {end:%Y-%m-%d %H:%M} {ANALYTICS_BUCKET_NAMES[bucket]} (UTC)\n"
+			f"Транзакций: {total_transactions}, потрачено: {total_spent:g} RUB\n\n"
+		),
+	)
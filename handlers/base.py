@@ -1,10 +1,14 @@
 from aiogram import Dispatcher
 
-from . import aliases, analytics, message, sets
+from . import admin, aliases, analytics, message, sets
+
+# Команды этих роутеров не попадают в меню, которое видят все пользователи
+PRIVATE_ROUTERS = (admin.router,)
 
 
 def register_handlers(dp: Dispatcher):
 	dp.include_routers(
+		admin.router,
 		aliases.router,
 		analytics.router,
 		message.router,
@@ -6,11 +6,14 @@ from aiogram.types import Message
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from db.models import Transaction, ItemEntity
-from db.repos import is_transaction_processed, search_sets, save_transaction
-from schemas import Item
+from db.catalog import set_catalog, alias_index
+from db.dedup import seen_transactions
+from db.repos import enqueue_transaction
+from schemas import ParsedMessageResult
+from services.locks import KeyedLocks
+from services.outbox import OutboxWorker
 from settings import CHAT_ID
-from utils import send_to_service
-from formatters import parse_message
+from formatters import parse_order
 import logging
 
 # URL для отправки данных в сторонний сервис
@@ -19,52 +22,41 @@ logger = logging.getLogger(__name__)
 
 router = Router(name='Message main')
 
+# Повторы одного заказа обрабатываются по очереди, разные заказы - параллельно.
+# От двойной отправки защищает захват transaction_id в бд, лок лишь экономит работу в рамках процесса
+order_locks = KeyedLocks()
 
-@router.message(F.chat.id == CHAT_ID, F.message.text.startswith("Order"))
-async def handle_message(message: Message, session: AsyncSession):
+
+@router.message(F.chat.id == CHAT_ID, F.text.startswith("Order"), flags={"session": True})
+async def handle_message(message: Message, session: AsyncSession, outbox: OutboxWorker):
 	# Парсим сообщение
-	parsed_data = parse_message(message.text)
-	if not parsed_data:
-		logger.warning("Not found items in parsed message")
+	outcome = parse_order(message.text)
+	if outcome.errors:
+		logger.warning(f"Failed to parse order message: {outcome.errors}")
+		errors = "\n".join(f"- {error.message}" for error in outcome.errors)
+		await message.reply(f"Не удалось разобрать заказ:\n{errors}")
 		return
+	parsed_data = outcome.result
 	logger.info("Handling message")
 
 	logger.info(f"Parsed data: {parsed_data}")
-	if not parsed_data:
-		return
 	transaction_id = parsed_data.transaction_id
 	logger.info(f"Handling message for {transaction_id}")
-	# Проверяем, был ли обработан данный transaction_id
+	async with order_locks(transaction_id):
+		await process_order(message, session, outbox, parsed_data)
+
 
-	if await is_transaction_processed(session, transaction_id):
+async def process_order(message: Message, session: AsyncSession, outbox: OutboxWorker, parsed_data: ParsedMessageResult):
+	transaction_id = parsed_data.transaction_id
+	# Повторы от формы оплаты отсекаются в памяти, в бд идут только новые заказы
+	if await seen_transactions.is_processed(session, transaction_id):
 		logger.warning("Transaction is already processed")
 		return
 	logging.info(f"Processing new transaction ID: {transaction_id}")
 
-	actual_items = []
-	for item in parsed_data.items:
-
-		if item.name.endswith("set"):
-			sets = await search_sets(session, item.name)
-			if not sets:
-				continue
-			items = [
-				Item(
-					name=i.name,
-					amount=i.amount,
-					unit_price=0,
-				) for i in sets.items
-			]
-			actual_items.extend(items)
-		else:
-			actual_items.append(item)
-	parsed_data.items = actual_items
-
-	result = send_to_service(dataclasses.asdict(parsed_data))
-	if not result:
-		await message.reply("Невозможно связаться с сервисом бота")
-		return
-	logging.info(f"Successfully sent data to service: {result}")
+	# Приводим названия к псевдонимам и раскрываем сеты, всё из памяти без запросов в бд
+	parsed_data.items = await alias_index.resolve_items(session, parsed_data.items)
+	parsed_data.items = await set_catalog.expand(session, parsed_data.items)
 
 	transaction = Transaction(
 		transaction_id=transaction_id,
@@ -76,7 +68,6 @@ async def handle_message(message: Message, session: AsyncSession):
 	for item in parsed_data.items:
 		items.append(
 			ItemEntity(
-				transaction_id=transaction_id,
 				amount=item.amount,
 				item_name=item.name,
 				unit_price=item.unit_price,
@@ -85,7 +76,13 @@ async def handle_message(message: Message, session: AsyncSession):
 
 	transaction.items.extend(items)
 
-	# Сохраняем транзакцию как обработанную
-	await save_transaction(session, transaction)
+	# Сохраняем транзакцию и ставим её в очередь, отправкой занимается OutboxWorker.
+	# transaction_id занимается атомарно, повтор заказа ничего не запишет и не отправит
+	entry = await enqueue_transaction(session, transaction, dataclasses.asdict(parsed_data))
+	seen_transactions.add(transaction_id)
+	if entry is None:
+		logger.warning("Transaction is already processed")
+		return
+	outbox.notify()
 
 	await message.reply(f"Транзакция была отправлена в очередь. id: {transaction.id}, tx_id: {transaction_id}")
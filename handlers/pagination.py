@@ -0,0 +1,58 @@
+from aiogram.filters.callback_data import CallbackData
+from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, Message
+
+from db.pagination import Page
+
+# Больше строк не уместится в несколько сообщений и только нагрузит бд
+MAX_LIMIT = 100
+
+
+class PageCallback(CallbackData, prefix="page"):
+	listing: str  # recents, sets или aliases
+	cursor: str
+	limit: int
+
+
+def page_keyboard(listing: str, page: Page, limit: int) -> InlineKeyboardMarkup | None:
+	buttons = []
+	if page.prev_cursor:
+		buttons.append(InlineKeyboardButton(
+			text="« Назад",
+			callback_data=PageCallback(listing=listing, cursor=page.prev_cursor, limit=limit).pack(),
+		))
+	if page.next_cursor:
+		buttons.append(InlineKeyboardButton(
+			text="Вперед »",
+			callback_data=PageCallback(listing=listing, cursor=page.next_cursor, limit=limit).pack(),
+		))
+
+	if not buttons:
+		return None
+	return InlineKeyboardMarkup(inline_keyboard=[buttons])
+
+
+async def parse_limit(message: Message, default: int = 10) -> int | None:
+	"""Размер страницы из аргумента команды, например /recents 10"""
+	args = message.text.split(" ")[1:]
+
+	try:
+		limit = int(args[0]) if args else default
+	except ValueError:
+		# Если произошла ошибка при преобразовании аргументов
+		await message.answer("Ошибка: некорректный формат аргументов. Используйте /команда [limit].")
+		return None
+
+	# Если указаны некорректные значения
+	if limit <= 0:
+		await message.answer("Ошибка: значения должны быть положительными числами.")
+		return None
+	if limit > MAX_LIMIT:
+		await message.answer(f"Ошибка: размер страницы не больше {MAX_LIMIT}. Используйте /команда [limit].")
+		return None
+
+	return limit
+
+
+def page_limit(callback_data: PageCallback) -> int:
+	"""Размер страницы из кнопки. Данные кнопки присылает клиент, поэтому они ограничиваются как аргумент команды"""
+	return min(max(callback_data.limit, 1), MAX_LIMIT)
@@ -1,12 +1,14 @@
 import json
 
-from aiogram import Router
+from aiogram import F, Router
 from aiogram.filters import Command
-from aiogram.types import Message
+from aiogram.types import Message, CallbackQuery
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from db.models import Set, SetItem
-from db.repos import get_all_sets, add_set_command, add_set, search_sets, change_set
+from db.repos import get_all_sets, add_set_command, import_sets
+from formatters import parse_sets_document, format_set, SETS_HEADER
+from handlers.pagination import PageCallback, page_keyboard, parse_limit, page_limit
+from utils import answer_chunked
 
 import logging
 
@@ -16,51 +18,47 @@ logger = logging.getLogger(__name__)
 router = Router(name="Sets router")
 
 
-@router.message(Command('set_list'))
+@router.message(Command('set_list'), flags={"session": True})
 async def set_lists(message: Message, session: AsyncSession):
-	"""Список сетов в боте, пример: /set_list 0 10"""
-	# Получаем аргументы команды (если они есть)
-	args = message.text.split(" ")
-	args.remove(args[0])
+	"""Список сетов в боте, пример: /set_list 10"""
+	limit = await parse_limit(message)
+	if limit is None:
+		return
 
-	try:
-		# Параметры по умолчанию
-		start = 0
-		limit = 10
-
-		if len(args) == 1:
-			# Если указан только лимит
-			limit = int(args[0])
-		elif len(args) == 2:
-			# Если указаны начальная позиция и лимит
-			start = int(args[0])
-			limit = int(args[1])
-
-		# Если указаны некорректные значения
-		if limit <= 0 or start < 0:
-			await message.answer("Ошибка: значения должны быть положительными числами.")
-			return
+	page = await get_all_sets(session, limit=limit)
+	if not page.items:
+		return await message.answer("В боте нету сетов")
+
+	await answer_chunked(
+		message,
+		(format_set(i, s) for i, s in enumerate(page.items)),
+		header=SETS_HEADER,
+		reply_markup=page_keyboard("sets", page, limit),
+	)
 
+
+@router.callback_query(PageCallback.filter(F.listing == "sets"), flags={"session": True})
+async def set_lists_page(callback: CallbackQuery, callback_data: PageCallback, session: AsyncSession):
+	limit = page_limit(callback_data)
+	try:
+		page = await get_all_sets(session, cursor=callback_data.cursor, limit=limit)
 	except ValueError:
-		# Если произошла ошибка при преобразовании аргументов
-		await message.answer("Ошибка: некорректный формат аргументов. Используйте /recents [start] [limit].")
-		return
+		return await callback.answer("Страница устарела, вызовите /set_list заново", show_alert=True)
 
-	response = await get_all_sets(session, start, limit)
-	if not response:
-		return await message.answer("В боте нету сетов")
-	text = "Все доступные сеты в боте:\n"
-	for i, s in enumerate(response):
-		_temp = f"{i + 1}: Сет с названием: '{s.set_name}' Предметы в сете:\n"
-		for item in s.items:
-			_temp += f"{item.item_name}: {item.amount}x\n"
-		text += _temp
-		text += "\n"
+	if not page.items:
+		return await callback.answer("В боте нету сетов")
 
-	await message.answer(text)
+	await answer_chunked(
+		callback.message,
+		(format_set(i, s) for i, s in enumerate(page.items)),
+		header=SETS_HEADER,
+		reply_markup=page_keyboard("sets", page, limit),
+		edit=True,
+	)
+	await callback.answer()
 
 
-@router.message(Command('add_set'))
+@router.message(Command('add_set'), flags={"session": True})
 async def add_set_handler(message: Message, session: AsyncSession):
 	"""Добавление сетов в бд через аргументы или JSON"""
 
@@ -73,32 +71,24 @@ async def add_set_handler(message: Message, session: AsyncSession):
 		try:
 			# Чтение и парсинг содержимого файла
 			json_data = json.load(file)
-
-			# Обрабатываем каждый сет из JSON
-			for set_name, items in json_data.items():
-
-				# Формируем список объектов SetItem для каждого предмета
-				set_items = [
-					SetItem(item_name=item['name'], amount=item['amount'])
-					for item in items
-				]
-
-				if set := await search_sets(session, set_name):
-					set.items = set_items
-					await change_set(session, set)
-					logger.info("Found set in db, changed items")
-					continue
-
-				# Создаем объект Set и сохраняем в БД
-				new_set = Set(set_name=set_name, items=set_items)
-				await add_set(session, new_set, set_items)
-
-			# Отправляем сообщение об успешном добавлении всех сетов
-			await message.answer("Все сеты успешно добавлены из файла.")
 		except json.JSONDecodeError:
-			await message.answer("Ошибка: неверный формат JSON.")
-		except Exception as e:
-			await message.answer(f"Произошла ошибка при обработке файла: {str(e)}")
+			return await message.answer("Ошибка: неверный формат JSON.")
+
+		# Сначала проверяем весь документ, в бд ничего не пишется, если есть ошибки
+		sets, errors = parse_sets_document(json_data)
+		if errors:
+			return await answer_chunked(
+				message,
+				(f"- {error.field}: {error.message}\n" for error in errors),
+				header="Сеты не были добавлены, ошибки в файле:\n",
+			)
+
+		results = await import_sets(session, sets)
+		await answer_chunked(
+			message,
+			(f"- {set_name}: {'добавлен' if created else 'обновлен'}\n" for set_name, created in results.items()),
+			header="Все сеты успешно добавлены из файла:\n",
+		)
 	else:
 		response = await add_set_command(session, message.text)
 		await message.answer(response)
@@ -0,0 +1,26 @@
+import asyncio
+from typing import Callable, Awaitable, Dict, Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """Ограничивает количество апдейтов, которые обрабатываются одновременно"""
+
+    def __init__(self, limit: int):
+        super().__init__()
+        # С нулевым лимитом ни один апдейт не будет обработан
+        if limit < 1:
+            raise ValueError(f"Concurrency limit must be positive, got {limit}")
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        async with self._semaphore:
+            return await handler(event, data)
@@ -1,11 +1,49 @@
 from typing import Callable, Awaitable, Dict, Any
 
 from aiogram import BaseMiddleware
+from aiogram.dispatcher.flags import get_flag
 from aiogram.types import TelegramObject
-from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+
+class LazySession:
+    """
+    Заменяет AsyncSession в обработчике: сессия создается при первом обращении,
+    соединение из пула берется при первом запросе, как у обычной сессии
+    """
+
+    def __init__(self, session_pool: async_sessionmaker):
+        self._session_pool = session_pool
+        self._session: AsyncSession | None = None
+
+    @property
+    def opened(self) -> bool:
+        return self._session is not None
+
+    @property
+    def bind(self):
+        # Движок известен без сессии, кэш результатов и блокировка записи не открывают ее зря
+        if self._session is None:
+            return self._session_pool.kw["bind"]
+        return self._session.bind
+
+    def __getattr__(self, name: str) -> Any:
+        if self._session is None:
+            self._session = self._session_pool()
+        return getattr(self._session, name)
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
 
 
 class DbSessionMiddleware(BaseMiddleware):
+    """
+    Передает сессию бд только обработчикам с флагом session:
+    @router.message(Command("recents"), flags={"session": True}).
+    Внутренний middleware, поэтому апдейты, которые не прошли фильтры, сессию не получают
+    """
+
     def __init__(self, session_pool: async_sessionmaker):
         super().__init__()
         self.session_pool = session_pool
@@ -16,6 +54,12 @@ class DbSessionMiddleware(BaseMiddleware):
             event: TelegramObject,
             data: Dict[str, Any],
     ) -> Any:
-        async with self.session_pool() as session:
-            data["session"] = session
+        if not get_flag(data, "session"):
+            return await handler(event, data)
+
+        session = LazySession(self.session_pool)
+        data["session"] = session
+        try:
             return await handler(event, data)
+        finally:
+            await session.close()
@@ -0,0 +1,43 @@
+import time
+from typing import Callable, Awaitable, Dict, Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject
+
+from services.metrics import Metrics
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """
+    Время, ошибки и число выполняющихся апдейтов по роутеру и обработчику.
+    Внутренний middleware: видит только апдейты, которые дошли до обработчика
+    """
+
+    def __init__(self, metrics: Metrics):
+        super().__init__()
+        self.metrics = metrics
+        self._labels: dict[Callable, tuple[str, str]] = {}
+
+    async def __call__(
+            self,
+            handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+            event: TelegramObject,
+            data: Dict[str, Any],
+    ) -> Any:
+        callback = data["handler"].callback
+        labels = self._labels.get(callback)
+        if labels is None:
+            router = data.get("event_router")
+            labels = self._labels[callback] = (router.name if router else "", callback.__name__)
+
+        in_flight = self.metrics.counters["bot_handler_in_flight"]
+        in_flight[labels] += 1
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            self.metrics.inc("bot_handler_errors_total", labels)
+            raise
+        finally:
+            self.metrics.observe("bot_handler_seconds", labels, time.perf_counter() - started)
+            in_flight[labels] -= 1
@@ -1,4 +1,5 @@
 import dataclasses
+from datetime import datetime
 from enum import Enum
 
 
@@ -17,7 +18,64 @@ class ParsedMessageResult:
 	total_price: float
 
 
+@dataclasses.dataclass
+class ParseError:
+	field: str
+	message: str
+
+
+@dataclasses.dataclass
+class ParseOutcome:
+	result: ParsedMessageResult | None
+	errors: list[ParseError]
+
+
 class TransactionStatus(Enum):
 	sent = "sent"
 	completed = "completed"
 	failed = "failed"
+
+
+# Результаты команд чтения. Кэш отдает один результат разным обработчикам,
+# поэтому это неизменяемые копии, а не объекты ORM, привязанные к своей сессии
+
+@dataclasses.dataclass(frozen=True)
+class SetItemInfo:
+	item_name: str
+	amount: int
+
+
+@dataclasses.dataclass(frozen=True)
+class SetInfo:
+	id: int
+	set_name: str
+	items: tuple[SetItemInfo, ...]
+
+
+@dataclasses.dataclass(frozen=True)
+class TransactionItemInfo:
+	item_name: str
+	amount: int
+	unit_price: float
+
+	@property
+	def total_price(self) -> float:
+		return float(self.unit_price * self.amount)
+
+
+@dataclasses.dataclass(frozen=True)
+class TransactionInfo:
+	id: int
+	transaction_id: str
+	roblox_name: str | None
+	total_price: float | None
+	status: TransactionStatus | None
+	timestamp: datetime | None
+	items: tuple[TransactionItemInfo, ...]
+
+
+@dataclasses.dataclass(frozen=True)
+class AliasInfo:
+	id: int
+	origin_name: str
+	alias_name: str | None
@@ -0,0 +1,109 @@
+import asyncio
+import logging
+import time
+from typing import Any
+
+import aiohttp
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryError(Exception):
+	pass
+
+
+class BatchUnsupported(DeliveryError):
+	"""Сервис не принимает пачки заказов, их нужно отправить по одному"""
+
+
+# Ответы, по которым понятно, что адреса для пачек у сервиса нет
+BATCH_UNSUPPORTED_STATUSES = (404, 405, 501)
+
+
+class DeliveryClient:
+	"""
+	Асинхронный клиент для отправки заказов в веб сервис.
+	Держит одну сессию с keep-alive соединениями и ограничивает
+	количество одновременных запросов, чтобы не блокировать event loop.
+	"""
+
+	def __init__(
+			self,
+			url: str,
+			connect_timeout: float = 5,
+			read_timeout: float = 15,
+			max_concurrency: int = 10,
+			keepalive_timeout: float = 30,
+			batch_url: str | None = None,
+	):
+		self.url = url
+		self.batch_url = batch_url or f"{url}/batch"
+		self.max_concurrency = max_concurrency
+		self._timeout = aiohttp.ClientTimeout(sock_connect=connect_timeout, sock_read=read_timeout)
+		self._keepalive_timeout = keepalive_timeout
+		self._semaphore = asyncio.Semaphore(max_concurrency)
+		self._session: aiohttp.ClientSession | None = None
+
+	def _get_session(self) -> aiohttp.ClientSession:
+		# Сессия создается лениво, так как ей нужен запущенный event loop
+		if self._session is None or self._session.closed:
+			connector = aiohttp.TCPConnector(
+				limit=self.max_concurrency,
+				keepalive_timeout=self._keepalive_timeout,
+			)
+			self._session = aiohttp.ClientSession(connector=connector, timeout=self._timeout)
+		return self._session
+
+	async def send(self, data: dict[str, Any]) -> Any:
+		async with self._semaphore:
+			started = time.perf_counter()
+			outcome = "error"
+			try:
+				async with self._get_session().post(self.url, json=data) as response:
+					response.raise_for_status()
+					result = await response.json()
+					outcome = "ok"
+					return result
+			# ValueError - ответ 2xx, который не разобрать как JSON
+			except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+				raise DeliveryError(str(e) or e.__class__.__name__) from e
+			finally:
+				metrics.observe("bot_delivery_seconds", (outcome,), time.perf_counter() - started)
+
+	async def send_batch(self, payloads: list[dict[str, Any]]) -> list[Any | DeliveryError]:
+		"""
+		Отправляет заказы одним запросом {"orders": [...]}. Сервис отвечает {"results": [...]}
+		в том же порядке, у непринятого заказа "ok": false и "error".
+		Возвращает результат или DeliveryError для каждого заказа.
+		BatchUnsupported только если адреса для пачек нет: сервис точно ничего не принял.
+		Непонятный ответ 2xx - DeliveryError, ведь заказы могли быть приняты
+		"""
+		async with self._semaphore:
+			started = time.perf_counter()
+			outcome = "batch_error"
+			try:
+				async with self._get_session().post(self.batch_url, json={"orders": payloads}) as response:
+					if response.status in BATCH_UNSUPPORTED_STATUSES:
+						raise BatchUnsupported(f"batch endpoint returned {response.status}")
+					response.raise_for_status()
+					body = await response.json()
+				results = body.get("results") if isinstance(body, dict) else None
+				if not isinstance(results, list) or len(results) != len(payloads):
+					raise DeliveryError("batch response does not match the orders")
+				outcome = "batch_ok"
+			except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+				raise DeliveryError(str(e) or e.__class__.__name__) from e
+			finally:
+				metrics.observe("bot_delivery_seconds", (outcome,), time.perf_counter() - started)
+
+		return [
+			DeliveryError(str(result.get("error") or "rejected"))
+			if isinstance(result, dict) and result.get("ok") is False else result
+			for result in results
+		]
+
+	async def close(self) -> None:
+		if self._session is not None and not self._session.closed:
+			await self._session.close()
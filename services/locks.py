@@ -0,0 +1,30 @@
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Hashable
+
+
+class KeyedLocks:
+	"""
+	Реестр asyncio.Lock по ключу, например по transaction_id.
+	Лок живет, пока его кто-то держит или ждет, поэтому реестр не растет бесконечно.
+	"""
+
+	def __init__(self):
+		self._locks: dict[Hashable, asyncio.Lock] = {}
+		self._waiters: dict[Hashable, int] = {}
+
+	@asynccontextmanager
+	async def __call__(self, key: Hashable) -> AsyncIterator[None]:
+		lock = self._locks.setdefault(key, asyncio.Lock())
+		self._waiters[key] = self._waiters.get(key, 0) + 1
+		try:
+			async with lock:
+				yield
+		finally:
+			self._waiters[key] -= 1
+			if not self._waiters[key]:
+				del self._waiters[key]
+				del self._locks[key]
+
+	def __len__(self) -> int:
+		return len(self._locks)
@@ -0,0 +1,156 @@
+import bisect
+import collections
+import functools
+import logging
+import time
+from typing import Any, Callable, Awaitable
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# Верхние границы корзин в секундах, как у prometheus_client по умолчанию
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Имя метрики: тип, названия меток, описание для /metrics
+FAMILIES = {
+	"bot_handler_seconds": ("histogram", ("router", "handler"), "Update handling time by handler"),
+	"bot_handler_errors_total": ("counter", ("router", "handler"), "Handler calls that raised"),
+	"bot_handler_in_flight": ("gauge", ("router", "handler"), "Updates being handled right now"),
+	"bot_repo_seconds": ("histogram", ("function",), "db.repos call time"),
+	"bot_repo_errors_total": ("counter", ("function",), "db.repos calls that raised"),
+	"bot_delivery_seconds": ("histogram", ("outcome",), "Order delivery request time"),
+}
+
+
+class Histogram:
+	__slots__ = ("counts", "sum", "count")
+
+	def __init__(self):
+		# Последняя корзина - значения больше всех границ
+		self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+		self.sum = 0.0
+		self.count = 0
+
+	def observe(self, value: float) -> None:
+		self.counts[bisect.bisect_left(LATENCY_BUCKETS, value)] += 1
+		self.sum += value
+		self.count += 1
+
+	def quantile(self, q: float) -> float:
+		"""Оценка сверху: граница корзины, в которую попадает квантиль"""
+		rank = q * self.count
+		seen = 0
+		for bound, count in zip(LATENCY_BUCKETS, self.counts):
+			seen += count
+			if seen >= rank:
+				return bound
+		return float("inf")
+
+
+class Metrics:
+	"""
+	Метрики процесса в памяти: гистограммы времени, счетчики ошибок и выполняющихся вызовов.
+	Запись - несколько операций со словарем, без блокировок, так как всё в одном event loop
+	"""
+
+	def __init__(self):
+		self.histograms: dict[str, dict[tuple[str, ...], Histogram]] = collections.defaultdict(dict)
+		self.counters: dict[str, collections.Counter[tuple[str, ...]]] = collections.defaultdict(collections.Counter)
+		# Значения, которые считают сами компоненты, читаются при каждом рендере
+		self.collected: dict[str, tuple[str, str, Callable[[], float]]] = {}
+
+	def collect(self, name: str, kind: str, description: str, read: Callable[[], float]) -> None:
+		"""Метрика без меток, значение которой хранит другой объект, например счетчики кэша"""
+		self.collected[name] = (kind, description, read)
+
+	def histogram(self, name: str, labels: tuple[str, ...]) -> Histogram:
+		histograms = self.histograms[name]
+		histogram = histograms.get(labels)
+		if histogram is None:
+			histogram = histograms[labels] = Histogram()
+		return histogram
+
+	def observe(self, name: str, labels: tuple[str, ...], seconds: float) -> None:
+		self.histogram(name, labels).observe(seconds)
+
+	def inc(self, name: str, labels: tuple[str, ...], value: int = 1) -> None:
+		self.counters[name][labels] += value
+
+	def timed(self, histogram: str, errors: str, *labels: str):
+		"""Записывает время и ошибки асинхронной функции"""
+		observed = self.histogram(histogram, labels)
+		counter = self.counters[errors]
+
+		def decorator(func: Callable[..., Awaitable[Any]]):
+			@functools.wraps(func)
+			async def wrapper(*args, **kwargs):
+				started = time.perf_counter()
+				try:
+					return await func(*args, **kwargs)
+				except Exception:
+					counter[labels] += 1
+					raise
+				finally:
+					observed.observe(time.perf_counter() - started)
+
+			return wrapper
+
+		return decorator
+
+	def render(self) -> str:
+		"""Текстовый формат Prometheus"""
+		lines = []
+		for name, (kind, label_names, description) in FAMILIES.items():
+			lines.append(f"# HELP {name} {description}")
+			lines.append(f"# TYPE {name} {kind}")
+			if kind == "histogram":
+				for labels, histogram in self.histograms.get(name, {}).items():
+					base = format_labels(label_names, labels)
+					cumulative = 0
+					for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+						cumulative += count
+						lines.append(f'{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+					lines.append(f'{name}_bucket{{{base},le="+Inf"}} {histogram.count}')
+					lines.append(f"{name}_sum{{{base}}} {histogram.sum}")
+					lines.append(f"{name}_count{{{base}}} {histogram.count}")
+			else:
+				for labels, value in self.counters.get(name, {}).items():
+					lines.append(f"{name}{{{format_labels(label_names, labels)}}} {value}")
+		for name, (kind, description, read) in self.collected.items():
+			lines.append(f"# HELP {name} {description}")
+			lines.append(f"# TYPE {name} {kind}")
+			lines.append(f"{name} {read()}")
+		return "\n".join(lines) + "\n"
+
+
+def escape_label(value: str) -> str:
+	return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names: tuple[str, ...], values: tuple[str, ...]) -> str:
+	return ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+
+
+metrics = Metrics()
+
+
+def create_metrics_app(registry: Metrics = metrics) -> web.Application:
+	async def handle_metrics(request: web.Request) -> web.Response:
+		return web.Response(
+			body=registry.render().encode(),
+			headers={"Content-Type": "text/plain; version=0.0.4; charset=utf-8"},
+		)
+
+	app = web.Application()
+	app.router.add_get("/metrics", handle_metrics)
+	return app
+
+
+async def start_metrics_server(host: str, port: int, registry: Metrics = metrics) -> web.AppRunner:
+	"""Отдельный локальный сервер для Prometheus, останавливается через runner.cleanup()"""
+	runner = web.AppRunner(create_metrics_app(registry))
+	await runner.setup()
+	await web.TCPSite(runner, host, port).start()
+	logger.info(f"Metrics are served on http://{host}:{port}/metrics")
+	return runner
@@ -0,0 +1,181 @@
+import asyncio
+import logging
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from db.models import OutboxEntry
+from db.repos import (
+	claim_due_outbox, complete_outbox_entry, complete_outbox_entries, retry_outbox_entry, fail_outbox_entry,
+)
+from services.delivery import DeliveryClient, DeliveryError, BatchUnsupported
+
+logger = logging.getLogger(__name__)
+
+
+class OutboxWorker:
+	"""
+	Фоновая отправка заказов из таблицы outbox.
+	Один опрашивающий таск забирает записи, у которых подошло время попытки,
+	откладывая их на время аренды (lease), и раздает их пулу воркеров.
+	Аренда не дает опросу снова выбрать запись, пока она отправляется, а после падения бота
+	запись вернется в работу, когда аренда истечет. Бот работает одним процессом, см. BOT_MODE в settings.py.
+	Число заказов в работе ограничено размером очереди и количеством воркеров,
+	при ошибках используется экспоненциальная задержка.
+	С batch_size > 1 воркер отправляет до batch_size заказов одним запросом, а после пробуждения
+	опрос ждет batch_delay, чтобы набрать пачку. Каждый заказ подтверждается или повторяется отдельно.
+	Если сервис не принимает пачки, заказы batch_retry секунд отправляются по одному.
+	"""
+
+	def __init__(
+			self,
+			session_pool: async_sessionmaker,
+			client: DeliveryClient,
+			workers: int = 4,
+			max_attempts: int = 8,
+			base_delay: float = 1,
+			max_delay: float = 300,
+			poll_interval: float = 5,
+			lease: float = 60,
+			batch_size: int = 1,
+			batch_delay: float = 0.05,
+			batch_retry: float = 300,
+	):
+		self.session_pool = session_pool
+		self.client = client
+		self.workers = workers
+		self.max_attempts = max_attempts
+		self.base_delay = base_delay
+		self.max_delay = max_delay
+		self.poll_interval = poll_interval
+		self.lease = lease
+		self.batch_size = batch_size
+		self.batch_delay = batch_delay
+		self.batch_retry = batch_retry
+
+		# В очереди пачки записей, с batch_size = 1 по одной записи
+		self._queue: asyncio.Queue[list[OutboxEntry]] = asyncio.Queue(maxsize=workers)
+		self._batch_disabled_until = 0.0
+		self._wakeup = asyncio.Event()
+		self._tasks: list[asyncio.Task] = []
+
+	def notify(self) -> None:
+		"""Разбудить опрос, например после добавления нового заказа"""
+		self._wakeup.set()
+
+	def backoff(self, attempts: int) -> float:
+		delay = min(self.max_delay, self.base_delay * 2 ** attempts)
+		# Случайный разброс, чтобы повторы не приходили пачкой
+		return delay * random.uniform(0.5, 1)
+
+	async def start(self) -> None:
+		self._tasks.append(asyncio.create_task(self._poll()))
+		self._tasks.extend(asyncio.create_task(self._work()) for _ in range(self.workers))
+
+	async def stop(self) -> None:
+		for task in self._tasks:
+			task.cancel()
+		await asyncio.gather(*self._tasks, return_exceptions=True)
+		self._tasks.clear()
+
+	def _batching(self) -> bool:
+		return self.batch_size > 1 and time.monotonic() >= self._batch_disabled_until
+
+	async def _poll(self) -> None:
+		while True:
+			self._wakeup.clear()
+			limit = self._queue.maxsize * self.batch_size
+			try:
+				async with self.session_pool() as session:
+					entries = await claim_due_outbox(session, limit, self.lease)
+			except Exception:
+				logger.exception("Failed to read outbox")
+				entries = []
+
+			for i in range(0, len(entries), self.batch_size):
+				await self._queue.put(entries[i:i + self.batch_size])
+
+			# Выбрано сколько можно, значит в outbox могут остаться записи. Иначе новые
+			# записи разбудят опрос через notify, а время повтора подождет до poll_interval
+			if len(entries) == limit:
+				continue
+			try:
+				await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+			except asyncio.TimeoutError:
+				continue
+			# Новые заказы приходят подряд, небольшая пауза собирает их в одну пачку
+			if self._batching():
+				await asyncio.sleep(self.batch_delay)
+
+	async def _work(self) -> None:
+		while True:
+			batch = await self._queue.get()
+			try:
+				if len(batch) > 1 and self._batching():
+					await self._deliver_batch(batch)
+				else:
+					await self._deliver_each(batch)
+			except Exception:
+				logger.exception(f"Failed to process outbox entries {[entry.id for entry in batch]}")
+			finally:
+				self._queue.task_done()
+				# Освободилось место, можно выбирать следующие записи
+				self._wakeup.set()
+
+	async def _deliver_each(self, entries: list[OutboxEntry]) -> None:
+		results = await asyncio.gather(*(self._deliver(entry) for entry in entries), return_exceptions=True)
+		for entry, result in zip(entries, results):
+			if isinstance(result, Exception):
+				logger.error(f"Failed to process outbox entry {entry.id}", exc_info=result)
+
+	async def _deliver_batch(self, entries: list[OutboxEntry]) -> None:
+		try:
+			results = await self.client.send_batch([entry.payload for entry in entries])
+		except BatchUnsupported as e:
+			logger.warning(f"Batch delivery unavailable, sending one by one for {self.batch_retry:g}s: {e}")
+			self._batch_disabled_until = time.monotonic() + self.batch_retry
+			await self._deliver_each(entries)
+			return
+		except DeliveryError as e:
+			results = [e] * len(entries)
+		except Exception as e:
+			logger.exception(f"Unexpected error while sending outbox entries {[entry.id for entry in entries]}")
+			results = [DeliveryError(f"{e.__class__.__name__}: {e}")] * len(entries)
+
+		delivered = [entry for entry, result in zip(entries, results) if not isinstance(result, DeliveryError)]
+		if delivered:
+			async with self.session_pool() as session:
+				await complete_outbox_entries(session, delivered)
+			logger.info(f"Successfully sent {len(delivered)} orders to service in one batch")
+		for entry, result in zip(entries, results):
+			if isinstance(result, DeliveryError):
+				await self._on_error(entry, str(result))
+
+	async def _deliver(self, entry: OutboxEntry) -> None:
+		try:
+			result = await self.client.send(entry.payload)
+		except DeliveryError as e:
+			await self._on_error(entry, str(e))
+			return
+		except Exception as e:
+			# Иначе запись без новой попытки снова уйдет в работу после аренды и так бесконечно
+			logger.exception(f"Unexpected error while sending outbox entry {entry.id}")
+			await self._on_error(entry, f"{e.__class__.__name__}: {e}")
+			return
+
+		async with self.session_pool() as session:
+			await complete_outbox_entry(session, entry)
+		logger.info(f"Successfully sent data to service: {result}")
+
+	async def _on_error(self, entry: OutboxEntry, error: str) -> None:
+		async with self.session_pool() as session:
+			if entry.attempts + 1 >= self.max_attempts:
+				logger.error(f"Giving up on outbox entry {entry.id} after {entry.attempts + 1} attempts: {error}")
+				await fail_outbox_entry(session, entry, error)
+				return
+
+			delay = self.backoff(entry.attempts)
+			logger.warning(f"Failed to send outbox entry {entry.id}, retry in {delay:.1f}s: {error}")
+			await retry_outbox_entry(session, entry, datetime.utcnow() + timedelta(seconds=delay), error)
@@ -0,0 +1,113 @@
+import asyncio
+import cProfile
+import io
+import logging
+import os
+import pstats
+import re
+import tracemalloc
+from datetime import datetime, timezone
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+# Корень проекта, чтобы в отчете отдельно показать функции бота
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Глубина стека для мест выделения памяти
+TRACEMALLOC_FRAMES = 5
+
+
+class ProfilerBusy(Exception):
+	pass
+
+
+class Profiler:
+	"""
+	Профилирование работающего бота по команде: cProfile и снимки tracemalloc на заданное время.
+	Профилировщик ставится на поток event loop, поэтому видит все апдейты, которые обрабатываются
+	в это время. Пока профилирование не запущено, никаких хуков нет
+	"""
+
+	def __init__(self):
+		self._task: asyncio.Task | None = None
+
+	@property
+	def active(self) -> bool:
+		return self._task is not None and not self._task.done()
+
+	def start(self, seconds: float, top: int, on_done: Callable[[str], Awaitable[None]]) -> asyncio.Task:
+		"""Запускает профилирование в фоне, отчет передается в on_done"""
+		if self.active:
+			raise ProfilerBusy()
+
+		async def run():
+			try:
+				await on_done(await self.profile(seconds, top))
+			except Exception:
+				logger.exception("Profiling failed")
+
+		self._task = asyncio.create_task(run())
+		return self._task
+
+	async def stop(self) -> None:
+		"""Прерывает профилирование без отчета, например при остановке бота"""
+		if not self.active:
+			return
+		self._task.cancel()
+		await asyncio.gather(self._task, return_exceptions=True)
+
+	async def profile(self, seconds: float, top: int = 30) -> str:
+		profile = cProfile.Profile()
+		# tracemalloc мог включить кто-то другой, тогда его не выключаем
+		started_tracing = not tracemalloc.is_tracing()
+		if started_tracing:
+			tracemalloc.start(TRACEMALLOC_FRAMES)
+		before = tracemalloc.take_snapshot()
+		started_at = datetime.now(timezone.utc)
+		profile.enable()
+		try:
+			await asyncio.sleep(seconds)
+		finally:
+			profile.disable()
+			after = tracemalloc.take_snapshot()
+			if started_tracing:
+				tracemalloc.stop()
+		return format_report(profile, before, after, started_at, seconds, top)
+
+
+def format_report(
+		profile: cProfile.Profile,
+		before: tracemalloc.Snapshot,
+		after: tracemalloc.Snapshot,
+		started_at: datetime,
+		seconds: float,
+		top: int,
+) -> str:
+	out = io.StringIO()
+	out.write(f"Профиль с {started_at:%Y-%m-%d %H:%M:%S} UTC, {seconds:g} с, топ {top}\n")
+
+	stats = pstats.Stats(profile, stream=out)
+	# Функции бота без зависимостей из виртуального окружения
+	project = rf"^{re.escape(PROJECT_ROOT)}{re.escape(os.sep)}(?!\.?venv)"
+	for title, sort, restrictions in (
+			("Функции бота по общему времени", "cumulative", (project, top)),
+			("Все функции по общему времени", "cumulative", (top,)),
+			("Все функции по собственному времени", "tottime", (top,)),
+	):
+		out.write(f"\n=== {title} ===\n")
+		stats.sort_stats(sort).print_stats(*restrictions)
+
+	ignored = (
+		tracemalloc.Filter(False, tracemalloc.__file__),
+		tracemalloc.Filter(False, __file__),
+		tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+		tracemalloc.Filter(False, "<unknown>"),
+	)
+	allocations = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), "lineno")
+	out.write(f"\n=== Места выделения памяти, прирост за {seconds:g} с ===\n")
+	for statistic in allocations[:top]:
+		out.write(f"{statistic}\n")
+	return out.getvalue()
+
+
+profiler = Profiler()
@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import signal
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+class GracefulRequestHandler(SimpleRequestHandler):
+	"""
+	Обработчик вебхука, который при остановке дожидается апдейтов,
+	которые еще обрабатываются в фоне, и только потом закрывает сессию бота
+	"""
+
+	def __init__(self, *args, shutdown_timeout: float = 30, **kwargs):
+		super().__init__(*args, **kwargs)
+		self.shutdown_timeout = shutdown_timeout
+
+	async def close(self) -> None:
+		tasks = self._background_feed_update_tasks
+		if tasks:
+			logger.info(f"Waiting for {len(tasks)} updates to finish")
+			await asyncio.wait(tasks, timeout=self.shutdown_timeout)
+		await super().close()
+
+
+def create_webhook_app(dp: Dispatcher, bot: Bot, path: str, secret_token: str) -> web.Application:
+	"""
+	aiohttp приложение, которое передает апдейты в тот же Dispatcher
+	со всеми middleware. Запросы без верного секретного токена получают 401.
+	Без токена любой, кто узнал адрес, мог бы прислать заказ от имени CHAT_ID, поэтому он обязателен
+	"""
+	if not secret_token:
+		raise ValueError("webhook secret token is required")
+	app = web.Application()
+	GracefulRequestHandler(dispatcher=dp, bot=bot, secret_token=secret_token).register(app, path=path)
+	setup_application(app, dp, bot=bot)
+	return app
+
+
+async def run_webhook(
+		dp: Dispatcher,
+		bot: Bot,
+		base_url: str,
+		path: str,
+		secret_token: str,
+		host: str,
+		port: int,
+) -> None:
+	app = create_webhook_app(dp, bot, path, secret_token)
+	runner = web.AppRunner(app)
+	await runner.setup()
+	site = web.TCPSite(runner, host, port)
+	await site.start()
+
+	await bot.set_webhook(
+		f"{base_url}{path}",
+		secret_token=secret_token,
+		allowed_updates=dp.resolve_used_update_types(),
+	)
+	logger.info(f"Webhook server is listening on {host}:{port}{path}")
+
+	stop = asyncio.Event()
+	loop = asyncio.get_running_loop()
+	for sig in (signal.SIGINT, signal.SIGTERM):
+		loop.add_signal_handler(sig, stop.set)
+
+	try:
+		await stop.wait()
+	finally:
+		# Перестаем принимать запросы, дожидаемся текущих апдейтов и вызываем shutdown
+		await runner.cleanup()
+		logger.info("Webhook server stopped")
@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+from db.base import create_tables
+
+
+@pytest.fixture
+def run_db(tmp_path):
+    """
+    Запускает scenario(sessionmaker) в своем цикле событий на чистой бд в tmp_path.
+    Движок создается и закрывается в том же цикле, в котором им пользуются
+    """
+
+    def run(scenario, sessionmaker_class=async_sessionmaker, **engine_kwargs):
+        async def main():
+            engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", **engine_kwargs)
+            sessionmaker = sessionmaker_class(engine, expire_on_commit=False)
+            await create_tables(engine)
+            try:
+                return await scenario(sessionmaker)
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
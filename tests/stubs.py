@@ -0,0 +1,189 @@
+import asyncio
+import itertools
+import time
+
+from aiogram import Bot
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
+from aiohttp import web
+
+
+class StubService:
+    """
+    Локальная заглушка веб сервиса для тестов отправки заказов.
+    Заказы с "reject": true сервис не принимает, без batch адреса для пачек нет
+    """
+
+    def __init__(
+            self,
+            fail_times: int = 0,
+            delay: float = 0,
+            batch: bool = True,
+            malformed_batches: int = 0,
+            malformed_sends: int = 0,
+    ):
+        self.fail_times = fail_times
+        self.delay = delay
+        self.batch = batch
+        # Сколько заказов принять по одному, но ответить 200 с телом, которое не JSON
+        self.malformed_sends = malformed_sends
+        # Сколько пачек принять, но ответить 200 с непонятным телом
+        self.malformed_batches = malformed_batches
+        # Все полученные заказы, и по одному, и в пачках
+        self.requests: list[dict] = []
+        # Время получения каждого заказа из requests, по time.perf_counter
+        self.received_at: list[float] = []
+        # Число HTTP запросов и размеры принятых пачек
+        self.http_requests = 0
+        self.batches: list[int] = []
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    def _receive(self, orders: list[dict]) -> None:
+        self.http_requests += 1
+        self.requests.extend(orders)
+        self.received_at.extend(time.perf_counter() for _ in orders)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        data = await request.json()
+        self._receive([data])
+        # Задержка ответа берется из тела запроса
+        await asyncio.sleep(data.get("delay", self.delay))
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            return web.json_response({"ok": False}, status=503)
+        if data.get("reject"):
+            return web.json_response({"ok": False, "error": "rejected"}, status=422)
+        if self.malformed_sends > 0:
+            self.malformed_sends -= 1
+            return web.Response(text="accepted", content_type="application/json")
+        return web.json_response({"ok": True, "id": data.get("id")})
+
+    async def handle_batch(self, request: web.Request) -> web.Response:
+        if not self.batch:
+            raise web.HTTPNotFound()
+        orders = (await request.json())["orders"]
+        self._receive(orders)
+        self.batches.append(len(orders))
+        await asyncio.sleep(max((order.get("delay", self.delay) for order in orders), default=self.delay))
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            return web.json_response({"ok": False}, status=503)
+        if self.malformed_batches > 0:
+            self.malformed_batches -= 1
+            return web.Response(text="<html>accepted</html>", content_type="text/html")
+        return web.json_response({"results": [
+            {"ok": False, "error": "rejected"} if order.get("reject") else {"ok": True, "id": order.get("id")}
+            for order in orders
+        ]})
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/api/token", self.handle)
+        app.router.add_post("/api/token/batch", self.handle_batch)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://127.0.0.1:{port}/api/token"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench bot", "username": "bench_bot"}
+
+
+class FakeTelegram:
+    """
+    Локальная заглушка Bot API: отдает апдейты через getUpdates
+    и запоминает все сообщения, которые бот отправил в ответ
+    """
+
+    def __init__(self, delay: float = 0):
+        # Задержка ответов на отправку сообщений, имитирует сетевую задержку до Bot API
+        self.delay = delay
+        self.updates: list[dict] = []
+        self.enqueued_at: dict[int, float] = {}
+        self.sent: list[dict] = []
+        self.calls: dict[str, int] = {}
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    def message_update(self, text: str, chat_id: int, user_id: int = 100) -> dict:
+        update_id = next(self._update_ids)
+        return {
+            "update_id": update_id,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": {"id": chat_id, "type": "supergroup", "title": "Orders"},
+                "from": {"id": user_id, "is_bot": False, "first_name": "Operator"},
+                "text": text,
+            },
+        }
+
+    def enqueue(self, update: dict) -> None:
+        self.updates.append(update)
+        self.enqueued_at[update["update_id"]] = time.perf_counter()
+        self._new_updates.set()
+
+    def bot(self, token: str = "42:bench") -> Bot:
+        session = AiohttpSession(api=TelegramAPIServer.from_base(self.url))
+        return Bot(token=token, session=session)
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        self.calls[method] = self.calls.get(method, 0) + 1
+        data = dict(await request.post()) if request.can_read_body else {}
+
+        if method == "getUpdates":
+            return web.json_response({"ok": True, "result": await self._get_updates(data)})
+        if method == "getMe":
+            return web.json_response({"ok": True, "result": BOT_USER})
+        if method in ("sendMessage", "editMessageText", "sendDocument"):
+            self.sent.append({"method": method, **data})
+            await asyncio.sleep(self.delay)
+            return web.json_response({"ok": True, "result": {
+                "message_id": next(self._message_ids),
+                "date": int(time.time()),
+                "chat": {"id": int(data.get("chat_id", 0)), "type": "supergroup", "title": "Orders"},
+                "from": BOT_USER,
+                "text": data.get("text", ""),
+            }})
+        # setMyCommands, setWebhook, deleteWebhook, answerCallbackQuery и прочие
+        return web.json_response({"ok": True, "result": True})
+
+    async def _get_updates(self, data: dict) -> list[dict]:
+        offset = int(data.get("offset", 0))
+        limit = int(data.get("limit", 100))
+        timeout = float(data.get("timeout", 0))
+        # Подтвержденные апдейты больше не отдаются, как в настоящем Bot API
+        self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout=timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:limit]
+
+    async def start(self) -> str:
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self.handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        self.url = f"http://127.0.0.1:{self._runner.addresses[0][1]}"
+        return self.url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
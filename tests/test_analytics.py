@@ -0,0 +1,82 @@
+from datetime import datetime, time, timedelta
+
+import pytest
+from sqlalchemy import delete
+
+from db.models import Transaction, HourlyStats
+from db.repos import save_transaction, get_analytics, get_analytics_series, backfill_hourly_stats
+from handlers.analytics import parse_analytics_args
+
+
+def test_analytics_series_by_hour_and_day(run_db):
+    async def scenario(sessionmaker):
+        async with sessionmaker() as session:
+            for i, (timestamp, price) in enumerate((
+                    (datetime(2026, 9, 1, 10, 5), 99),
+                    (datetime(2026, 9, 1, 10, 55), 49),
+                    (datetime(2026, 9, 1, 12, 0), 159),
+                    (datetime(2026, 9, 3, 23, 59), 299),
+            )):
+                await save_transaction(session, Transaction(
+                    transaction_id=str(i), roblox_name="vepe211", total_price=price, timestamp=timestamp,
+                ))
+
+        async with sessionmaker() as session:
+            days = await get_analytics_series(session, datetime(2026, 9, 1), datetime(2026, 9, 4), "day")
+            hours = await get_analytics_series(session, datetime(2026, 9, 1, 10), datetime(2026, 9, 1, 13), "hour")
+
+            # Часы, пересчитанные из transactions, совпадают с набранными в hourly_stats
+            await session.execute(delete(HourlyStats))
+            await session.commit()
+            assert await backfill_hourly_stats(session)
+            backfilled = await get_analytics_series(session, datetime(2026, 9, 1, 10), datetime(2026, 9, 1, 13), "hour")
+        return days, hours, backfilled
+
+    days, hours, backfilled = run_db(scenario)
+
+    assert days == [
+        (datetime(2026, 9, 1), 3, 307),
+        (datetime(2026, 9, 2), 0, 0),
+        (datetime(2026, 9, 3), 1, 299),
+    ]
+    assert hours == [
+        (datetime(2026, 9, 1, 10), 2, 148),
+        (datetime(2026, 9, 1, 11), 0, 0),
+        (datetime(2026, 9, 1, 12), 1, 159),
+    ]
+    assert backfilled == hours
+
+
+def test_analytics_week_and_month_include_boundary_days(run_db):
+    async def scenario(sessionmaker):
+        # Неделя - сегодня и 6 дней до него, месяц - сегодня и 29 дней до него
+        today = datetime.combine(datetime.utcnow().date(), time(12))
+        async with sessionmaker() as session:
+            for days_ago in (0, 6, 7, 29, 30):
+                await save_transaction(session, Transaction(
+                    transaction_id=str(days_ago), roblox_name="vepe211", total_price=10,
+                    timestamp=today - timedelta(days=days_ago),
+                ))
+            analytics = await get_analytics(session)
+        return analytics
+
+    analytics = run_db(scenario)
+
+    assert (analytics["week_transactions"], analytics["week_spent"]) == (2, 20)
+    assert (analytics["month_transactions"], analytics["month_spent"]) == (4, 40)
+    assert analytics["total_transactions"] == 5
+
+
+def test_parse_analytics_args():
+    assert parse_analytics_args(["2026-09-01", "2026-10-01", "day"]) == (
+        datetime(2026, 9, 1), datetime(2026, 10, 1), "day",
+    )
+    assert parse_analytics_args(["2026-09-01T10:00", "2026-09-02", "hour"])[2] == "hour"
+    assert parse_analytics_args(["2026-09-01"])[2] == "day"
+    # Время с часовым поясом переводится в UTC
+    assert parse_analytics_args(["2026-09-01T00:00+03:00", "2026-09-02T00:00Z"])[:2] == (
+        datetime(2026, 8, 31, 21), datetime(2026, 9, 2),
+    )
+    for args in (["2026-10-01", "2026-09-01"], ["yesterday"], ["2026-09-01", "2026-10-01", "week"]):
+        with pytest.raises(ValueError):
+            parse_analytics_args(args)
@@ -0,0 +1,137 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+from db.cache import ResultCache
+from db.models import Transaction
+from db.repos import save_transaction, get_recent_transactions
+from schemas import TransactionInfo
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(clock=None):
+    cache = ResultCache(ttls={"report": 10}, clock=clock or Clock())
+    calls = []
+
+    @cache.cached("report", tags=("transactions",))
+    async def report(session, days=None):
+        calls.append(days)
+        await asyncio.sleep(0.01)
+        return [days, len(calls)]
+
+    return cache, report, calls
+
+
+class Session:
+    bind = "engine"
+
+
+def test_concurrent_requests_share_one_query():
+    cache, report, calls = make_cache()
+
+    async def scenario():
+        return await asyncio.gather(*(report(Session(), days=7) for _ in range(10)))
+
+    results = asyncio.run(scenario())
+
+    assert calls == [7]
+    assert all(result == [7, 1] for result in results)
+    assert cache.stats()["commands"]["report"] == {"misses": 1, "coalesced": 9}
+
+
+def test_results_expire_and_are_invalidated():
+    clock = Clock()
+    cache, report, calls = make_cache(clock)
+
+    async def scenario():
+        session = Session()
+        await report(session)
+        await report(session)
+        clock.now = 11
+        await report(session)
+        cache.invalidate("transactions")
+        await report(session)
+
+        # Результат запроса, во время которого данные поменялись, не сохраняется
+        pending = asyncio.ensure_future(report(session, days=1))
+        await asyncio.sleep(0)
+        cache.invalidate("transactions")
+        await pending
+        await report(session, days=1)
+
+    asyncio.run(scenario())
+
+    assert calls == [None, None, None, 1, 1]
+    assert cache.stats()["commands"]["report"] == {"misses": 5, "hits": 1}
+
+
+def test_errors_are_not_cached():
+    cache = ResultCache(ttls={"report": 10})
+    calls = []
+
+    @cache.cached("report", tags=())
+    async def report(session):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+        return "ok"
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await report(Session())
+        return await report(Session())
+
+    assert asyncio.run(scenario()) == "ok"
+    assert len(calls) == 2
+
+
+def test_save_transaction_invalidates_recents(run_db):
+    async def scenario(sessionmaker):
+        async with sessionmaker() as session:
+            before = await get_recent_transactions(session, limit=10)
+            cached = await get_recent_transactions(session, limit=10)
+            await save_transaction(session, Transaction(
+                transaction_id="1", roblox_name="vepe211", total_price=99, timestamp=datetime(2026, 9, 1),
+            ))
+            after = await get_recent_transactions(session, limit=10)
+        return before, cached, after
+
+    before, cached, after = run_db(scenario)
+
+    assert cached is before
+    assert [t.transaction_id for t in after.items] == ["1"]
+    # Из кэша отдаются копии строк, а не объекты ORM, привязанные к сессии
+    assert isinstance(after.items[0], TransactionInfo)
+
+
+def test_evicted_and_expired_keys_leave_tags():
+    clock = Clock()
+    cache = ResultCache(ttls={"report": 10}, max_entries=5, clock=clock)
+
+    @cache.cached("report", tags=("transactions", "sets"))
+    async def report(session, days=None):
+        return days
+
+    async def scenario():
+        for days in range(50):
+            await report(Session(), days=days)
+        full = cache.stats()
+        # Истекшая запись удаляется при следующем обращении
+        clock.now = 11
+        await report(Session(), days=49)
+        return full, cache.stats()
+
+    full, after_expiry = asyncio.run(scenario())
+
+    assert full["entries"] == 5
+    assert full["tagged_keys"] == 10, "Вытесненные записи не остаются в тегах"
+    assert after_expiry["entries"] == 5
+    assert after_expiry["tagged_keys"] == 10
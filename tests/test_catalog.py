@@ -0,0 +1,187 @@
+import asyncio
+
+from sqlalchemy import select
+
+from db.catalog import SetCatalog, AliasIndex, alias_index, set_catalog
+from db.dedup import seen_transactions
+from db.models import Alias, ItemEntity
+from db.repos import import_sets, import_aliases, add_alias, change_alias, remove_alias
+from handlers.admin import stats_records
+from handlers.message import process_order
+from services.metrics import Metrics
+from schemas import Item, ParsedMessageResult
+
+
+class SlowSession:
+    """Сессия, запрос которой ждет сигнала, чтобы изменить сеты посреди загрузки"""
+
+    def __init__(self, session):
+        self.session = session
+        self.started = asyncio.Event()
+        self.resume = asyncio.Event()
+
+    async def execute(self, *args, **kwargs):
+        result = await self.session.execute(*args, **kwargs)
+        self.started.set()
+        await self.resume.wait()
+        return result
+
+
+def run_catalog(run_db, scenario):
+    async def seeded(sessionmaker):
+        async with sessionmaker() as session:
+            await import_sets(session, {"Anger set": [("Red seer", 1), ("Red anger", 2)]})
+        return await scenario(sessionmaker)
+
+    return run_db(seeded)
+
+
+def test_expand_scales_set_items(run_db):
+    async def scenario(sessionmaker):
+        catalog = SetCatalog()
+        async with sessionmaker() as session:
+            return catalog, await catalog.expand(session, [
+                Item(name="  anger  SET", amount=3, unit_price=300),
+                Item(name="Corrupt", amount=1, unit_price=99),
+            ])
+
+    catalog, items = run_catalog(run_db, scenario)
+
+    assert items == [
+        Item(name="Red seer", amount=3, unit_price=0),
+        Item(name="Red anger", amount=6, unit_price=0),
+        Item(name="Corrupt", amount=1, unit_price=99),
+    ]
+    assert catalog.stats() == {"sets": 1, "hits": 1, "misses": 1, "loads": 1}
+    registry = Metrics()
+    catalog.register_metrics(registry)
+    lines = registry.render().splitlines()
+    for line in ("bot_set_catalog_hits_total 1", "bot_set_catalog_misses_total 1", "bot_set_catalog_sets 1"):
+        assert line in lines
+    assert any(record.startswith("сетов ") for record in stats_records())
+
+
+def test_invalidate_reloads_sets(run_db):
+    async def scenario(sessionmaker):
+        catalog = SetCatalog()
+        async with sessionmaker() as session:
+            await catalog.get(session, "Anger set")
+            # Сеты в памяти, повторный поиск не загружает их снова
+            await catalog.get(session, "Anger set")
+            await import_sets(session, {"Anger set": [("Red seer", 5)]})
+            catalog.invalidate()
+            return catalog, await catalog.get(session, "Anger set")
+
+    catalog, items = run_catalog(run_db, scenario)
+
+    assert items == (("Red seer", 5),)
+    assert catalog.stats()["loads"] == 2
+
+
+def test_load_during_invalidate_is_not_kept(run_db):
+    async def scenario(sessionmaker):
+        catalog = SetCatalog()
+        async with sessionmaker() as session:
+            slow = SlowSession(session)
+            loading = asyncio.create_task(catalog.get(slow, "Anger set"))
+            await slow.started.wait()
+            # Сеты меняются, пока загрузка держит старый результат
+            async with sessionmaker() as other:
+                await import_sets(other, {"Anger set": [("Red seer", 5)]})
+            catalog.invalidate()
+            slow.resume.set()
+            stale = await loading
+            loaded = catalog.loaded
+            return stale, loaded, await catalog.get(session, "Anger set")
+
+    stale, loaded, items = run_catalog(run_db, scenario)
+
+    # Начатый запрос получает сеты на момент своей загрузки, но каталог их не сохраняет
+    assert stale == (("Red seer", 1), ("Red anger", 2))
+    assert not loaded
+    assert items == (("Red seer", 5),)
+
+
+def test_alias_index_resolve_set_and_discard(run_db):
+    async def scenario(sessionmaker):
+        index = AliasIndex()
+        async with sessionmaker() as session:
+            await import_aliases(session, {"Corrupt": "Corrupt knife"})
+            await index.load(session)
+
+        resolved = [index.resolve("  corrupt "), index.resolve("Song")]
+        index.set("Song", "Song knife")
+        index.discard("CORRUPT")
+        return resolved, [index.resolve("Corrupt"), index.resolve("song")]
+
+    resolved, updated = run_catalog(run_db, scenario)
+
+    assert resolved == ["Corrupt knife", "Song"]
+    assert updated == ["Corrupt", "Song knife"]
+
+
+def test_alias_change_during_load_is_not_lost(run_db):
+    async def scenario(sessionmaker):
+        index = AliasIndex()
+        async with sessionmaker() as session:
+            slow = SlowSession(session)
+            loading = asyncio.create_task(index.load(slow))
+            await slow.started.wait()
+            # Загрузка уже прочитала псевдонимы, а индекс еще пуст и set его не меняет
+            async with sessionmaker() as other:
+                await other.execute(Alias.__table__.insert().values(origin_name="Corrupt", alias_name="Corrupt knife"))
+                await other.commit()
+            index.set("Corrupt", "Corrupt knife")
+            slow.resume.set()
+            stale = await loading
+            return stale, await index.resolve_items(session, [Item(name="Corrupt", amount=1, unit_price=99)])
+
+    stale, items = run_catalog(run_db, scenario)
+
+    # Устаревшая загрузка не сохранена, индекс перечитан вместе с новым псевдонимом
+    assert stale == {}
+    assert items == [Item(name="Corrupt knife", amount=1, unit_price=99)]
+
+
+def test_order_items_use_aliases_and_sets(run_db):
+    class Message:
+        async def reply(self, text: str):
+            pass
+
+    class Outbox:
+        def notify(self):
+            pass
+
+    async def scenario(sessionmaker):
+        # Модульные индексы могли остаться от других тестов
+        set_catalog.invalidate()
+        async with sessionmaker() as session:
+            await alias_index.load(session)
+            await seen_transactions.load(session)
+            await add_alias(session, Alias(origin_name="Corrupt", alias_name="Old knife"))
+            await change_alias(session, Alias(
+                id=(await session.scalar(select(Alias.id))), origin_name="Corrupt", alias_name="Corrupt knife",
+            ))
+            await add_alias(session, Alias(origin_name="Removed", alias_name="Removed knife"))
+            await remove_alias(session, "Removed")
+            # Псевдоним может вести на сет, который раскрывается в предметы
+            await import_aliases(session, {"Anger": "Anger set"})
+
+            await process_order(Message(), session, Outbox(), ParsedMessageResult(
+                items=[
+                    Item(name="corrupt", amount=2, unit_price=99),
+                    Item(name="Removed", amount=1, unit_price=10),
+                    Item(name="Anger", amount=1, unit_price=300),
+                ],
+                roblox_username="vepe211",
+                transaction_id="6682510345",
+                total_price=508,
+            ))
+            result = await session.execute(
+                select(ItemEntity.item_name, ItemEntity.amount).order_by(ItemEntity.id)
+            )
+            return result.all()
+
+    items = run_catalog(run_db, scenario)
+
+    assert items == [("Corrupt knife", 2), ("Removed", 1), ("Red seer", 1), ("Red anger", 2)]
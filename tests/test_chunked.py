@@ -0,0 +1,49 @@
+import asyncio
+
+from utils import answer_chunked, text_length, MESSAGE_LIMIT
+
+
+class FakeMessage:
+    def __init__(self):
+        self.sent: list[tuple[str, object]] = []
+
+    async def answer(self, text, reply_markup=None):
+        self.sent.append((text, reply_markup))
+
+    async def edit_text(self, text, reply_markup=None):
+        self.sent.append((text, reply_markup))
+
+
+def test_long_listing_is_split_on_record_boundaries():
+    records = [f"Транзакция {i}\n" + "предмет\n" * 20 for i in range(200)]
+
+    async def rows():
+        for record in records:
+            yield record
+
+    message = FakeMessage()
+    sent = asyncio.run(answer_chunked(message, rows(), header="Последние транзакции:\n", reply_markup="keyboard"))
+
+    assert sent == len(message.sent) > 1
+    assert all(text_length(text) <= MESSAGE_LIMIT for text, _ in message.sent)
+    assert "".join(text for text, _ in message.sent) == "Последние транзакции:\n" + "".join(records)
+    # Каждое сообщение начинается с новой записи
+    assert all(text.startswith("Транзакция") for text, _ in message.sent[1:])
+    assert [markup for _, markup in message.sent] == [None] * (sent - 1) + ["keyboard"]
+
+
+def test_record_longer_than_limit_is_split():
+    record = "x" * 5000 + "\n" + "y" * 10
+
+    message = FakeMessage()
+    asyncio.run(answer_chunked(message, [record]))
+
+    assert all(text_length(text) <= MESSAGE_LIMIT for text, _ in message.sent)
+    assert "".join(text for text, _ in message.sent) == record
+
+
+def test_empty_listing():
+    message = FakeMessage()
+    asyncio.run(answer_chunked(message, [], header="Отчёт:\n", empty="Нет данных"))
+
+    assert message.sent == [("Нет данных", None)]
@@ -0,0 +1,119 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select, func
+
+from benchmarks.corpus import order_message
+from db.models import Alias, Transaction, OutboxEntry
+from formatters import parse_message
+from db.dedup import seen_transactions
+from db.repos import is_transaction_processed, add_alias, import_aliases, remove_alias, import_sets
+from handlers.message import order_locks, process_order
+from middlewares.concurrency import ConcurrencyLimitMiddleware
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies: list[str] = []
+
+    async def reply(self, text: str):
+        # Ответ уступает управление, как настоящий запрос в Bot API
+        await asyncio.sleep(0.01)
+        self.replies.append(text)
+
+
+class FakeOutbox:
+    def notify(self):
+        pass
+
+
+def run_duplicates(run_db, use_locks: bool):
+    async def scenario(sessionmaker):
+        async with sessionmaker() as session:
+            await seen_transactions.load(session)
+
+        texts = [order_message(i % 5, [("Corrupt", 2, 99)]) for i in range(40)]
+        message = FakeMessage()
+
+        async def handle(text: str):
+            parsed = parse_message(text)
+            async with sessionmaker() as session:
+                if use_locks:
+                    async with order_locks(parsed.transaction_id):
+                        await process_order(message, session, FakeOutbox(), parsed)
+                else:
+                    await process_order(message, session, FakeOutbox(), parsed)
+
+        await asyncio.gather(*(handle(text) for text in texts))
+
+        async with sessionmaker() as session:
+            transactions = await session.scalar(select(func.count(Transaction.id)))
+            queued = await session.scalar(select(func.count(OutboxEntry.id)))
+            processed = await is_transaction_processed(session, parse_message(texts[0]).transaction_id)
+        return transactions, queued, processed, message.replies
+
+    return run_db(scenario)
+
+
+def test_duplicate_orders_processed_once_when_concurrent(run_db):
+    transactions, queued, processed, replies = run_duplicates(run_db, use_locks=True)
+
+    assert transactions == 5
+    assert queued == 5
+    assert len(replies) == 5
+    # Локи освобождаются после обработки
+    assert len(order_locks) == 0
+
+
+def test_duplicate_orders_claimed_once_without_locks(run_db):
+    # Без локов процесса, как при заказе от старого процесса во время перезапуска: защищает только захват в бд
+    transactions, queued, processed, replies = run_duplicates(run_db, use_locks=False)
+
+    assert transactions == 5
+    assert queued == 5
+    assert processed
+    assert len(replies) == 5
+
+
+def test_concurrent_writes_wait_for_write_lock(run_db):
+    async def scenario(sessionmaker):
+        async with sessionmaker() as session:
+            await seen_transactions.load(session)
+
+        message = FakeMessage()
+
+        async def order(i: int):
+            async with sessionmaker() as session:
+                await process_order(message, session, FakeOutbox(), parse_message(
+                    order_message(i, [("Corrupt", 2, 99)])
+                ))
+
+        async def alias(i: int):
+            async with sessionmaker() as session:
+                await add_alias(session, Alias(origin_name=f"Item {i}", alias_name=f"Alias {i}"))
+            async with sessionmaker() as session:
+                await import_aliases(session, {f"Item {i}": f"New {i}", f"Bulk {i}": f"Bulk alias {i}"})
+            async with sessionmaker() as session:
+                await remove_alias(session, f"Bulk {i}")
+
+        async def sets(i: int):
+            async with sessionmaker() as session:
+                await import_sets(session, {f"Set {i}": [("Corrupt", 1), ("Song", 2)]})
+
+        await asyncio.gather(*(task(i) for i in range(10) for task in (order, alias, sets)))
+
+        async with sessionmaker() as session:
+            transactions = await session.scalar(select(func.count(Transaction.id)))
+            aliases = await session.scalar(select(func.count(Alias.id)))
+        return transactions, aliases
+
+    # Без ожидания в busy handler любая параллельная запись мимо write_lock упадет с "database is locked"
+    transactions, aliases = run_db(scenario, connect_args={"timeout": 0})
+
+    assert transactions == 10
+    assert aliases == 10
+
+
+def test_concurrency_limit_must_be_positive():
+    with pytest.raises(ValueError):
+        ConcurrencyLimitMiddleware(0)
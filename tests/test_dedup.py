@@ -0,0 +1,37 @@
+from db.dedup import BloomFilter, SeenTransactions
+from db.models import Transaction
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, error_rate=0.01)
+    for i in range(1000):
+        bloom.add(str(i))
+
+    assert all(str(i) in bloom for i in range(1000))
+    false_positives = sum(str(i) in bloom for i in range(1000, 11000))
+    assert false_positives < 300
+
+
+def test_seen_transactions_warmed_from_db(run_db):
+    async def scenario(sessionmaker):
+        async with sessionmaker() as session:
+            session.add_all(Transaction(transaction_id=str(i), roblox_name="vepe211", total_price=99) for i in range(20))
+            await session.commit()
+
+        # LRU меньше таблицы: старые transaction_id остаются только в фильтре
+        seen = SeenTransactions(lru_size=5, capacity=1000)
+        async with sessionmaker() as session:
+            await seen.load(session)
+            recent = await seen.is_processed(session, "19")
+            old = await seen.is_processed(session, "0")
+            new = await seen.is_processed(session, "new")
+            seen.add("new")
+            repeated = await seen.is_processed(session, "new")
+        return recent, old, new, repeated, seen.stats()
+
+    recent, old, new, repeated, stats = run_db(scenario)
+
+    assert (recent, old, new, repeated) == (True, True, False, True)
+    assert stats["lru_hits"] == 2
+    assert stats["db_hits"] == 1
+    assert stats["known"] == 21
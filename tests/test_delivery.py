@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+import pytest
+
+from services.delivery import DeliveryClient, DeliveryError
+from tests.stubs import StubService
+
+
+def test_slow_order_does_not_block_others():
+    async def scenario():
+        service = StubService()
+        url = await service.start()
+        client = DeliveryClient(url, max_concurrency=4)
+        try:
+            finished = []
+
+            async def send(order_id, delay=0):
+                await client.send({"id": order_id, "delay": delay})
+                finished.append((order_id, time.perf_counter()))
+
+            started = time.perf_counter()
+            slow = asyncio.create_task(send("slow", delay=1))
+            await asyncio.gather(*(send(f"fast-{i}") for i in range(10)))
+            fast_done = time.perf_counter() - started
+            await slow
+        finally:
+            await client.close()
+            await service.stop()
+        return fast_done, [order_id for order_id, _ in finished]
+
+    fast_done, order = asyncio.run(scenario())
+    assert fast_done < 0.5, "Быстрые заказы не должны ждать медленный"
+    assert order[-1] == "slow"
+
+
+def test_read_timeout_raises_delivery_error():
+    async def scenario():
+        service = StubService()
+        url = await service.start()
+        client = DeliveryClient(url, read_timeout=0.1)
+        try:
+            await client.send({"id": "slow", "delay": 1})
+        finally:
+            await client.close()
+            await service.stop()
+
+    with pytest.raises(DeliveryError):
+        asyncio.run(scenario())
+
+
+def test_concurrency_is_bounded():
+    async def scenario():
+        service = StubService()
+        url = await service.start()
+        client = DeliveryClient(url, max_concurrency=2)
+        try:
+            started = time.perf_counter()
+            await asyncio.gather(*(client.send({"id": i, "delay": 0.2}) for i in range(4)))
+            return time.perf_counter() - started
+        finally:
+            await client.close()
+            await service.stop()
+
+    elapsed = asyncio.run(scenario())
+    # 4 запроса по 0.2с при лимите 2 идут в две волны
+    assert elapsed >= 0.4
@@ -0,0 +1,28 @@
+import asyncio
+
+import pytest
+
+from db.engine import create_engine, parse_pragmas
+
+
+def test_sqlite_profile_applied_on_connect(tmp_path):
+    async def scenario():
+        engine = create_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", pragmas={"cache_size": -2000})
+        async with engine.connect() as conn:
+            settings = {
+                name: (await conn.exec_driver_sql(f"PRAGMA {name}")).scalar()
+                for name in ("journal_mode", "synchronous", "busy_timeout", "cache_size")
+            }
+        await engine.dispose()
+        return settings
+
+    settings = asyncio.run(scenario())
+
+    assert settings == {"journal_mode": "wal", "synchronous": 1, "busy_timeout": 5000, "cache_size": -2000}
+
+
+def test_parse_pragmas():
+    assert parse_pragmas("") == {}
+    assert parse_pragmas("cache_size=-20000, mmap_size=0") == {"cache_size": "-20000", "mmap_size": "0"}
+    with pytest.raises(ValueError):
+        parse_pragmas("journal_mode=WAL; DROP TABLE transactions")
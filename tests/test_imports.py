@@ -0,0 +1,122 @@
+import io
+import json
+
+import pytest
+from sqlalchemy import select, func
+from sqlalchemy.exc import IntegrityError
+
+from db.models import Alias, Set, SetItem
+from db.repos import import_aliases, import_sets
+from formatters import parse_sets_document
+from handlers.sets import add_set_handler
+
+
+def test_import_aliases_counts_inserted_and_updated(run_db):
+    async def scenario(sessionmaker):
+        async with sessionmaker() as session:
+            first = await import_aliases(session, {"Corrupt": "Old knife", "Song": "Song knife"})
+        async with sessionmaker() as session:
+            second = await import_aliases(session, {"Corrupt": "Corrupt knife", "Batwing": "Bat"})
+        async with sessionmaker() as session:
+            aliases = (await session.execute(
+                select(Alias.origin_name, Alias.alias_name).order_by(Alias.origin_name)
+            )).all()
+            rows = await session.scalar(select(func.count(Alias.id)))
+
+            # Повторный оригинал отклоняет уникальный индекс, импорт обновляет строку, а не добавляет
+            session.add(Alias(origin_name="Corrupt", alias_name="Duplicate"))
+            with pytest.raises(IntegrityError):
+                await session.commit()
+        return first, second, aliases, rows
+
+    first, second, aliases, rows = run_db(scenario)
+
+    assert first == (2, 0)
+    assert second == (1, 1)
+    assert aliases == [("Batwing", "Bat"), ("Corrupt", "Corrupt knife"), ("Song", "Song knife")]
+    assert rows == 3
+
+
+class FakeBot:
+    def __init__(self, document: dict):
+        self.content = json.dumps(document).encode()
+
+    async def download(self, document):
+        return io.BytesIO(self.content)
+
+
+class FakeMessage:
+    """Сообщение с прикрепленным JSON файлом для /add_set"""
+
+    def __init__(self, document: dict):
+        self.text = "/add_set"
+        self.document = "sets.json"
+        self.bot = FakeBot(document)
+        self.answers: list[str] = []
+
+    async def answer(self, text: str, **kwargs):
+        self.answers.append(text)
+
+
+def test_parse_sets_document_reports_every_error():
+    sets, errors = parse_sets_document({
+        "Anger set": [{"name": "Red seer", "amount": 1}],
+        "Empty set": [],
+        "Broken set": [{"name": "Red anger", "amount": 0}, {"amount": 2}, {"name": "Song", "amount": True}],
+    })
+
+    assert sets["Anger set"] == [("Red seer", 1)]
+    assert [(error.field, error.message.split(":")[0]) for error in errors] == [
+        ("Empty set", "Ожидается непустой список предметов"),
+        ("Broken set", "Предмет 1"),
+        ("Broken set", "Предмет 2"),
+        ("Broken set", "Предмет 3"),
+    ]
+    assert parse_sets_document(["Anger set"])[1][0].field == "document"
+
+
+def test_bad_sets_document_writes_nothing(run_db):
+    async def scenario(sessionmaker):
+        # Первый сет корректный, но из-за ошибки во втором не пишется ни один
+        message = FakeMessage({
+            "Anger set": [{"name": "Red seer", "amount": 1}],
+            "Broken set": [{"name": "Red anger", "amount": -1}],
+        })
+        async with sessionmaker() as session:
+            await add_set_handler(message, session)
+            sets = await session.scalar(select(func.count(Set.id)))
+            items = await session.scalar(select(func.count(SetItem.id)))
+        return message.answers, sets, items
+
+    answers, sets, items = run_db(scenario)
+
+    assert answers[0].startswith("Сеты не были добавлены")
+    assert "Broken set" in answers[0]
+    assert (sets, items) == (0, 0)
+
+
+def test_import_sets_reports_created_and_replaces_items(run_db):
+    async def scenario(sessionmaker):
+        async with sessionmaker() as session:
+            first = await import_sets(session, {"Anger set": [("Red seer", 1), ("Red anger", 2)]})
+        async with sessionmaker() as session:
+            second = await import_sets(session, {
+                "Anger set": [("Red seer", 3)],
+                "Heat set": [("Heat", 1)],
+            })
+        async with sessionmaker() as session:
+            items = (await session.execute(
+                select(Set.set_name, SetItem.item_name, SetItem.amount)
+                .join(SetItem, SetItem.set_id == Set.id)
+                .order_by(Set.set_name, SetItem.item_name)
+            )).all()
+            sets = await session.scalar(select(func.count(Set.id)))
+        return first, second, items, sets
+
+    first, second, items, sets = run_db(scenario)
+
+    assert first == {"Anger set": True}
+    assert second == {"Anger set": False, "Heat set": True}
+    # Предметы сета заменены целиком, а не дописаны
+    assert items == [("Anger set", "Red seer", 3), ("Heat set", "Heat", 1)]
+    assert sets == 2
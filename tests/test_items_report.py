@@ -0,0 +1,75 @@
+from datetime import datetime, time, timedelta
+
+import pytest
+from sqlalchemy import delete
+
+from db.models import Transaction, ItemEntity, DailyItemStats
+from db.repos import save_transaction, get_items_report, iter_items_report, backfill_item_stats
+from handlers.analytics import parse_items_report_args
+
+
+def make_transaction(transaction_id: str, timestamp: datetime, items: list[tuple[str, int, float]]) -> Transaction:
+    transaction = Transaction(transaction_id=transaction_id, roblox_name="vepe211", total_price=0, timestamp=timestamp)
+    transaction.items.extend(ItemEntity(item_name=name, amount=amount, unit_price=price) for name, amount, price in items)
+    return transaction
+
+
+def test_items_report_updated_with_transactions(run_db):
+    async def scenario(sessionmaker):
+        now = datetime.utcnow()
+        async with sessionmaker() as session:
+            await save_transaction(session, make_transaction("1", now, [("Corrupt", 2, 99), ("Corrupt", 1, 99)]))
+            await save_transaction(session, make_transaction("2", now, [("Song", 5, 49), ("Corrupt", 1, 159)]))
+            await save_transaction(session, make_transaction("3", now - timedelta(days=30), [("Song", 10, 49)]))
+
+        async with sessionmaker() as session:
+            total = await get_items_report(session)
+            week = await get_items_report(session, days=7)
+            top = await get_items_report(session, days=7, limit=1)
+            # Без кэша /items_report читает те же строки из курсора
+            streamed = [row async for row in iter_items_report(session, days=7)]
+
+            # Бэкфилл по позициям заказов считает заказы, штуки и выручку так же, как save_transaction
+            await session.execute(delete(DailyItemStats))
+            await session.commit()
+            assert await backfill_item_stats(session)
+            backfilled = await get_items_report(session)
+        return total, week, top, streamed, backfilled
+
+    total, week, top, streamed, backfilled = run_db(scenario)
+
+    # Две строки Corrupt в одном заказе - один заказ
+    assert [tuple(row) for row in total] == [("Song", 2, 15, 735.0), ("Corrupt", 2, 4, 456.0)]
+    assert [tuple(row) for row in week] == [("Song", 1, 5, 245.0), ("Corrupt", 2, 4, 456.0)]
+    assert [row.item_name for row in top] == ["Song"]
+    assert streamed == week
+    assert backfilled == total
+
+
+def test_items_report_period_edge(run_db):
+    async def scenario(sessionmaker):
+        today = datetime.combine(datetime.utcnow().date(), time(12))
+        async with sessionmaker() as session:
+            for days_ago in (0, 6, 7):
+                await save_transaction(session, make_transaction(
+                    str(days_ago), today - timedelta(days=days_ago), [("Corrupt", 1, 99)],
+                ))
+            week = await get_items_report(session, days=7)
+            day = await get_items_report(session, days=1)
+        return week, day
+
+    week, day = run_db(scenario)
+
+    # 7d - сегодня и 6 дней до него, строка 7 дней назад уже не входит
+    assert [tuple(row) for row in week] == [("Corrupt", 2, 2, 198.0)]
+    assert [tuple(row) for row in day] == [("Corrupt", 1, 1, 99.0)]
+
+
+def test_parse_items_report_args():
+    assert parse_items_report_args([]) == (None, None)
+    assert parse_items_report_args(["7d", "20"]) == (7, 20)
+    assert parse_items_report_args(["20"]) == (None, 20)
+    assert parse_items_report_args(["30d"]) == (30, None)
+    for args in (["0d"], ["week"], ["7d", "20", "5"], ["-3"]):
+        with pytest.raises(ValueError):
+            parse_items_report_args(args)
@@ -0,0 +1,148 @@
+import asyncio
+import time
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.filters import Command
+from aiogram.types import Message
+from aiohttp import ClientSession, web
+
+from db.dedup import SeenTransactions
+from db.models import Transaction
+from db.repos import is_transaction_processed, enqueue_transaction
+from middlewares.metrics import MetricsMiddleware
+from handlers.admin import stats_records
+from services.metrics import Metrics, Histogram, create_metrics_app, metrics
+
+
+def make_update(update_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": -100, "type": "supergroup", "title": "Orders"},
+            "text": text,
+        },
+    }
+
+
+def test_histogram_quantile():
+    histogram = Histogram()
+    for value in [0.0005] * 90 + [0.03] * 10:
+        histogram.observe(value)
+
+    assert histogram.count == 100
+    assert histogram.quantile(0.5) == 0.001
+    assert histogram.quantile(0.95) == 0.05
+    histogram.observe(60)
+    assert histogram.quantile(1) == float("inf")
+
+
+def test_middleware_records_handlers_per_router():
+    registry = Metrics()
+
+    async def scenario():
+        router = Router(name="Test router")
+
+        @router.message(Command("ok"))
+        async def ok_handler(message: Message):
+            await asyncio.sleep(0.002)
+
+        @router.message(Command("fail"))
+        async def failing_handler(message: Message):
+            raise RuntimeError("boom")
+
+        dp = Dispatcher()
+        dp.message.middleware(MetricsMiddleware(registry))
+        dp.include_router(router)
+        bot = Bot(token="42:test")
+
+        await dp.feed_raw_update(bot, make_update(1, "/ok"))
+        await dp.feed_raw_update(bot, make_update(2, "/ok"))
+        with pytest.raises(RuntimeError):
+            await dp.feed_raw_update(bot, make_update(3, "/fail"))
+        # Апдейт без обработчика в метрики не попадает
+        await dp.feed_raw_update(bot, make_update(4, "hello"))
+        await bot.session.close()
+
+    asyncio.run(scenario())
+
+    histograms = registry.histograms["bot_handler_seconds"]
+    assert histograms[("Test router", "ok_handler")].count == 2
+    assert histograms[("Test router", "ok_handler")].sum >= 0.004
+    assert histograms[("Test router", "failing_handler")].count == 1
+    assert registry.counters["bot_handler_errors_total"] == {("Test router", "failing_handler"): 1}
+    assert set(registry.counters["bot_handler_in_flight"].values()) == {0}
+
+
+def test_repo_calls_are_timed(run_db):
+    async def scenario(sessionmaker):
+        async with sessionmaker() as session:
+            await is_transaction_processed(session, "1")
+            transaction = Transaction(transaction_id="1", roblox_name="vepe211", total_price=99)
+            await enqueue_transaction(session, transaction, {"id": "1"})
+
+    repos = metrics.histograms["bot_repo_seconds"]
+    before = {name: repos[(name,)].count for name in ("is_transaction_processed", "enqueue_transaction")}
+    run_db(scenario)
+
+    for name, count in before.items():
+        assert repos[(name,)].count == count + 1
+    # Вложенные вызовы входят во время enqueue_transaction и отдельно не считаются
+    for name in ("save_transaction", "claim_transaction", "record_daily_stats", "record_item_stats"):
+        assert (name,) not in repos
+
+
+def test_metrics_endpoint_renders_prometheus_format():
+    registry = Metrics()
+    registry.observe("bot_delivery_seconds", ("ok",), 0.02)
+    registry.observe("bot_delivery_seconds", ("ok",), 3)
+    registry.inc("bot_handler_errors_total", ("Orders \"main\"", "handle_message"))
+
+    async def scenario():
+        runner = web.AppRunner(create_metrics_app(registry))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        async with ClientSession() as client:
+            async with client.get(f"http://127.0.0.1:{runner.addresses[0][1]}/metrics") as response:
+                content_type = response.headers["Content-Type"]
+                body = await response.text()
+        await runner.cleanup()
+        return content_type, body
+
+    content_type, body = asyncio.run(scenario())
+    lines = body.splitlines()
+
+    assert content_type.startswith("text/plain; version=0.0.4")
+    assert "# TYPE bot_delivery_seconds histogram" in lines
+    assert 'bot_delivery_seconds_bucket{outcome="ok",le="0.025"} 1' in lines
+    assert 'bot_delivery_seconds_bucket{outcome="ok",le="2.5"} 1' in lines
+    assert 'bot_delivery_seconds_bucket{outcome="ok",le="+Inf"} 2' in lines
+    assert 'bot_delivery_seconds_count{outcome="ok"} 2' in lines
+    assert 'bot_handler_errors_total{router="Orders \\"main\\"",handler="handle_message"} 1' in lines
+
+
+def test_dedup_counters_are_exported(run_db):
+    registry = Metrics()
+    seen = SeenTransactions()
+    seen.register_metrics(registry)
+
+    async def scenario(sessionmaker):
+        async with sessionmaker() as session:
+            await seen.load(session)
+            seen.add("1")
+            # Повторы отсекает LRU, новые заказы - фильтр, в бд не идет ни одна проверка
+            for transaction_id in ("1", "1", "2", "3"):
+                await seen.is_processed(session, transaction_id)
+
+    run_db(scenario)
+    lines = registry.render().splitlines()
+
+    assert "bot_dedup_lru_hits_total 2" in lines
+    assert "bot_dedup_bloom_negatives_total 2" in lines
+    assert "bot_dedup_db_checks_total 0" in lines
+    assert "bot_dedup_hit_rate 1.0" in lines
+    assert "# TYPE bot_dedup_hit_rate gauge" in lines
+    assert any(record.startswith("повторы из памяти") for record in stats_records())
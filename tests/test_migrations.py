@@ -0,0 +1,168 @@
+import asyncio
+
+import pytest
+from sqlalchemy import inspect
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from db.migrations import MIGRATIONS, Migration, create_index, migrate, schema_version
+from db.models import Base
+
+# Схема, которую create_all создавал до появления миграций
+BASELINE_SCHEMA = [
+    "CREATE TABLE transactions (transaction_id VARCHAR NOT NULL UNIQUE, roblox_name VARCHAR, total_price FLOAT,"
+    " timestamp DATETIME DEFAULT CURRENT_TIMESTAMP, id INTEGER NOT NULL PRIMARY KEY,"
+    " created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE TABLE item_transaction (transaction_id INTEGER REFERENCES transactions (id), amount INTEGER,"
+    " item_name VARCHAR, unit_price FLOAT, id INTEGER NOT NULL PRIMARY KEY,"
+    " created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE TABLE sets (set_name VARCHAR NOT NULL UNIQUE, id INTEGER NOT NULL PRIMARY KEY,"
+    " created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE TABLE set_items (set_id INTEGER REFERENCES sets (id), item_name VARCHAR, amount INTEGER,"
+    " id INTEGER NOT NULL PRIMARY KEY,"
+    " created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE TABLE aliases (origin_name VARCHAR, alias_name VARCHAR, id INTEGER NOT NULL PRIMARY KEY,"
+    " created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP)",
+    "CREATE INDEX ix_transactions_id ON transactions (id)",
+    "CREATE INDEX ix_item_transaction_id ON item_transaction (id)",
+    "CREATE INDEX ix_sets_id ON sets (id)",
+    "CREATE INDEX ix_set_items_id ON set_items (id)",
+    "CREATE INDEX ix_aliases_id ON aliases (id)",
+    "CREATE INDEX ix_aliases_origin_name ON aliases (origin_name)",
+    "INSERT INTO aliases (origin_name, alias_name) VALUES ('Corrupt', 'Old'), (NULL, 'Orphan'), ('Corrupt', 'New')",
+    "INSERT INTO transactions (id, transaction_id, roblox_name, total_price) VALUES (1, '6682510345', 'vepe211', 99)",
+    # Правильная ссылка и ссылка внешним Transaction ID, как ее записывал обработчик заказов
+    "INSERT INTO item_transaction (transaction_id, item_name, amount, unit_price)"
+    " VALUES (1, 'Corrupt', 1, 99), ('6682510345', 'Song', 2, 49)",
+]
+
+
+def inspect_schema(conn):
+    inspector = inspect(conn)
+    indexes = {
+        index["name"]: bool(index["unique"])
+        for table in inspector.get_table_names()
+        for index in inspector.get_indexes(table)
+    }
+    columns = {c["name"] for c in inspector.get_columns("transactions")}
+    return set(inspector.get_table_names()), indexes, columns
+
+
+def test_migrate_baseline_database(tmp_path):
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            for statement in BASELINE_SCHEMA:
+                await conn.exec_driver_sql(statement)
+
+        version = await migrate(engine)
+        # Повторный запуск ничего не применяет
+        again = await migrate(engine)
+
+        async with engine.connect() as conn:
+            tables, indexes, columns = await conn.run_sync(inspect_schema)
+            aliases = (await conn.exec_driver_sql("SELECT alias_name FROM aliases")).scalars().all()
+            items = (await conn.exec_driver_sql(
+                "SELECT transaction_id, external_transaction_id FROM item_transaction"
+            )).all()
+            statuses = (await conn.exec_driver_sql("SELECT status FROM transactions")).scalars().all()
+            applied = (await conn.execute(schema_version.select())).all()
+        await engine.dispose()
+        return version, again, tables, indexes, columns, aliases, items, statuses, applied
+
+    version, again, tables, indexes, columns, aliases, items, statuses, applied = asyncio.run(scenario())
+
+    assert version == again == MIGRATIONS[-1].version
+    assert len(applied) == len(MIGRATIONS)
+    assert {"outbox", "daily_stats"} <= tables
+    assert "status" in columns
+    # Заказы старого бота уже отправлены
+    assert statuses == ["completed"]
+    assert aliases == ["New"]
+    assert items == [(1, "6682510345"), (1, "6682510345")]
+    assert indexes["ix_aliases_origin_name"] is True
+    for name in (
+            "ix_transactions_timestamp_id", "ix_item_transaction_item_name_amount",
+            "ix_item_transaction_transaction_id", "ix_item_transaction_external_transaction_id", "ix_set_items_set_id",
+    ):
+        assert name in indexes
+    assert "ix_item_transaction_item_name" not in indexes
+
+
+def describe_schema(conn):
+    # Все, что create_all задает моделями: колонки, индексы, ограничения
+    inspector = inspect(conn)
+    return {
+        table: (
+            sorted(
+                (c["name"], str(c["type"]), c["nullable"], c["default"], c["primary_key"])
+                for c in inspector.get_columns(table)
+            ),
+            sorted(
+                (index["name"], tuple(index["column_names"]), bool(index["unique"]))
+                for index in inspector.get_indexes(table)
+            ),
+            sorted(tuple(unique["column_names"]) for unique in inspector.get_unique_constraints(table)),
+            sorted(
+                (tuple(fk["constrained_columns"]), fk["referred_table"], tuple(fk["referred_columns"]))
+                for fk in inspector.get_foreign_keys(table)
+            ),
+        )
+        for table in inspector.get_table_names()
+        if table != schema_version.name
+    }
+
+
+def test_migrations_match_models(tmp_path):
+    async def schema(name, prepare):
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / name}")
+        await prepare(engine)
+        async with engine.connect() as conn:
+            result = await conn.run_sync(describe_schema)
+        await engine.dispose()
+        return result
+
+    async def models(engine):
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    async def baseline(engine):
+        async with engine.begin() as conn:
+            for statement in BASELINE_SCHEMA:
+                await conn.exec_driver_sql(statement)
+        await migrate(engine)
+
+    async def scenario():
+        return (
+            await schema("models.db", models),
+            await schema("empty.db", migrate),
+            await schema("baseline.db", baseline),
+        )
+
+    models, empty, upgraded = asyncio.run(scenario())
+
+    # Изменение модели без миграции оставит старые бд со старой схемой
+    assert empty == models
+    assert upgraded == models
+
+
+def test_failed_migration_rolls_back(tmp_path):
+    def broken(conn):
+        create_index(conn, "ix_transactions_roblox_name", "transactions", "roblox_name")
+        raise RuntimeError("broken migration")
+
+    async def scenario():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        await migrate(engine)
+        with pytest.raises(RuntimeError):
+            await migrate(engine, MIGRATIONS + [Migration(100, "broken", broken)])
+
+        async with engine.connect() as conn:
+            _, indexes, _ = await conn.run_sync(inspect_schema)
+            version = await migrate(engine)
+        await engine.dispose()
+        return indexes, version
+
+    indexes, version = asyncio.run(scenario())
+
+    assert "ix_transactions_roblox_name" not in indexes
+    assert version == MIGRATIONS[-1].version
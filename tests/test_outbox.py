@@ -0,0 +1,142 @@
+import asyncio
+
+from sqlalchemy import select
+
+from db.models import Transaction, OutboxEntry
+from db.repos import enqueue_transaction
+from schemas import TransactionStatus
+from services.delivery import DeliveryClient
+from services.outbox import OutboxWorker
+from tests.stubs import StubService
+
+
+async def wait_for_status(sessionmaker, transaction_id: str, status: TransactionStatus):
+    for _ in range(200):
+        async with sessionmaker() as session:
+            result = await session.execute(
+                select(Transaction.status).where(Transaction.transaction_id == transaction_id)
+            )
+            if result.scalar() == status:
+                return
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"Transaction {transaction_id} did not reach {status}")
+
+
+def run_outbox(run_db, service: StubService, expected: TransactionStatus, **worker_kwargs):
+    async def scenario(sessionmaker):
+        url = await service.start()
+        client = DeliveryClient(url)
+        worker = OutboxWorker(sessionmaker, client, base_delay=0.01, poll_interval=0.05, **worker_kwargs)
+        await worker.start()
+        try:
+            async with sessionmaker() as session:
+                transaction = Transaction(transaction_id="100", roblox_name="vepe211", total_price=159)
+                await enqueue_transaction(session, transaction, {"id": "100"})
+            worker.notify()
+
+            await wait_for_status(sessionmaker, "100", expected)
+
+            async with sessionmaker() as session:
+                outbox = (await session.execute(select(OutboxEntry))).scalars().all()
+        finally:
+            await worker.stop()
+            await client.close()
+            await service.stop()
+        return outbox
+
+    return run_db(scenario)
+
+
+def test_outbox_retries_until_delivered(run_db):
+    service = StubService(fail_times=2)
+    outbox = run_outbox(run_db, service, TransactionStatus.completed)
+
+    assert len(service.requests) == 3, "Две ошибки и одна успешная попытка"
+    assert outbox == [], "Отправленный заказ удаляется из очереди"
+
+
+def test_outbox_gives_up_after_max_attempts(run_db):
+    service = StubService(fail_times=100)
+    outbox = run_outbox(run_db, service, TransactionStatus.failed, max_attempts=3)
+
+    assert len(service.requests) == 3
+    assert len(outbox) == 1
+    assert outbox[0].next_attempt_at is None
+    assert outbox[0].attempts == 3
+
+
+def test_outbox_gives_up_after_malformed_reply(run_db):
+    # Сервис принял заказ, но ответ не разобрать: запись тратит попытку, а не уходит на повтор бесконечно
+    service = StubService(malformed_sends=100)
+    outbox = run_outbox(run_db, service, TransactionStatus.failed, max_attempts=1)
+
+    assert len(service.requests) == 1
+    assert outbox[0].attempts == 1
+    assert outbox[0].last_error.startswith("Expecting value")
+
+
+def run_batch_outbox(run_db, service: StubService, payloads: list[dict], **worker_kwargs):
+    async def scenario(sessionmaker):
+        url = await service.start()
+        client = DeliveryClient(url)
+        worker = OutboxWorker(sessionmaker, client, base_delay=0.01, poll_interval=0.05, **worker_kwargs)
+        # Все заказы уже в очереди к первому опросу, поэтому разбиение на пачки не зависит от времени
+        async with sessionmaker() as session:
+            for payload in payloads:
+                transaction = Transaction(transaction_id=payload["id"], roblox_name="vepe211", total_price=159)
+                await enqueue_transaction(session, transaction, payload)
+        await worker.start()
+        try:
+            for _ in range(200):
+                async with sessionmaker() as session:
+                    result = await session.execute(select(Transaction.transaction_id, Transaction.status))
+                    statuses = dict(result.all())
+                if TransactionStatus.sent not in statuses.values():
+                    break
+                await asyncio.sleep(0.02)
+        finally:
+            await worker.stop()
+            await client.close()
+            await service.stop()
+        return statuses
+
+    return run_db(scenario)
+
+
+def test_outbox_sends_batches_with_per_order_outcomes(run_db):
+    service = StubService()
+    payloads = [{"id": str(i), "reject": i == 7} for i in range(20)]
+    statuses = run_batch_outbox(run_db, service, payloads, workers=2, batch_size=10, max_attempts=3)
+
+    assert statuses["7"] == TransactionStatus.failed, "Непринятый заказ повторяется и сдается отдельно"
+    assert all(status == TransactionStatus.completed for id, status in statuses.items() if id != "7")
+    assert service.batches and max(service.batches) > 1
+    # 19 заказов пачками и 3 попытки отклоненного заказа, вместо 22 запросов по одному
+    assert service.http_requests < 10
+    sent = [order["id"] for order in service.requests]
+    assert sent.count("7") == 3
+    assert all(sent.count(str(i)) == 1 for i in range(20) if i != 7)
+
+
+def test_outbox_falls_back_to_single_sends(run_db):
+    service = StubService(batch=False)
+    payloads = [{"id": str(i)} for i in range(5)]
+    statuses = run_batch_outbox(run_db, service, payloads, batch_size=10)
+
+    assert set(statuses.values()) == {TransactionStatus.completed}
+    assert service.batches == []
+    # Пачку сервис отверг с 404, после этого каждый заказ отправлен по одному ровно раз
+    assert sorted(order["id"] for order in service.requests) == [str(i) for i in range(5)]
+    assert service.http_requests == 5
+
+
+def test_outbox_does_not_resend_after_malformed_batch_reply(run_db):
+    # Сервис принял пачку, но ответил 200 с непонятным телом: заказы не отправляются
+    # сразу же по одному, а идут через обычные повторы, которых тут нет
+    service = StubService(malformed_batches=1)
+    payloads = [{"id": str(i)} for i in range(5)]
+    statuses = run_batch_outbox(run_db, service, payloads, batch_size=10, max_attempts=1)
+
+    assert set(statuses.values()) == {TransactionStatus.failed}
+    assert sorted(order["id"] for order in service.requests) == [str(i) for i in range(5)]
+    assert service.http_requests == 1
@@ -0,0 +1,97 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from db.models import Transaction, ItemEntity, Alias
+from db.pagination import decode_cursor
+from db.repos import get_recent_transactions, get_aliases
+from handlers.pagination import MAX_LIMIT, PageCallback, page_limit, parse_limit
+
+
+def run_with_session(run_db, scenario):
+    async def in_session(sessionmaker):
+        async with sessionmaker() as session:
+            return await scenario(session)
+
+    return run_db(in_session)
+
+
+def test_recent_transactions_pages(run_db):
+    async def scenario(session):
+        now = datetime(2026, 10, 1, 12, 0, 0, 123456)
+        for i in range(25):
+            # У части транзакций одинаковое время, порядок внутри определяет id
+            session.add(Transaction(
+                transaction_id=str(i),
+                timestamp=now + timedelta(minutes=i // 2),
+                items=[ItemEntity(item_name=f"Item {j}", amount=1, unit_price=1) for j in range(3)],
+            ))
+        await session.commit()
+
+        pages = []
+        page = await get_recent_transactions(session, limit=10)
+        pages.append(page)
+        while page.next_cursor:
+            page = await get_recent_transactions(session, cursor=page.next_cursor, limit=10)
+            pages.append(page)
+
+        back = await get_recent_transactions(session, cursor=pages[-1].prev_cursor, limit=10)
+        return pages, back
+
+    pages, back = run_with_session(run_db, scenario)
+
+    assert [len(page.items) for page in pages] == [10, 10, 5], "LIMIT должен считать транзакции, а не строки предметов"
+    ids = [t.transaction_id for page in pages for t in page.items]
+    assert ids == [str(i) for i in reversed(range(25))], "Транзакции идут от новых к старым без пропусков и повторов"
+    assert pages[0].prev_cursor is None
+    assert all(len(t.items) == 3 for page in pages for t in page.items)
+    assert [t.transaction_id for t in back.items] == ids[10:20], "Кнопка назад возвращает предыдущую страницу"
+    assert back.prev_cursor is not None and back.next_cursor is not None
+
+
+def test_aliases_pages(run_db):
+    async def scenario(session):
+        session.add_all(Alias(origin_name=f"Item {i}", alias_name=f"Alias {i}") for i in range(7))
+        await session.commit()
+
+        first = await get_aliases(session, limit=3)
+        second = await get_aliases(session, cursor=first.next_cursor, limit=3)
+        third = await get_aliases(session, cursor=second.next_cursor, limit=3)
+        return first, second, third
+
+    first, second, third = run_with_session(run_db, scenario)
+
+    assert [a.origin_name for a in first.items + second.items + third.items] == [f"Item {i}" for i in range(7)]
+    assert third.next_cursor is None
+
+
+def test_invalid_cursor():
+    with pytest.raises(ValueError):
+        decode_cursor("not a cursor", 2)
+
+
+class FakeMessage:
+    def __init__(self, text: str):
+        self.text = text
+        self.answers: list[str] = []
+
+    async def answer(self, text: str):
+        self.answers.append(text)
+
+
+def test_parse_limit_caps_page_size():
+    async def parse(text):
+        message = FakeMessage(text)
+        return await parse_limit(message), message.answers
+
+    assert asyncio.run(parse("/recents")) == (10, [])
+    assert asyncio.run(parse(f"/recents {MAX_LIMIT}")) == (MAX_LIMIT, [])
+    for text in (f"/recents {MAX_LIMIT + 1}", "/recents 1000000", "/recents 0", "/recents ten"):
+        limit, answers = asyncio.run(parse(text))
+        assert limit is None
+        assert len(answers) == 1
+
+    # Размер из кнопки присылает клиент, его тоже нельзя увеличить
+    assert page_limit(PageCallback(listing="recents", cursor="", limit=1000000)) == MAX_LIMIT
+    assert page_limit(PageCallback(listing="recents", cursor="", limit=0)) == 1
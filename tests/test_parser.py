@@ -1,6 +1,6 @@
 
 import pytest
-from formatters import parse_message
+from formatters import parse_message, parse_order
 
 # Пример корректного сообщения для парсинга
 valid_message = """
@@ -62,11 +62,13 @@ https://mm2guns.com/knifes
 def test_parse_valid_message():
     result = parse_message(valid_message)
     assert result is not None, "Парсер должен вернуть результат для валидного сообщения"
-    assert result['roblox_name'] == "vepe211", "Неверно извлечено имя ROBLOX"
-    assert result['transaction_id'] == "9961889", "Неверно извлечен Transaction ID"
-    assert len(result['items']) == 1, "Должен быть извлечен один элемент"
-    assert result['items'][0]['name'] == "Batwing", "Неверно извлечено название предмета"
-    assert result['items'][0]['quantity'] == 159, "Неверно извлечено количество предметов"
+    assert result.roblox_username == "vepe211", "Неверно извлечено имя ROBLOX"
+    assert result.transaction_id == "6682510345", "Неверно извлечен Transaction ID"
+    assert result.total_price == 159, "Неверно извлечена сумма платежа"
+    assert len(result.items) == 1, "Должен быть извлечен один элемент"
+    assert result.items[0].name == "Batwing", "Неверно извлечено название предмета"
+    assert result.items[0].amount == 1, "Неверно извлечено количество предметов"
+    assert result.items[0].unit_price == 159, "Неверно извлечена цена предмета"
 
 
 def test_parse_invalid_message_no_transaction():
@@ -80,4 +82,41 @@ def test_parse_invalid_message_no_roblox_name():
 
 def test_parse_empty_message():
     result = parse_message("")
-    assert result is None, "Парсер должен вернуть None для пустого сообщения"
\ No newline at end of file
+    assert result is None, "Парсер должен вернуть None для пустого сообщения"
+
+
+def test_parse_message_no_payment_amount():
+    outcome = parse_order(valid_message.replace("Payment Amount: 159 RUB\n", ""))
+    assert outcome.result is None, "Без суммы платежа заказ не должен разбираться"
+    assert [error.field for error in outcome.errors] == ["total_price"]
+
+
+def test_parse_message_bad_item_line():
+    outcome = parse_order(valid_message.replace("1. Batwing: 159 (1 x 159)", "1. Batwing: 159"))
+    assert outcome.result is None, "Заказ с неразобранным предметом не должен отправляться"
+    assert [error.field for error in outcome.errors] == ["items"]
+
+
+def test_parse_message_many_items():
+    result = parse_message(invalid_message_no_roblox_name.replace(
+        "Purchaser information:\n", "Purchaser information:\nВаш_ник_в_ROBLOX: vepe211\n"
+    ))
+    assert result is not None
+    assert [(item.name, item.amount, item.unit_price) for item in result.items] == [
+        ("Batwing", 1, 159),
+        ("Song", 5, 99),
+    ]
+
+
+def test_parse_message_punctuated_item_names():
+    # В названиях встречаются точки, дефисы и апострофы, как в псевдониме "Rev. seer"
+    result = parse_message(valid_message.replace(
+        "1. Batwing: 159 (1 x 159)",
+        "1. Rev. seer: 159 (1 x 159)\n2. Ice-breaker: 198 (2 x 99)\n3. Nik's knife: 49 (1 x 49)",
+    ))
+    assert result is not None
+    assert [(item.name, item.amount, item.unit_price) for item in result.items] == [
+        ("Rev. seer", 1, 159),
+        ("Ice-breaker", 2, 99),
+        ("Nik's knife", 1, 49),
+    ]
@@ -0,0 +1,96 @@
+import asyncio
+import tracemalloc
+
+import pytest
+
+from db.repos import is_transaction_processed
+from formatters import parse_message
+from handlers.admin import parse_profile_args
+from services.profiler import Profiler, ProfilerBusy
+
+# Заказ в формате формы оплаты, как в test_parser.py
+ORDER = """
+Order #1905848771
+1. Corrupt: 198 (2 x 99)
+The order is paid for.
+Payment Amount: 198 RUB
+Payment ID: Tinkoff Payment: 5060809602
+
+Purchaser information:
+Ваш_ник_в_ROBLOX: vepe211
+Введите_ваш_телеграм_: Pavel
+Phone: +79265377051
+
+Additional information:
+Transaction ID: 9961889:6682510346
+Block ID: rec784210467
+Form Name: Cart
+https://mm2guns.com/knifes
+"""
+
+
+def test_profile_covers_running_handlers(run_db):
+    async def scenario(sessionmaker):
+        stop = asyncio.Event()
+
+        # Работа бота, которая идет параллельно с профилированием
+        async def workload():
+            async with sessionmaker() as session:
+                while not stop.is_set():
+                    parsed = parse_message(ORDER)
+                    await is_transaction_processed(session, parsed.transaction_id)
+
+        profiler = Profiler()
+        reports = []
+
+        async def on_done(report: str):
+            reports.append(report)
+
+        worker = asyncio.create_task(workload())
+        task = profiler.start(0.3, 20, on_done)
+        with pytest.raises(ProfilerBusy):
+            profiler.start(0.3, 20, on_done)
+        await task
+        stop.set()
+        await worker
+        return reports, profiler.active
+
+    reports, active = run_db(scenario)
+
+    assert not active
+    assert len(reports) == 1
+    report = reports[0]
+    bot_section = report.split("=== Функции бота по общему времени ===")[1].split("===")[0]
+    assert "parse_order" in bot_section
+    assert "is_transaction_processed" in bot_section
+    assert "=== Места выделения памяти" in report
+
+
+def test_stop_cancels_profiling():
+    async def scenario():
+        profiler = Profiler()
+        reports = []
+
+        async def on_done(report: str):
+            reports.append(report)
+
+        profiler.start(60, 20, on_done)
+        await asyncio.sleep(0.05)
+        await profiler.stop()
+        # Повторная остановка ничего не делает
+        await profiler.stop()
+        return reports, profiler.active
+
+    reports, active = asyncio.run(scenario())
+
+    assert not active
+    assert reports == []
+    assert not tracemalloc.is_tracing()
+
+
+def test_parse_profile_args():
+    assert parse_profile_args("30") == (30, 30)
+    assert parse_profile_args("0.5 10") == (0.5, 10)
+    for args in (None, "", "0", "-5", "1000", "30 0", "30 10 5", "soon", "nan"):
+        with pytest.raises(ValueError):
+            parse_profile_args(args)
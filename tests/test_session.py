@@ -0,0 +1,88 @@
+from aiogram import Dispatcher, Router
+from aiogram.filters import Command
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from bot import create_dispatcher
+from db.cache import result_cache
+from middlewares.db import LazySession
+from settings import CHAT_ID
+from tests.stubs import FakeTelegram
+from utils import extract_commands
+
+
+class CountingSessionmaker(async_sessionmaker):
+    opened = 0
+
+    def __call__(self, **kw):
+        self.opened += 1
+        return super().__call__(**kw)
+
+
+class FakeOutbox:
+    def notify(self):
+        pass
+
+
+def test_lazy_session_opens_on_first_use(run_db):
+    async def scenario(sessionmaker):
+        unused = LazySession(sessionmaker)
+        bind = unused.bind
+        await unused.close()
+
+        used = LazySession(sessionmaker)
+        value = await used.scalar(text("SELECT 1"))
+        await used.close()
+        return bind is sessionmaker.kw["bind"], unused.opened, used.opened, value, sessionmaker.opened
+
+    same_engine, unused_opened, used_opened, value, opened = run_db(scenario, sessionmaker_class=CountingSessionmaker)
+
+    assert same_engine
+    assert not unused_opened
+    assert used_opened
+    assert value == 1
+    assert opened == 1
+
+
+def test_sessions_only_for_flagged_handlers_that_use_them(run_db):
+    async def scenario(sessionmaker):
+        result_cache.clear()
+
+        telegram = FakeTelegram()
+        await telegram.start()
+        bot = telegram.bot()
+        dp = create_dispatcher(sessionmaker, FakeOutbox())
+
+        opened = {}
+        for text in ("всем привет", "/cache_stats", "Order без полей", "/recents"):
+            await dp.feed_raw_update(bot, telegram.message_update(text, CHAT_ID))
+            opened[text] = sessionmaker.opened
+
+        await bot.session.close()
+        await telegram.stop()
+        return opened, len(telegram.sent)
+
+    opened, sent = run_db(scenario, sessionmaker_class=CountingSessionmaker)
+
+    # Болтовня в чате, команда без бд и заказ с ошибкой разбора обходятся без сессии
+    assert opened == {"всем привет": 0, "/cache_stats": 0, "Order без полей": 0, "/recents": 1}
+    # /cache_stats только для администраторов, отвечают ошибка разбора и /recents
+    assert sent == 2
+
+
+def test_private_commands_are_not_published():
+    public, private = Router(), Router()
+
+    @public.message(Command("recents"))
+    async def recents(message):
+        """Последние транзакции"""
+
+    @private.message(Command("stats"))
+    async def stats(message):
+        """Статистика (для администраторов)"""
+
+    dp = Dispatcher()
+    dp.include_routers(public, private)
+
+    assert [c.command for c in extract_commands(dp)] == ["recents", "stats"]
+    assert [c.command for c in extract_commands(dp, exclude=(private,))] == ["recents"]
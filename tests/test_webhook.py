@@ -0,0 +1,67 @@
+import asyncio
+import time
+
+import pytest
+from aiogram import Bot, Dispatcher, Router
+from aiogram.types import Message
+from aiohttp import ClientSession, web
+
+from services.webhook import create_webhook_app
+
+
+def make_update(update_id: int, text: str) -> dict:
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": -100, "type": "supergroup", "title": "Orders"},
+            "text": text,
+        },
+    }
+
+
+def test_webhook_checks_secret_and_feeds_dispatcher():
+    async def scenario():
+        received = []
+        router = Router()
+
+        @router.message()
+        async def on_message(message: Message):
+            received.append(message.text)
+
+        dp = Dispatcher()
+        dp.include_router(router)
+        bot = Bot(token="42:test")
+
+        runner = web.AppRunner(create_webhook_app(dp, bot, "/webhook", "secret"))
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        url = f"http://127.0.0.1:{runner.addresses[0][1]}/webhook"
+
+        async with ClientSession() as client:
+            async with client.post(url, json=make_update(1, "no secret")) as response:
+                unauthorized = response.status
+            async with client.post(
+                url, json=make_update(2, "Order"), headers={"X-Telegram-Bot-Api-Secret-Token": "secret"},
+            ) as response:
+                accepted = response.status
+
+        # Остановка дожидается апдейтов, которые обрабатываются в фоне
+        await runner.cleanup()
+        return unauthorized, accepted, received
+
+    unauthorized, accepted, received = asyncio.run(scenario())
+
+    assert unauthorized == 401
+    assert accepted == 200
+    assert received == ["Order"]
+
+
+def test_webhook_requires_secret():
+    dp = Dispatcher()
+    bot = Bot(token="42:test")
+    for secret in (None, ""):
+        with pytest.raises(ValueError):
+            create_webhook_app(dp, bot, "/webhook", secret)
@@ -1,34 +1,23 @@
 import logging
-from typing import Sequence
+from typing import AsyncIterable, AsyncIterator, Iterable, Iterator, TypeVar
 
-import requests
-from aiogram import Dispatcher
+from aiogram import Dispatcher, Router
 from aiogram.dispatcher.event.handler import HandlerObject
 from aiogram.filters import Command
-from aiogram.types import BotCommand
-
-from settings import SERVICE_API_URL
+from aiogram.types import BotCommand, Message, InlineKeyboardMarkup
 
 logger = logging.getLogger(__name__)
 
 
-def send_to_service(data):
-	try:
-		logger.info(f"data on the way: {data}")
-		response = requests.post(SERVICE_API_URL, json=data)
-		response.raise_for_status()
-		return response.json()
-	except requests.RequestException as e:
-		logging.error(f"Failed to send data to service: {e}")
-		return None
-
-
-def extract_commands(dp: Dispatcher) -> list[BotCommand]:
+def extract_commands(dp: Dispatcher, exclude: Iterable[Router] = ()) -> list[BotCommand]:
+	"""Команды для меню бота, кроме команд из роутеров exclude"""
 	commands = []
 	handlers: list[HandlerObject] = [*dp.message.handlers]
+	excluded = set(exclude)
 
 	for router in dp.sub_routers:
-		handlers.extend(router.message.handlers)
+		if router not in excluded:
+			handlers.extend(router.message.handlers)
 
 	for handler in handlers:
 		if not handler.callback.__doc__:
@@ -41,3 +30,104 @@ def extract_commands(dp: Dispatcher) -> list[BotCommand]:
 		)
 
 	return commands
+
+
+# Максимальная длина текста сообщения в Telegram
+MESSAGE_LIMIT = 4096
+
+
+T = TypeVar("T")
+
+
+async def aenumerate(iterable: AsyncIterable[T], start: int = 0) -> AsyncIterator[tuple[int, T]]:
+	i = start
+	async for value in iterable:
+		yield i, value
+		i += 1
+
+
+def text_length(text: str) -> int:
+	# Telegram считает длину в UTF-16 символах
+	return len(text.encode("utf-16-le")) // 2
+
+
+def split_record(record: str, limit: int) -> Iterator[str]:
+	"""Слишком длинную запись режет по строкам, а очень длинные строки - по символам"""
+	if text_length(record) <= limit:
+		yield record
+		return
+
+	buffer = []
+	size = 0
+	for line in record.splitlines(keepends=True):
+		length = text_length(line)
+		if buffer and size + length > limit:
+			yield "".join(buffer)
+			buffer = []
+			size = 0
+		if length > limit:
+			# В худшем случае каждый символ занимает две UTF-16 единицы
+			step = limit // 2
+			yield from (line[i:i + step] for i in range(0, len(line), step))
+			continue
+		buffer.append(line)
+		size += length
+
+	if buffer:
+		yield "".join(buffer)
+
+
+async def answer_chunked(
+		message: Message,
+		records: Iterable[str] | AsyncIterable[str],
+		header: str = "",
+		empty: str | None = None,
+		reply_markup: InlineKeyboardMarkup | None = None,
+		edit: bool = False,
+		limit: int = MESSAGE_LIMIT,
+) -> int:
+	"""
+	Отправляет записи несколькими сообщениями, не превышая лимит Telegram.
+	Сообщения режутся только по границам записей и отправляются по мере заполнения,
+	поэтому в памяти держится не больше одного сообщения.
+	Клавиатура прикрепляется к последнему сообщению, при edit=True первое сообщение
+	заменяет текст исходного. Возвращает количество отправленных сообщений.
+	"""
+	sent = 0
+	buffer = [header] if header else []
+	size = text_length(header)
+	has_records = False
+
+	async def flush(markup: InlineKeyboardMarkup | None = None):
+		nonlocal sent, buffer, size
+		text = "".join(buffer)
+		if edit and sent == 0:
+			await message.edit_text(text, reply_markup=markup)
+		else:
+			await message.answer(text, reply_markup=markup)
+		sent += 1
+		buffer = []
+		size = 0
+
+	async def iterate():
+		if isinstance(records, AsyncIterable):
+			async for record in records:
+				yield record
+		else:
+			for record in records:
+				yield record
+
+	async for record in iterate():
+		has_records = True
+		for piece in split_record(record, limit):
+			length = text_length(piece)
+			if buffer and size + length > limit:
+				await flush()
+			buffer.append(piece)
+			size += length
+
+	if not has_records and empty is not None:
+		buffer = [empty]
+
+	await flush(reply_markup)
+	return sent